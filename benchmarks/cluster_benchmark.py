@@ -0,0 +1,79 @@
+"""Measure story clustering time for a window of a few thousand articles.
+
+Generates synthetic EN/JA articles about ``STORIES`` events (each article mixes
+words of its event with random filler), then times:
+
+    python benchmarks/cluster_benchmark.py          # 3,000 articles
+    python benchmarks/cluster_benchmark.py 5000
+
+- the first ``assign`` of the whole window (every article is new),
+- an incremental ``assign`` of the window plus ``NEW`` unseen articles,
+
+and reports how many events were split over several clusters or merged with
+another event.
+"""
+
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.story_clusters import StoryClusters
+
+count = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+STORIES = count // 5
+NEW = 500
+BODY_WORDS = 400
+FILLER = ('the a of to in and said on for is that with was as by at from its has have'.split()
+          + [f'word{i}' for i in range(20000)])
+KANJI = [chr(c) for c in range(0x4e00, 0x4e00 + 3000)]
+
+
+def _articles(n, rng, events):
+    articles = []
+    for i in range(n):
+        story = rng.randrange(len(events))
+        language, words = events[story]
+        filler = (lambda: rng.choice(KANJI) + rng.choice(KANJI)) if language == 'ja' else (lambda: rng.choice(FILLER))
+        sep = '' if language == 'ja' else ' '
+        title = sep.join(rng.choice(words) for _ in range(6))
+        body = sep.join(rng.choice(words) if rng.random() < 0.3 else filler() for _ in range(BODY_WORDS))
+        articles.append((f'{language}-{i}', title, body, story))
+    return articles
+
+
+def _quality(articles, labels):
+    clusters_of, stories_of = defaultdict(set), defaultdict(set)
+    for (_, _, _, story), label in zip(articles, labels):
+        clusters_of[story].add(label)
+        stories_of[label].add(story)
+    split = sum(len(c) > 1 for c in clusters_of.values())
+    merged = sum(len(s) > 1 for s in stories_of.values())
+    return f"{len(stories_of)} clusters, {split} stories split, {merged} clusters mixing stories"
+
+
+def main():
+    rng = random.Random(7)
+    events = []
+    for _ in range(STORIES):
+        if rng.random() < 0.3:
+            events.append(('ja', [''.join(rng.choice(KANJI) for _ in range(2)) for _ in range(30)]))
+        else:
+            events.append(('en', [f'name{rng.randrange(100000)}' for _ in range(30)]))
+    window = _articles(count, rng, events)
+    new = [(f'new-{key}', title, body, story) for key, title, body, story in _articles(NEW, rng, events)]
+
+    clusters = StoryClusters()
+    start = time.perf_counter()
+    labels = clusters.assign([a[:3] for a in window])
+    print(f"first assign of {count} articles: {time.perf_counter() - start:.3f}s ({_quality(window, labels)})")
+
+    start = time.perf_counter()
+    labels = clusters.assign([a[:3] for a in window + new])
+    print(f"window + {NEW} new articles:   {time.perf_counter() - start:.3f}s ({_quality(window + new, labels)})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Benchmark the native extractor against Readability on a recorded corpus.
+
+Record a corpus by running scrapers with QUICKNEWS_RECORD_DIR set, e.g.:
+
+    QUICKNEWS_RECORD_DIR=benchmarks/corpus python main.py jp
+
+which stores raw article pages as <corpus>/<source_id>/<hash>.html. Then run:
+
+    python benchmarks/extractor_benchmark.py benchmarks/corpus
+
+For each source it reports mean extraction time per page for both backends
+and the token-level F1 agreement between their text outputs.
+"""
+
+import os
+import re
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lxml import html as lxml_html
+from utils.extractor import extract_main_content
+
+# Language per source, used for CJK-aware scoring and tokenization
+SOURCE_LANGUAGES = {
+    'mainichi': 'ja', 'asahi': 'ja', 'kyodo': 'ja', 'nhk': 'ja',
+    'euronews': 'fr', 'rfi': 'fr', '20minutes': 'fr',
+}
+
+_TOKEN = re.compile(r'[぀-ヿ㐀-䶿一-鿿]|\w+', re.U)
+
+
+def _text(fragment):
+    if not fragment or not fragment.strip():
+        return ''
+    try:
+        return lxml_html.fromstring(fragment).text_content()
+    except Exception:
+        return ''
+
+
+def token_f1(reference, candidate):
+    """Bag-of-tokens F1 between two texts (CJK characters count as tokens)."""
+    ref = _TOKEN.findall(reference.lower())
+    cand = _TOKEN.findall(candidate.lower())
+    if not ref and not cand:
+        return 1.0
+    if not ref or not cand:
+        return 0.0
+    counts = {}
+    for t in ref:
+        counts[t] = counts.get(t, 0) + 1
+    overlap = 0
+    for t in cand:
+        if counts.get(t, 0) > 0:
+            counts[t] -= 1
+            overlap += 1
+    if not overlap:
+        return 0.0
+    precision = overlap / len(cand)
+    recall = overlap / len(ref)
+    return 2 * precision * recall / (precision + recall)
+
+
+def benchmark_source(source_dir, language=None):
+    pages = sorted(f for f in os.listdir(source_dir) if f.endswith('.html'))
+    totals = {'readability': 0.0, 'native': 0.0}
+    f1_scores = []
+    for name in pages:
+        with open(os.path.join(source_dir, name), 'rb') as f:
+            raw = f.read()
+        outputs = {}
+        for extractor in totals:
+            start = time.perf_counter()
+            try:
+                outputs[extractor] = extract_main_content(raw, extractor, language)
+            except Exception as e:
+                print(f"  {name}: {extractor} failed: {e}")
+                outputs[extractor] = ''
+            totals[extractor] += time.perf_counter() - start
+        f1_scores.append(token_f1(_text(outputs['readability']), _text(outputs['native'])))
+    return len(pages), totals, f1_scores
+
+
+def main():
+    corpus_dir = sys.argv[1] if len(sys.argv) > 1 else 'benchmarks/corpus'
+    if not os.path.isdir(corpus_dir):
+        print(f"Error: corpus directory '{corpus_dir}' not found")
+        sys.exit(1)
+
+    print(f"{'source':<12} {'pages':>5} {'readability ms':>15} {'native ms':>10} {'speedup':>8} {'F1':>6}")
+    for source_id in sorted(os.listdir(corpus_dir)):
+        source_dir = os.path.join(corpus_dir, source_id)
+        if not os.path.isdir(source_dir):
+            continue
+        count, totals, f1_scores = benchmark_source(source_dir, SOURCE_LANGUAGES.get(source_id, 'en'))
+        if not count:
+            continue
+        r_ms = totals['readability'] / count * 1000
+        n_ms = totals['native'] / count * 1000
+        speedup = r_ms / n_ms if n_ms else 0
+        mean_f1 = sum(f1_scores) / len(f1_scores)
+        print(f"{source_id:<12} {count:>5} {r_ms:>15.1f} {n_ms:>10.1f} {speedup:>7.1f}x {mean_f1:>6.2f}")
+
+
+if __name__ == "__main__":
+    main()
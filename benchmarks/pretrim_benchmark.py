@@ -0,0 +1,82 @@
+"""Measure the effect of HTML pre-trimming on parse time and memory per source.
+
+Uses the same recorded corpus as extractor_benchmark.py:
+
+    python benchmarks/pretrim_benchmark.py benchmarks/corpus
+
+For each source it reports average page size before/after trimming, the
+Readability (lxml) and BeautifulSoup parse times, and the peak Python heap
+(tracemalloc) while BeautifulSoup builds the tree.
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bs4 import BeautifulSoup
+from readability import Document
+from utils.pretrim import pretrim_html
+from utils.site_rules import get_rules
+
+
+def _measure(data):
+    start = time.perf_counter()
+    Document(data).summary()
+    readability_ms = (time.perf_counter() - start) * 1000
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    BeautifulSoup(data, 'html.parser')
+    bs4_ms = (time.perf_counter() - start) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return readability_ms, bs4_ms, peak / 1024
+
+
+def benchmark_source(source_id, source_dir):
+    rules = get_rules(source_id)
+    rows = []
+    for name in sorted(os.listdir(source_dir)):
+        if not name.endswith('.html'):
+            continue
+        with open(os.path.join(source_dir, name), 'rb') as f:
+            raw = f.read()
+        trimmed = pretrim_html(raw, rules)
+        rows.append((len(raw), len(trimmed), _measure(raw), _measure(trimmed)))
+    return rows
+
+
+def main():
+    corpus_dir = sys.argv[1] if len(sys.argv) > 1 else 'benchmarks/corpus'
+    if not os.path.isdir(corpus_dir):
+        print(f"Error: corpus directory '{corpus_dir}' not found")
+        sys.exit(1)
+
+    print(f"{'source':<12} {'pages':>5} {'KB raw':>8} {'KB trim':>8} "
+          f"{'readab. ms':>16} {'bs4 ms':>16} {'bs4 peak KB':>18}")
+    for source_id in sorted(os.listdir(corpus_dir)):
+        source_dir = os.path.join(corpus_dir, source_id)
+        if not os.path.isdir(source_dir):
+            continue
+        rows = benchmark_source(source_id, source_dir)
+        if not rows:
+            continue
+        n = len(rows)
+
+        def avg(values):
+            return sum(values) / n
+
+        raw_kb = avg([r[0] for r in rows]) / 1024
+        trim_kb = avg([r[1] for r in rows]) / 1024
+        cols = []
+        for i in range(3):
+            before = avg([r[2][i] for r in rows])
+            after = avg([r[3][i] for r in rows])
+            cols.append(f"{before:>7.1f} -> {after:<6.1f}")
+        print(f"{source_id:<12} {n:>5} {raw_kb:>8.1f} {trim_kb:>8.1f} {cols[0]:>16} {cols[1]:>16} {cols[2]:>18}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Measure full-text query latency of the article store at archive scale.
+
+Fills a scratch store with synthetic EN/FR/JA articles, then times searches:
+
+    python benchmarks/search_benchmark.py               # 100,000 articles
+    python benchmarks/search_benchmark.py 1000000 /tmp/bench.db
+
+An existing database at the given path is reused as is (no new articles are
+added), so a large archive only has to be built once. For each query it
+reports the number of results returned and the median and worst latency over
+``REPEATS`` runs, snippets included; ``FILTERED`` repeats some of them with a
+source or language filter.
+"""
+
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(tempfile.mkdtemp(), 'bench.db')
+# The store reads its location at import time
+os.environ['QUICKNEWS_STORE'] = path
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils import store
+from utils.article import Article
+
+WORDS = {
+    'en': ('election senate court economy inflation market storm wildfire president congress '
+           'vaccine budget trade tariff border police school climate energy'.split()),
+    'fr': ('élection sénat tribunal économie marché tempête incendie président assemblée '
+           'vaccin budget grève frontière police école climat énergie'.split()),
+    'ja': ['東京', '都庁', '知事', '選挙', '地震', '台風', '経済', '物価', '首相', '国会',
+           '裁判', '警察', '学校', '気候', '円安', '株価', '大阪', '北海道'],
+}
+SOURCES = {'en': 'npr', 'fr': 'rfi', 'ja': 'mainichi'}
+QUERIES = ['election', 'inflation market', 'élection sénat', 'grève*', '選挙', '東京都庁', '円安 株価', '台']
+# Queries with the source and language filters of store.search
+FILTERED = [('election', {'source_id': 'npr'}), ('grève*', {'source_id': 'rfi'}), ('台', {'language': 'ja'}),
+            ('election', {'source_id': 'mainichi'})]
+REPEATS = 20
+
+
+def _sentence(rng, language):
+    words = [rng.choice(WORDS[language]) for _ in range(rng.randint(8, 16))]
+    if language == 'ja':
+        return 'の'.join(words) + '。'
+    return ' '.join(words).capitalize() + '.'
+
+
+def fill(count):
+    rng = random.Random(42)
+    now = datetime.now(timezone.utc)
+    batch = []
+    for i in range(count):
+        language = rng.choice(list(WORDS))
+        body = ''.join(f'<p>{_sentence(rng, language)}</p>' for _ in range(rng.randint(3, 8)))
+        batch.append(Article(_sentence(rng, language), f'https://bench.example/{language}/{i}',
+                             SOURCES[language], SOURCES[language], now - timedelta(minutes=i), language,
+                             content=body))
+        if len(batch) == 5000:
+            store.add_articles(batch)
+            store.flush()
+            batch = []
+    store.add_articles(batch)
+    store.flush()
+
+
+def main():
+    existing = os.path.exists(path)
+    if not existing:
+        start = time.perf_counter()
+        fill(count)
+        print(f"Stored and indexed {count} articles in {time.perf_counter() - start:.1f}s ({path})")
+    total = store.connect().execute('SELECT COUNT(*) FROM articles').fetchone()[0]
+    print(f"{total} articles, {os.path.getsize(path) / 1024 / 1024:.0f} MB\n")
+    print(f"{'query':<36} {'results':>7} {'median ms':>10} {'max ms':>8}")
+    for query, filters in [(q, {}) for q in QUERIES] + FILTERED:
+        times = []
+        for _ in range(REPEATS):
+            start = time.perf_counter()
+            results = store.search(query, **filters)
+            times.append((time.perf_counter() - start) * 1000)
+        label = ' '.join([query] + [f'{k}={v}' for k, v in filters.items()])
+        print(f"{label:<36} {len(results):>7} {statistics.median(times):>10.1f} {max(times):>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
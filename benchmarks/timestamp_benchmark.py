@@ -0,0 +1,91 @@
+"""Benchmark utils/timestamps.py against dateutil on real feed dates.
+
+Pass saved feed files or feed URLs (default: the bespoke scrapers' feeds):
+
+    python benchmarks/timestamp_benchmark.py
+    python benchmarks/timestamp_benchmark.py saved/asahi.rdf saved/npr.xml
+
+For each feed it reports the date format seen, mean parse time per date for
+dateutil.parser.parse, parse_timestamp (string fast paths) and
+entry_timestamp (feedparser's parsed structs first), and how many dates
+parse to a different instant than dateutil (dateutil leaves zone names such
+as EDT unresolved, so differences there are dateutil's).
+"""
+
+import os
+import sys
+import time
+import warnings
+from datetime import timezone
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import dateutil.parser
+import feedparser
+from utils.timestamps import DATE_FIELDS, entry_timestamp, get_zone, parse_timestamp
+
+FEEDS = [
+    'https://rss.asahi.com/rss/asahi/newsheadlines.rdf',
+    'https://mainichi.jp/rss/etc/mainichi-flash.rss',
+    'https://www.kyodo.co.jp/feed/',
+    'https://www.npr.org/rss/rss.php?id=1001',
+    'https://www.cbsnews.com/latest/rss/main',
+    'https://moxie.foxnews.com/google-publisher/latest.xml',
+    'https://www.rfi.fr/fr/rss',
+    'https://www.20minutes.fr/feeds/rss-monde.xml',
+    'https://fr.euronews.com/rss?format=mrss&level=theme&name=news',
+]
+# Repeat each measurement to get stable per-date times
+ROUNDS = 200
+
+
+def _dateutil(value):
+    try:
+        parsed = dateutil.parser.parse(value)
+    except (ValueError, OverflowError):
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _time_per_item(func, items):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for item in items:
+            func(item)
+    return (time.perf_counter() - start) * 1e6 / (ROUNDS * len(items))
+
+
+def benchmark_feed(location):
+    feed = feedparser.parse(location)
+    entries = [e for e in feed.entries if any(e.get(f) for f in DATE_FIELDS)]
+    if not entries:
+        return None
+    values = [next(e.get(f) for f in DATE_FIELDS if e.get(f)) for e in entries]
+    tz = get_zone('UTC')
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        reference = [_dateutil(v) for v in values]
+        dateutil_us = _time_per_item(_dateutil, values)
+    fast_us = _time_per_item(parse_timestamp, values)
+    entry_us = _time_per_item(lambda e: entry_timestamp(e, tz), entries)
+    differ = sum(1 for v, ref in zip(values, reference) if parse_timestamp(v) != ref)
+    return len(values), values[0], dateutil_us, fast_us, entry_us, differ
+
+
+def main():
+    locations = sys.argv[1:] or FEEDS
+    print(f"{'feed':<40} {'dates':>5} {'dateutil us':>12} {'fast us':>8} {'entry us':>9} {'differ':>6}  sample")
+    for location in locations:
+        try:
+            row = benchmark_feed(location)
+        except Exception as e:
+            print(f"{location[:40]:<40} error: {e}")
+            continue
+        if row is None:
+            print(f"{location[:40]:<40} no dated entries")
+            continue
+        n, sample, dateutil_us, fast_us, entry_us, differ = row
+        print(f"{location[-40:]:<40} {n:>5} {dateutil_us:>12.1f} {fast_us:>8.1f} {entry_us:>9.1f} {differ:>6}  {sample}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""Long-running QuickNews refresher.
+
+main.py starts every refresh cold: new interpreters, sessions, Chromium and
+caches. The daemon imports the scrapers once and keeps them warm instead.
+Each source runs on its own event loop thread (the scrapers still make some
+blocking calls, which then only hold up their own source) and keeps its HTTP
+connections, cookies, DNS answers, Chromium and host limiter state between
+refreshes (utils/warm.py).
+
+Sources are scheduled one by one from their feeds: each feed is polled with a
+conditional GET at an interval learned from how often new items appear in it
+(utils/feed_schedule.py), and the source is refreshed, within its region's
+time budget, only when a poll finds new items. The region page is re-rendered
+as soon as one of its sources has written new output.
+
+    python daemon.py us jp fr
+"""
+
+import argparse
+import asyncio
+import importlib
+import os
+import random
+import threading
+import time
+
+from main import KILL_GRACE, output_mtimes, region_html_files, region_scrapers, render_region
+from utils import metrics, seen, store, warm
+from utils.article_cache import save_cache
+from utils.deadline import set_deadline
+from utils.feed_schedule import get_schedule, save_schedules
+from utils.feeds import poll_feed
+from utils.host_limiter import save_limiters
+from utils.site_rules import get_rules
+from utils.sources import RSS_DRIVER_SCRIPT, get_region, region_names
+
+# Spread of the first refreshes so that the sources do not all start at once
+START_JITTER = 10.0
+
+
+class SourceWorker:
+    """A scraper module with its own event loop thread, kept for the daemon's lifetime."""
+
+    def __init__(self, script, region):
+        module_name = os.path.splitext(os.path.basename(script))[0]
+        self.region = region
+        self.module = importlib.import_module(f'scrapers.{module_name}')
+        if hasattr(self.module, 'region_feeds'):
+            # Generic driver: one worker for all the plain feeds of the region
+            self.name = f'{module_name}:{region}'
+            self.source_id = module_name
+            feeds = [(s.source_id, s.feed) for s in self.module.region_feeds(region)]
+        else:
+            self.name = module_name
+            self.source_id = self.module.SOURCE_ID
+            urls = getattr(self.module, 'RSS_FEEDS', None) or [self.module.RSS_FEED]
+            feeds = [(self.source_id, url) for url in urls]
+        self.schedules = [(source_id, get_schedule(url, get_rules(source_id))) for source_id, url in feeds]
+        # Sources whose last poll found new items (refreshed alone by the generic driver)
+        self.changed = None
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name=self.name, daemon=True)
+        self.thread.start()
+        self.running = None
+
+    def busy(self):
+        return self.running is not None and not self.running.done()
+
+    def refresh(self, deadline, source_ids=None):
+        """Start a refresh on the worker's loop (returns a concurrent.futures.Future)."""
+        self.running = asyncio.run_coroutine_threadsafe(self._refresh(deadline, source_ids), self.loop)
+        return self.running
+
+    async def _refresh(self, deadline, source_ids):
+        set_deadline(deadline)
+        if hasattr(self.module, 'refresh_region'):
+            return await self.module.refresh_region(self.region, source_ids)
+        return await self.module.refresh()
+
+    def poll(self):
+        """Poll the source's feeds on the worker's loop; the future gives the new item count or None."""
+        return asyncio.run_coroutine_threadsafe(self._poll(), self.loop)
+
+    async def _poll(self):
+        counts = {}
+        # Only the feeds that are due: a driver worker has many, each on its own interval
+        for source_id, schedule in self.schedules:
+            if not schedule.due():
+                continue
+            count = poll_feed(schedule.url, source_id, schedule)
+            if count is not None:
+                counts[source_id] = counts.get(source_id, 0) + count
+        self.changed = {source_id for source_id, count in counts.items() if count}
+        return sum(counts.values()) if counts else None
+
+    def next_delay(self):
+        if not self.schedules:
+            return max(get_region(self.region).budget, 60.0)
+        return min(s.next_delay() for _, s in self.schedules)
+
+    def close(self):
+        """Close the kept sessions and browser, then stop the loop."""
+        try:
+            asyncio.run_coroutine_threadsafe(warm.close_all(), self.loop).result(timeout=15)
+        except Exception as e:
+            print(f"Warning: could not close {self.name} resources: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5)
+
+
+def save_state():
+    """Persist what the one-shot scrapers save when their process exits."""
+    save_limiters()
+    save_cache()
+    save_schedules()
+    seen.save()
+    store.flush()
+    metrics.flush('daemon')
+    metrics.write_run_report()
+
+
+async def refresh_source(worker, budget, source_ids=None):
+    """Refresh one source within the budget and publish its region page if its output changed."""
+    if worker.busy():
+        # Still winding down from a cancelled refresh
+        print(f"{worker.name} is still refreshing, skipped")
+        return
+    html_files = region_html_files(worker.region)
+    mtimes = output_mtimes(html_files)
+    print(f"[{time.strftime('%H:%M:%S')}] Refreshing {worker.name} (budget {budget:.0f}s)")
+    future = asyncio.wrap_future(worker.refresh(time.time() + budget, source_ids))
+    done, _ = await asyncio.wait({future}, timeout=budget + KILL_GRACE)
+    if not done:
+        # Publish on time: the page keeps this source's previous output
+        print(f"Deadline passed, cancelling {worker.name}; using its last output")
+        future.cancel()
+    elif future.exception() is not None:
+        print(f"Error refreshing {worker.name}: {future.exception()}")
+    if output_mtimes(html_files) != mtimes:
+        render_region(worker.region)
+    save_state()
+
+
+async def poll_and_refresh(worker, budget, always=False):
+    new = await asyncio.wrap_future(worker.poll())
+    if always:
+        await refresh_source(worker, budget)
+    elif new:
+        await refresh_source(worker, budget, worker.changed)
+    elif new == 0:
+        metrics.incr(worker.source_id, 'poll.skipped_refreshes')
+
+
+async def source_loop(worker, budget):
+    await asyncio.sleep(random.uniform(0, START_JITTER))
+    # Refresh once at start-up whatever the feed says, so the pages are current
+    always = True
+    while True:
+        try:
+            await poll_and_refresh(worker, budget, always)
+        except Exception as e:
+            print(f"Error scheduling {worker.name}: {e}")
+        always = False
+        delay = worker.next_delay()
+        print(f"{worker.name}: next poll in {delay:.0f}s")
+        await asyncio.sleep(max(delay, 1.0))
+
+
+def run_daemon(regions, budget=None, once=False):
+    warm.enable()
+    metrics.reset_reports()
+    workers = {}
+    for region in regions:
+        for script in region_scrapers(region):
+            # Scrapers are shared between regions; the generic driver runs per region
+            key = (script, region) if script == RSS_DRIVER_SCRIPT else script
+            if key not in workers:
+                workers[key] = SourceWorker(script, region)
+    print(f"Loaded {len(workers)} scrapers for {', '.join(regions)}")
+
+    async def run():
+        def budget_of(worker):
+            return budget or get_region(worker.region).budget
+        if once:
+            await asyncio.gather(*(poll_and_refresh(w, budget_of(w), always=True) for w in workers.values()))
+        else:
+            await asyncio.gather(*(source_loop(w, budget_of(w)) for w in workers.values()))
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print("Stopping")
+    finally:
+        for worker in workers.values():
+            worker.close()
+        save_state()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Keep QuickNews regions refreshed in one long-running process.')
+    parser.add_argument('regions', nargs='*', default=region_names(), help='regions to refresh (default: all)')
+    parser.add_argument('--deadline', type=float, default=None,
+                        help='time budget per refresh in seconds (default: the region budget in config/sources.json)')
+    parser.add_argument('--once', action='store_true', help='refresh every source once and exit')
+    args = parser.parse_args()
+    run_daemon(args.regions, args.deadline, args.once)
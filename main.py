@@ -1,103 +1,214 @@
+import argparse
 import subprocess
 import os
 import sys
+import time
 from bs4 import BeautifulSoup
 import os
 from datetime import datetime
 import pytz
+from utils.deadline import DEADLINE_ENV
+from utils.metrics import reset_reports, write_run_report
+from utils.near_dup import collapse
+from utils.progressive import HEADLINES_ENV, PROGRESSIVE_ENV
+from utils.sources import REGION_ENV, get_region, region_names
+from utils.story_clusters import StoryClusters
 
+# Regions, their sources and time budgets are listed in config/sources.json
+# (utils/sources.py). A region's budget is the time from the start of a run
+# until its page is published. Scrapers stop fetching a few seconds before
+# (utils/deadline.py) and render what they have; any still running after the
+# grace period are stopped and the page uses their previous output file.
+KILL_GRACE = 15
+# How often scraper processes (and, in progressive mode, their outputs) are checked
+POLL_INTERVAL = 0.5
+# Story clusters of each region, kept across renders (progressive mode, daemon)
+_story_clusters = {}
 
-def run_scrapers(region:str):
-    """Run all individual scraper scripts."""
-    
-    if region == 'us':
-        scrapers = [
-            'scrapers/foxnews_scraper.py',
-            'scrapers/cbs_scraper.py',
-            'scrapers/npr_scraper.py'
-        ]
-    
-    elif region == 'jp':
-        scrapers = [
-            'scrapers/mainichi_scraper.py',
-            'scrapers/asahi_scraper.py',
-            'scrapers/kyodo_scraper.py'
-        ]
-    
-    elif region == 'fr':
-        scrapers = [
-            'scrapers/euronews_scraper.py',
-            'scrapers/rfi_scraper.py',
-            'scrapers/twenty_minutes_scraper.py',
-        ]
-    
-    print("Running scrapers...")
-    for scraper in scrapers:
+
+def region_scrapers(region:str):
+    """Scraper scripts of a region's enabled sources (one generic driver for all its plain feeds)."""
+    return list(get_region(region).scripts)
+
+
+def region_html_files(region:str):
+    """Scraper output pages combined into the region page, in display order."""
+    return [source.output for source in get_region(region).sources]
+
+
+def output_mtimes(paths):
+    """{path: modification time in ns or None}, to notice rewritten output pages."""
+    mtimes = {}
+    for path in paths:
+        try:
+            mtimes[path] = os.stat(path).st_mtime_ns
+        except OSError:
+            mtimes[path] = None
+    return mtimes
+
+
+def run_scrapers(region:str, budget=None, on_progress=None, headlines=False):
+    """
+    Run all individual scraper scripts in parallel within the region's time budget.
+
+    on_progress, if given, switches the scrapers to progressive mode and is
+    called whenever one of the region's output pages changes while they run.
+    headlines makes them render feed metadata only, without article pages.
+    """
+    settings = get_region(region)
+    pending = region_scrapers(region)
+
+    if budget is None:
+        budget = settings.budget
+    deadline = time.time() + budget
+
+    print(f"Running scrapers (budget {budget:.0f}s)...")
+    reset_reports()
+    env = {
+        **os.environ,
+        'PYTHONPATH': os.path.dirname(os.path.abspath(__file__)),
+        DEADLINE_ENV: str(deadline),
+        REGION_ENV: region,
+    }
+    if on_progress is not None:
+        env[PROGRESSIVE_ENV] = '1'
+    if headlines:
+        env[HEADLINES_ENV] = '1'
+    processes = {}
+
+    def start_scrapers():
+        # At most settings.concurrency scrapers at once; the rest wait their turn
+        while pending and len(processes) < settings.concurrency:
+            scraper = pending.pop(0)
+            try:
+                print(f"Running {scraper}...")
+                # Use the same Python interpreter
+                processes[scraper] = subprocess.Popen([sys.executable, scraper], env=env)
+            except OSError as e:
+                print(f"Error running {scraper}: {e}")
+
+    start_scrapers()
+    html_files = region_html_files(region)
+    seen = output_mtimes(html_files)
+    while processes and time.time() < deadline + KILL_GRACE:
+        time.sleep(POLL_INTERVAL)
+        for scraper, process in list(processes.items()):
+            returncode = process.poll()
+            if returncode is None:
+                continue
+            del processes[scraper]
+            if returncode != 0:
+                print(f"Error running {scraper}: exit status {returncode}")
+        if time.time() < deadline:
+            start_scrapers()
+        if on_progress is not None:
+            current = output_mtimes(html_files)
+            if current != seen:
+                seen = current
+                on_progress()
+
+    for scraper, process in processes.items():
+        # Publish on time: the page uses this scraper's previous output file
+        print(f"Deadline passed, stopping {scraper}; using its last output")
+        process.terminate()
         try:
-            print(f"Running {scraper}...")
-            # Use the same Python interpreter
-            subprocess.run([sys.executable, scraper], check=True, env={
-                **os.environ,
-                'PYTHONPATH': os.path.dirname(os.path.abspath(__file__))
-            })
-        except subprocess.CalledProcessError as e:
-            print(f"Error running {scraper}: {e}")
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+    for scraper in pending:
+        print(f"Deadline passed before {scraper} could start; using its last output")
+
+    # Merge the per-scraper metrics (pre-trim savings, fetch counters, ...)
+    write_run_report()
+
+def combine_news_articles(region:str, budget=None, progressive=False, headlines=False):
+    # First, run all scrapers; in progressive mode the region page is
+    # re-rendered as their headline and full pages come in
+    on_progress = (lambda: render_region(region)) if progressive and not headlines else None
+    run_scrapers(region, budget, on_progress, headlines)
+    render_region(region)
+
+
+def article_body_text(article):
+    """Text of an article div without its title and source lines."""
+    return ' '.join(s for s in article.find_all(string=True)
+                    if s.find_parent(class_=['article-title', 'article-source']) is None)
+
+
+def collapse_near_duplicates(articles):
+    """
+    Drop articles whose text nearly duplicates an earlier one (the same wire
+    story from several sources); the article kept lists the other sources
+    in an "Also:" line.
+    """
+    duplicate_of = collapse([article_body_text(article) for article in articles])
+    also = {}
+    for article, original in zip(articles, duplicate_of):
+        if original is not None:
+            source = article.find('div', class_='article-source')
+            also.setdefault(original, []).append(source.get_text(strip=True) if source else '')
+    for original, sources in also.items():
+        sources = [s for s in dict.fromkeys(sources) if s]
+        if not sources:
             continue
+        kept = articles[original]
+        line = BeautifulSoup('<div class="article-also"></div>', 'html.parser').div
+        line.string = 'Also: ' + ', '.join(sources)
+        anchor = kept.find('div', class_='article-source')
+        if anchor is not None:
+            anchor.insert_after(line)
+        else:
+            (kept.find('div', class_='article-content') or kept).append(line)
+    collapsed = sum(original is not None for original in duplicate_of)
+    if collapsed:
+        print(f"Collapsed {collapsed} near-duplicate articles")
+    return [article for article, original in zip(articles, duplicate_of) if original is None]
+
+
+def group_stories(region, articles):
+    """
+    Order articles so that those about the same story (utils/story_clusters.py)
+    follow the first one, which keeps its place; the followers are marked
+    ``article-related``.
+    """
+    clusters = _story_clusters.setdefault(region, StoryClusters())
+    docs = []
+    for article in articles:
+        title = article.find('div', class_='article-title')
+        source = article.find('div', class_='article-source')
+        title = title.get_text(' ', strip=True) if title else ''
+        docs.append((f"{source.get_text(strip=True) if source else ''}|{title}", title, article_body_text(article)))
+    start = time.perf_counter()
+    labels = clusters.assign(docs)
+    stories = {}
+    for article, label in zip(articles, labels):
+        stories.setdefault(label, []).append(article)
+    grouped = [story for story in stories.values() if len(story) > 1]
+    for story in grouped:
+        for article in story[1:]:
+            if 'article-related' not in article.get('class', []):
+                article['class'] = article.get('class', []) + ['article-related']
+    print(f"Grouped {sum(len(story) for story in grouped)} articles into {len(grouped)} stories "
+          f"({time.perf_counter() - start:.2f}s)")
+    return [article for story in stories.values() for article in story]
+
+
+def render_region(region:str):
+    """Combine the scrapers' output pages into the region page and update index.html."""
+    settings = get_region(region)
+    html_files = region_html_files(region)
 
-def combine_news_articles(region:str):
-    # First, run all scrapers
-    run_scrapers(region)
-    
-    # List of HTML files to combine
-    if region == 'us':
-        html_files = [
-            'output/fox_news_articles.html',
-            'output/cbs_news_articles.html',
-            'output/npr_news_articles.html'
-        ]
-    elif region == 'jp':
-        html_files = [
-            'output/mainichi_news_articles.html',
-            'output/asahi_news_articles.html',
-            'output/kyodo_news_articles.html',
-        ]
-    elif region == 'fr':
-        html_files = [
-            'output/euronews_utf8_articles.html',
-            'output/rfi_articles.html',
-            'output/20minutes_articles.html',
-        ]
-    
     with open('static/styles.css', 'r', encoding='utf-8') as f:
         css_style = f.read()
 
     # Create a new BeautifulSoup object for the combined content
-    # Choose timezone based on region for title and on-page timestamp
-    if region == 'us':
-        tz = pytz.timezone('US/Eastern')
-        tz_label = 'ET'
-    elif region == 'jp':
-        tz = pytz.timezone('Asia/Tokyo')
-        tz_label = 'JST'
-    elif region == 'fr':
-        tz = pytz.timezone('Europe/Paris')
-        tz_label = 'CET'
-    else:
-        # Default to US settings
-        tz = pytz.timezone('US/Eastern')
-        tz_label = 'ET'
-    
+    # Timezone and timestamp label of the region (config/sources.json)
+    tz = pytz.timezone(settings.timezone)
+    tz_label = settings.timezone_label
     date_str_title = datetime.now(tz).strftime('%Y-%m-%d')
-    # Localize timestamp label based on region
-    if region == 'us':
-        timestamp_prefix = 'Updated'
-    elif region == 'jp':
-        timestamp_prefix = '更新'
-    elif region == 'fr':
-        timestamp_prefix = 'Mis à jour'
-    else:
-        timestamp_prefix = 'Updated'
-    
+    timestamp_prefix = settings.timestamp_prefix
+
     soup = BeautifulSoup(f'''<!DOCTYPE html>
     <html lang="en">
     <head>
@@ -118,6 +229,7 @@ def combine_news_articles(region:str):
     container = soup.find('div', class_='articles-container')
     
     # Process each HTML file
+    articles = []
     for file_path in html_files:
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
@@ -126,32 +238,39 @@ def combine_news_articles(region:str):
             # Parse the current HTML file
             file_soup = BeautifulSoup(file_content, 'html.parser')
             
-            # Find all articles in the current file
-            articles = file_soup.find_all('div', class_='article')
-            
-            # Add each article to the combined container
-            for article in articles:
-                container.append(article)
-                
+            # Collect the articles of the current file
+            articles.extend(file_soup.find_all('div', class_='article'))
+
             print(f"Processed: {file_path}")
         except FileNotFoundError:
             print(f"Warning: {file_path} not found. Skipping.")
         except Exception as e:
             print(f"Error processing {file_path}: {str(e)}")
-    
+
+    # Add the articles to the combined container: near-duplicates collapsed, related stories together
+    for article in group_stories(region, collapse_near_duplicates(articles)):
+        container.append(article)
+
     # Use common 'newspaper' output directory (no region-specific subfolders)
     output_dir = 'newspaper'
     os.makedirs(output_dir, exist_ok=True)
 
     # Also update a stable alias without date for easy linking
     alias_file = os.path.join(output_dir, f'QuickNews_{region}.html')
-    with open(alias_file, 'w', encoding='utf-8') as f:
+    # Replaced atomically: in progressive mode it is rewritten while being served
+    tmp_file = f'{alias_file}.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
         f.write(str(soup))
+    os.replace(tmp_file, alias_file)
     
     print(f"\nNews articles saved to: {alias_file}")
     
     # Create/update index.html with a region selection list linking to stable alias files
     index_file = os.path.join(output_dir, 'index.html')
+    region_links = '\n'.join(
+        f'            <li><a href="QuickNews_{name}.html">{get_region(name).label}</a></li>'
+        for name in region_names()
+    )
     index_content = f"""<!DOCTYPE html>
 <html>
 <head>
@@ -208,9 +327,7 @@ def combine_news_articles(region:str):
         <h1>QuickNews</h1>
         <p>Select a region:</p>
         <ul>
-            <li><a href="QuickNews_us.html">United States (US)</a></li>
-            <li><a href="QuickNews_jp.html">日本 (JP)</a></li>
-            <li><a href="QuickNews_fr.html">France (FR)</a></li>
+{region_links}
         </ul>
         <div class="note">Each link points to the latest generated page for that region.</div>
     </div>
@@ -223,7 +340,14 @@ def combine_news_articles(region:str):
     print(f"Index file updated: {index_file}")
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        combine_news_articles(sys.argv[1])
-    else:
-        combine_news_articles('us')
+    parser = argparse.ArgumentParser(description='Scrape and publish QuickNews for a region.')
+    parser.add_argument('region', nargs='?', default='us',
+                        help=f"{', '.join(region_names())} (default: us; see config/sources.json)")
+    parser.add_argument('--deadline', type=float, default=None,
+                        help='time budget in seconds (default: the region budget in config/sources.json)')
+    parser.add_argument('--progressive', action='store_true',
+                        help='publish headlines from RSS first, then fill in bodies as they arrive')
+    parser.add_argument('--headlines', action='store_true',
+                        help='feed metadata only: skip article pages and render compact cards')
+    args = parser.parse_args()
+    combine_news_articles(args.region, args.deadline, args.progressive, args.headlines)
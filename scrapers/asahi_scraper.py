@@ -2,22 +2,28 @@ import asyncio
 import json
 import os
 import sys
-import feedparser
 import aiohttp
 import ssl
 import re
 import time
 import random
-import requests
 from datetime import datetime, timezone
-import dateutil.parser
 from bs4 import BeautifulSoup
 from urllib.parse import urlparse
-from readability import Document
 
 # Add parent directory to path to import utils
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.article import Article, save_articles
+from utils.article_cache import cached_content, remember, seen_content
 from utils.convert_to_html import convert_json_to_html as base_convert_json_to_html
+from utils.deadline import deadline_passed
+from utils.extractor import extract_main_content, get_extractor
+from utils.feeds import feed_body, parse_feed, use_feed_body
+from utils.host_limiter import host_slot
+from utils.http_fetch import ACCEPT_ENCODING, http_session, read_html_sync
+from utils.progressive import fill_headlines, headlines_only, publish_headlines
+from utils.site_rules import clean_html, get_rules, text_length
+from utils.timestamps import entry_timestamp
 
 def convert_json_to_html(json_file, output_file):
     """
@@ -52,65 +58,29 @@ def convert_json_to_html(json_file, output_file):
         return base_convert_json_to_html(json_file, output_file)
 
 def clean_html_content(html_content):
-    """
-    Clean HTML content by removing unwanted elements while preserving structure.
-    Similar to NHK scraper's approach but tailored for Asahi's HTML structure.
-    """
+    """Extract the main content, then clean it with the Asahi site rules (config/rules/asahi.json)."""
     if not html_content:
         return html_content
-    
     try:
-        # First, use readability to extract the main content
-        doc = Document(html_content)
-        content_html = doc.summary()
-        
-        # Parse with BeautifulSoup for additional cleaning
-        soup = BeautifulSoup(content_html, 'html.parser')
-        
-        # Remove script, style, and media elements
-        for element in soup(["script", "style", "iframe", "nav", "footer", "img", "picture", "figure", "video", "audio"]):
-            element.decompose()
-        
-        for element in soup.find_all(['a', 'u']):
-            element.unwrap()    
-
-        # Remove share and social media elements
-        for div in soup.find_all("div", class_=lambda x: x and ('share' in x or 
-                                                               'sns' in x or 
-                                                               'related' in x or 
-                                                               'advertisement' in x.lower() or
-                                                               'news-utility' in x or
-                                                               'articleFooter' in x)):
-            div.decompose()
-            
-        # Remove empty paragraphs and add some basic styling for better readability
-        for p in soup.find_all('p'):
-            if not p.get_text().strip():
-                p.decompose()
-            else:
-                # Add a class for styling
-                p['class'] = p.get('class', []) + ['article-paragraph']
-                
-        # Clean up any remaining empty elements
-        for element in soup.find_all():
-            if not element.get_text().strip() and not element.find_all():
-                element.decompose()
-                
-        # Return the cleaned HTML as a string
-        return str(soup)
-        
+        content_html = extract_main_content(html_content, EXTRACTOR, 'ja', SOURCE_ID)
+        return clean_html(content_html, RULES)
     except Exception as e:
         print(f"Error cleaning HTML content: {e}")
         return "[Error processing content]"
 
 RSS_FEED = "https://rss.asahi.com/rss/asahi/newsheadlines.rdf"
 
+# Main-content extractor ('readability' or 'native'), see utils/extractor.py
+SOURCE_ID = 'asahi'
+EXTRACTOR = get_extractor(SOURCE_ID)
+RULES = get_rules(SOURCE_ID)
+
 async def fetch_articles_from_rss():
     """Fetch article metadata from Asahi Shimbun RSS feed."""
     if hasattr(ssl, '_create_unverified_context'):
         ssl._create_default_https_context = ssl._create_unverified_context
     
-    feed = feedparser.parse(RSS_FEED)
+    feed = parse_feed(RSS_FEED, SOURCE_ID, limit=10)
     articles = []
     
     # The Asahi feed uses RDF format, so we need to check both 'entries' and 'items'
@@ -119,24 +89,12 @@ async def fetch_articles_from_rss():
     for entry in entries[:10]:  # Get latest 10 articles
         try:
             # Handle missing or invalid published date
-            published = None
-            
-            # Check for different possible date fields in the entry
-            date_fields = ['published', 'pubDate', 'dc:date', 'dc_date']
-            for field in date_fields:
-                if hasattr(entry, field):
-                    try:
-                        published = dateutil.parser.parse(getattr(entry, field))
-                        if published.tzinfo is None:
-                            published = published.replace(tzinfo=timezone.utc)
-                        published = published.isoformat()
-                        break
-                    except (ValueError, AttributeError, TypeError):
-                        continue
+            # RDF items carry dc:date (feedparser's updated)
+            published = entry_timestamp(entry)
             
             # If no valid published date, use current time
             if not published:
-                published = datetime.now(timezone.utc).isoformat()
+                published = datetime.now(timezone.utc)
             
             # Extract image URL from description if available
             image_url = ''
@@ -145,14 +103,13 @@ async def fetch_articles_from_rss():
                 if img_match:
                     image_url = img_match.group(1)
             
-            articles.append({
-                'title': entry.title,
-                'url': entry.link,
-                'published': published,
-                'source': '朝日新聞',
-                'summary': BeautifulSoup(entry.get('summary', ''), 'html.parser').get_text(),
-                'image': image_url
-            })
+            articles.append(Article(
+                entry.title, entry.link, '朝日新聞', SOURCE_ID, published, 'ja',
+                summary=BeautifulSoup(entry.get('summary', ''), 'html.parser').get_text(),
+                guid=entry.get('id', ''),
+                image_url=image_url,
+                content=feed_body(entry, RULES)  # Full body from the feed, else fetched
+            ))
         except Exception as e:
             print(f"Error processing Asahi article: {e}")
     
@@ -173,7 +130,7 @@ def fetch_article_content_sync(url):
             'User-Agent': random.choice(user_agents),
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
             'Accept-Language': 'ja,en-US;q=0.7,en;q=0.3',
-            'Accept-Encoding': 'gzip, deflate, br',
+            'Accept-Encoding': ACCEPT_ENCODING,
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1',
             'Sec-Fetch-Dest': 'document',
@@ -189,19 +146,32 @@ def fetch_article_content_sync(url):
         time.sleep(random.uniform(1.0, 3.0))
         
         # Use a session to maintain cookies
-        session = requests.Session()
+        # Kept between refreshes in daemon mode (warm connections and cookies)
+        session = http_session()
         
         # First, make a request to the main page to get cookies
-        session.get('https://www.asahi.com/', headers=headers, timeout=10)
+        # (streamed and closed right away: only the cookies are needed). It goes
+        # through the host limiter too, so an open circuit skips both requests.
+        with host_slot('https://www.asahi.com/') as slot:
+            home = session.get('https://www.asahi.com/', headers=headers, timeout=10, stream=True)
+            slot.done(home.status_code, home.headers)
+            home.close()
         
         # Then request the article page
-        response = session.get(url, headers=headers, timeout=10)
+        # Honors Retry-After and pauses the host after 429/403/5xx (utils/host_limiter.py)
+        with host_slot(url) as slot:
+            response = session.get(url, headers=headers, timeout=10, stream=True)
+            slot.done(response.status_code, response.headers)
         
         if response.status_code == 200:
-            # Clean the HTML content
-            cleaned_content = clean_html_content(response.text)
+            # Bounded read, then clean the HTML content
+            html = read_html_sync(response, SOURCE_ID)
+            if not html:
+                return ""
+            cleaned_content = clean_html_content(html)
             return cleaned_content
         else:
+            response.close()
             print(f"Error fetching Asahi article content: HTTP {response.status_code} - {url}")
             return ""
             
@@ -221,42 +191,63 @@ async def fetch_news_async():
         print(f"Starting to fetch Asahi Shimbun news...")
         articles = await fetch_articles_from_rss()
         print(f"Found {len(articles)} articles. Fetching content...")
+        # Headlines-first page while the bodies are fetched (progressive mode only)
+        publish_headlines(articles, 'output/asahi_news_articles.html', RULES, 'Asahi Shimbun', 'ja')
         
         # Process articles one by one to be more gentle on the server
-        for i, article in enumerate(articles):
-            try:
-                print(f"Fetching article {i+1}/{len(articles)}: {article['title']}")
-                
-                # First, try to get the full content
-                content = await fetch_article_content(article['url'])
-                
-                # If no content was fetched or it's too short, use a robust fallback
-                # Use text length of stripped HTML to judge emptiness/too short
-                from bs4 import BeautifulSoup as _BS
-                text_len = len(_BS(content or "", 'html.parser').get_text().strip())
-                if not content or text_len < 60:  # accept shorter articles; fallback if < 60 chars
-                    print(f"Using fallback for: {article['title']}")
-                    summary_text = (article.get('summary') or '').strip()
-                    if summary_text:
-                        content = f"<p>{summary_text}</p>"
+        if headlines_only():
+            # Feed metadata only: no article page requests, no extraction
+            fill_headlines(articles, RULES)
+        else:
+            for i, article in enumerate(articles):
+                try:
+                    if article.content:
+                        # Full body supplied by the feed entry: no page fetch
+                        use_feed_body(article)
+                        continue
+                    # Body extracted by an earlier run: no page fetch, no delay
+                    content = seen_content(SOURCE_ID, article.url, article.guid)
+                    if content:
+                        article.content = content
+                        continue
+                    if deadline_passed():
+                        # Out of time: reuse the body cached by an earlier run, if any
+                        content = cached_content(SOURCE_ID, article.url)
                     else:
-                        # Last-resort fallback: non-empty body with link to the source
-                        content = (
-                            f"<p>本文を取得できませんでした。</p>"
-                            f"<p><a href=\"{article['url']}\" target=\"_blank\" rel=\"noopener\">記事を読む</a></p>"
-                        )
-                
-                article['content'] = content
-                
-                # Add a delay between requests
-                if i < len(articles) - 1:
-                    delay = random.uniform(2.0, 5.0)
-                    await asyncio.sleep(delay)
-                    
-            except Exception as e:
-                print(f"Error processing article {article['url']}: {str(e)}")
-                # Use the summary as fallback content
-                article['content'] = f"<p>{article.get('summary', 'No content available.')}</p>"
+                        print(f"Fetching article {i+1}/{len(articles)}: {article.title}")
+
+                        # First, try to get the full content
+                        content = await fetch_article_content(article.url)
+                        if content and text_length(content) >= RULES.min_text_length:
+                            remember(SOURCE_ID, article.url, content, article.guid)
+                        else:
+                            content = cached_content(SOURCE_ID, article.url) or content
+
+                    # If no content was fetched or it's too short, use a robust fallback
+                    # Use text length of stripped HTML to judge emptiness/too short
+                    if not content or text_length(content) < RULES.min_text_length:  # accept shorter articles
+                        print(f"Using fallback for: {article.title}")
+                        summary_text = article.summary.strip()
+                        if summary_text:
+                            content = f"<p>{summary_text}</p>"
+                        else:
+                            # Last-resort fallback: non-empty body with link to the source
+                            content = (
+                                f"<p>本文を取得できませんでした。</p>"
+                                f"<p><a href=\"{article.url}\" target=\"_blank\" rel=\"noopener\">記事を読む</a></p>"
+                            )
+
+                    article.content = content
+
+                    # Add a delay between requests
+                    if i < len(articles) - 1 and not deadline_passed():
+                        delay = random.uniform(2.0, 5.0)
+                        await asyncio.sleep(delay)
+
+                except Exception as e:
+                    print(f"Error processing article {article.url}: {str(e)}")
+                    # Use the summary as fallback content
+                    article.content = f"<p>{article.summary or 'No content available.'}</p>"
         
         return {
             'source': '朝日新聞',
@@ -275,39 +266,13 @@ def fetch_news():
 def save_to_html(data, filename_prefix='asahi_news'):
     """Save the scraped data to an HTML file."""
     try:
-        # Create output directory if it doesn't exist
-        os.makedirs('output', exist_ok=True)
-        
         # Generate filename without timestamp
         json_filename = f'output/{filename_prefix}_articles.json'
         html_filename = f'output/{filename_prefix}_articles.html'
         
-        # Prepare data in the format expected by convert_json_to_html
-        articles_data = []
-        for article in data.get('articles', []):
-            articles_data.append({
-                'title': article.get('title', ''),
-                'content': article.get('content', ''),
-                'source': '朝日新聞',
-                'url': article.get('url', ''),
-                'published': article.get('published', '')
-            })
-        
-        # Create the feed data structure
-        feed_data = {
-            'title': 'Asahi Shimbun',
-            'link': 'https://www.asahi.com/',
-            'description': 'Latest news from Asahi Shimbun',
-            'language': 'ja',
-            'items': articles_data
-        }
-        
-        # Save JSON file
-        with open(json_filename, 'w', encoding='utf-8') as f:
-            json.dump(feed_data, f, indent=2, ensure_ascii=False)
-        
-        # Convert to HTML
-        convert_json_to_html(json_filename, html_filename)
+        # Save JSON file and convert it to HTML (through the local wrapper)
+        save_articles(data.get('articles', []), json_filename, html_filename, 'Asahi Shimbun',
+                      'https://www.asahi.com/', 'Latest news from Asahi Shimbun', 'ja', convert_json_to_html)
         
         print(f"Data saved to {html_filename}")
         return html_filename
@@ -315,6 +280,14 @@ def save_to_html(data, filename_prefix='asahi_news'):
         print(f"Error saving to file: {e}")
         return None
 
+async def refresh():
+    """One full refresh writing output/ (daemon.py runs this in-process)."""
+    result = await fetch_news_async()
+    if 'error' not in result:
+        save_to_html(result, 'asahi_news')
+    return result
+
+
 if __name__ == "__main__":
     # Run the scraper
     result = asyncio.run(fetch_news_async())
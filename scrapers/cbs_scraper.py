@@ -1,70 +1,34 @@
 import asyncio
-import json
 import os
-import feedparser
 import ssl
-import pytz
-import aiohttp
-from bs4 import BeautifulSoup
-from readability import Document
-from datetime import datetime, timezone, timedelta
-import dateutil.parser
 import sys
 import os
 
 # Add parent directory to path to allow imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.convert_to_html import convert_json_to_html
+from utils.article import Article, save_articles
+from utils.article_cache import fallback_content, remember
+from utils.deadline import gather_until_deadline
+from utils.extractor import extract_main_content, get_extractor
+from utils.feeds import feed_body, page_or_feed_body, parse_feed
+from utils.http_fetch import fetch_page_async
+from utils.progressive import fill_headlines, headlines_only, publish_headlines
+from utils.site_rules import clean_html, get_rules
+from utils.timestamps import day_window, entry_timestamp, get_zone
 
 
 def clean_html_content(html_content):
-    """Clean HTML content by removing unwanted classes and elements."""
-    if not html_content:
-        return html_content
-        
-    soup = BeautifulSoup(html_content, 'html.parser')
-    
-    # Remove unwanted classes
-    unwanted_classes = [
-        'ad', 'advertisement', 'social-links', 'share-tools', 'related-links',
-        'newsletter-signup', 'comments-section', 'author-info', 'timestamp',
-        'recommended', 'trending', 'most-popular', 'video-container', 'gallery',
-        'newsletter', 'newsletter-signup', 'newsletter-form', 'newsletter-cta',
-        'content__meta', 'content__footer', 'content__related', 'content__tools','content-author'
-    ]
-    
-    for class_name in unwanted_classes:
-        for element in soup.find_all(class_=class_name):
-            element.decompose()
-    
-    # Remove script and style elements
-    for element in soup(['script', 'style', 'noscript', 'iframe', 'object', 'embed']):
-        element.decompose()
-
-    for elemet in soup.find_all(['a', 'u']):
-        elemet.unwrap()
-    
-    # Remove empty elements
-    for element in soup.find_all(True):
-        # Remove empty attributes
-        for attr in list(element.attrs.keys()):
-            if not element[attr]:
-                del element[attr]
-        
-        # Remove empty elements
-        if not element.get_text(strip=True) and not element.find_all(True):
-            element.decompose()
-    
-    # Clean up figure and figcaption
-    for figure in soup.find_all('figure'):
-        if not figure.find('img') and not figure.find('video'):
-            figure.decompose()
-    
-    return str(soup)
+    """Clean HTML content with the CBS site rules (config/rules/cbs.json)."""
+    return clean_html(html_content, RULES)
 
 # RSS feed for CBS News
 RSS_FEED = "https://www.cbsnews.com/latest/rss/main"
 
+# Main-content extractor ('readability' or 'native'), see utils/extractor.py
+SOURCE_ID = 'cbs'
+EXTRACTOR = get_extractor(SOURCE_ID)
+RULES = get_rules(SOURCE_ID)
+
 # Create unverified SSL context
 ssl._create_default_https_context = ssl._create_unverified_context
 
@@ -77,21 +41,23 @@ async def fetch_article_content(url):
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
         
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers, ssl=False) as response:
-                if response.status == 200:
-                    html = await response.text()
-                    # Extract main content using Readability
-                    doc = Document(html)
-                    content = doc.summary()
+        # Host limiter, circuit breaker and (opt-in) hedging, see utils/http_fetch.py
+        status, page = await fetch_page_async(url, SOURCE_ID, headers)
+        if status != 200:
+            print(f"Failed to fetch {url}: {status}")
+            return f"[Failed to load content: HTTP {status}]"
+        # Bounded read: oversized or non-HTML responses are aborted
+        if page is None:
+            return "[Failed to load content: too large or not HTML]"
+        # Extract main content using Readability
+        # Raw bytes go straight to lxml with the detected charset
+        body, charset = page
+        content = extract_main_content(body, EXTRACTOR, 'en', SOURCE_ID, charset)
 
-                    # Clean the HTML content
-                    content = clean_html_content(content)
-                    
-                    return content
-                else:
-                    print(f"Failed to fetch {url}: {response.status}")
-                    return f"[Failed to load content: HTTP {response.status}]"
+        # Clean the HTML content
+        content = clean_html_content(content)
+        
+        return content
     except Exception as e:
         print(f"Error fetching article {url}: {str(e)}")
         return f"[Error: {str(e)}]"
@@ -101,40 +67,24 @@ def fetch_articles_from_rss():
     print(f"\nFetching CBS News feed: {RSS_FEED}")
     
     # Get current time in Eastern Time
-    eastern = pytz.timezone('US/Eastern')
-    now = datetime.now(eastern)
-    yesterday = (now - timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=eastern)
+    eastern = get_zone('US/Eastern')
+    yesterday, now = day_window(eastern)
     
     articles = []
     
     try:
-        feed = feedparser.parse(RSS_FEED)
+        feed = parse_feed(RSS_FEED, SOURCE_ID, since=yesterday)
         print(f"Feed status: {feed.get('status')}")
         print(f"Number of entries: {len(feed.entries)}")
         
         for entry in feed.entries:
-            # Skip if no publication date
-            if not hasattr(entry, 'published_parsed'):
+            # Skip if no publication date (dates without a zone are Eastern)
+            pub_date = entry_timestamp(entry, eastern, fields=('published',))
+            if pub_date is None:
                 continue
                 
-            # Parse publication date
-            try:
-                pub_date_str = entry.get('published', '')
-                if not pub_date_str and hasattr(entry, 'published_parsed'):
-                    pub_date = datetime(*entry.published_parsed[:6], tzinfo=timezone.utc)
-                else:
-                    pub_date = dateutil.parser.parse(pub_date_str)
-                
-                # Ensure timezone info
-                if pub_date.tzinfo is None:
-                    pub_date = eastern.localize(pub_date)
-                
-                # Only include articles from yesterday until now
-                if pub_date < yesterday or pub_date > now:
-                    continue
-                    
-            except Exception as e:
-                print(f"Error parsing date for article: {str(e)}")
+            # Only include articles from yesterday until now
+            if pub_date < yesterday or pub_date > now:
                 continue
                 
             # Skip video content and non-news articles
@@ -160,15 +110,13 @@ def fetch_articles_from_rss():
                         break
             
             # Add to articles list
-            articles.append({
-                'title': entry.get('title', 'No title'),
-                'link': article_url,
-                'source': 'CBS News',
-                'pub_time': pub_date.isoformat(),
-                'description': entry.get('description', ''),
-                'image_url': image_url,
-                'content': ''  # Will be filled later
-            })
+            articles.append(Article(
+                entry.get('title', 'No title'), article_url, 'CBS News', SOURCE_ID, pub_date, 'en',
+                summary=entry.get('description', ''),
+                guid=entry.get('id', ''),
+                image_url=image_url,
+                content=feed_body(entry, RULES)  # Full body from the feed, else filled later
+            ))
             
     except Exception as e:
         print(f"Error fetching RSS feed: {str(e)}")
@@ -182,44 +130,40 @@ async def fetch_news():
     # Fetch article metadata
     articles = fetch_articles_from_rss()
     print(f"\nFound {len(articles)} articles in total")
+    # Headlines-first page while the bodies are fetched (progressive mode only)
+    publish_headlines(articles, 'output/cbs_news_articles.html', RULES, 'CBS News', 'en')
+    
+    if headlines_only():
+        # Feed metadata only: no article page requests, no extraction
+        fill_headlines(articles, RULES)
+    else:
+        # Fetch article content for each article
+        print("\nExtracting article content...")
+        tasks = [page_or_feed_body(article, fetch_article_content, article.url) for article in articles]
+        # Fetches still running at the region deadline are cancelled (None)
+        contents = await gather_until_deadline(tasks, SOURCE_ID)
+
+        # Update articles with their content
+        for i, content in enumerate(contents):
+            if i < len(articles):
+                if not isinstance(content, str) or content.startswith('[Failed') or content.startswith('[Error'):
+                    # Page unavailable or deadline reached: cached body, else the RSS summary if any
+                    content = (fallback_content(articles[i].url, articles[i].summary, RULES)
+                               or (content if isinstance(content, str) else "[Failed to load content: deadline]"))
+                else:
+                    remember(SOURCE_ID, articles[i].url, content, articles[i].guid)
+                articles[i].content = content
     
-    # Fetch article content for each article
-    print("\nExtracting article content...")
-    tasks = [fetch_article_content(article['link']) for article in articles]
-    contents = await asyncio.gather(*tasks)
-    
-    # Update articles with their content
-    for i, content in enumerate(contents):
-        if i < len(articles):
-            articles[i]['content'] = content
-    
-    # Create feed object
-    feed_object = {
-        "title": "CBS News",
-        "link": "https://www.cbsnews.com/",
-        "description": "Latest news from CBS News",
-        "items": articles
-    }
-    
-    # Save articles to a JSON file
-    os.makedirs('output', exist_ok=True)
-    json_file = 'output/cbs_news_articles.json'
-    html_file = 'output/cbs_news_articles.html'
-    
-    # Save the articles to a JSON file
-    with open(json_file, 'w', encoding='utf-8') as f:
-        json.dump(feed_object, f, ensure_ascii=False, indent=2)
-    
-    print(f"\nJSON file saved to: {os.path.abspath(json_file)}")
-    
-    # Convert the JSON to HTML
-    convert_json_to_html(json_file, html_file)
-    print(f"HTML file saved to: {os.path.abspath(html_file)}")
-    
-    return feed_object
+    # Save the articles as JSON and convert them to HTML
+    return save_articles(articles, 'output/cbs_news_articles.json', 'output/cbs_news_articles.html',
+                         "CBS News", "https://www.cbsnews.com/", "Latest news from CBS News")
+
+async def refresh():
+    """One full refresh writing output/ (daemon.py runs this in-process)."""
+    return await fetch_news()
+
 
 if __name__ == "__main__":
-    import aiohttp
     result = asyncio.run(fetch_news())
     try:
         items = (result or {}).get('items') or (result or {}).get('articles') or []
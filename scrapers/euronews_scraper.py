@@ -2,19 +2,25 @@ import asyncio
 import json
 import os
 import sys
-import feedparser
-import requests
 import re
 import time
 import random
 from datetime import datetime, timezone
-import dateutil.parser
 from bs4 import BeautifulSoup
-from readability import Document
 
 # Add parent directory to path to import utils
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.article import Article, save_articles
+from utils.article_cache import cached_content, remember, seen_content
 from utils.convert_to_html import convert_json_to_html as base_convert_json_to_html
+from utils.deadline import deadline_passed
+from utils.extractor import extract_main_content, get_extractor
+from utils.feeds import feed_body, parse_feed, use_feed_body
+from utils.host_limiter import host_slot
+from utils.http_fetch import ACCEPT_ENCODING, http_session, read_html_sync
+from utils.progressive import fill_headlines, headlines_only, publish_headlines
+from utils.site_rules import clean_html, get_rules, select_content, text_length
+from utils.timestamps import entry_timestamp
 
 
 def convert_json_to_html(json_file, output_file):
@@ -47,154 +53,37 @@ def convert_json_to_html(json_file, output_file):
 
 
 def clean_html_content(html_content: str) -> str:
-    """Clean article HTML using Readability then strip noisy elements."""
+    """Extract the main content, then clean it with the Euronews site rules (config/rules/euronews.json)."""
     if not html_content:
         return html_content
     try:
-        doc = Document(html_content)
-        content_html = doc.summary()
-
-        soup = BeautifulSoup(content_html, 'html.parser')
-
-        # Remove scripts, styles, media, utility blocks
-        for el in soup(["script", "style", "iframe", "nav", "footer", "img", "picture", "figure", "video", "audio"]):
-            el.decompose()
-
-        for el in soup.find_all(['a', 'u']):
-            el.unwrap()
-
-        # Remove obvious share/utility containers
-        def _cls(x):
-            try:
-                return (x and ('share' in x or 'sns' in x or 'related' in x or 'advertisement' in x.lower() or 'utility' in x))
-            except Exception:
-                return False
-        for div in soup.find_all("div", class_=_cls):
-            div.decompose()
-
-        # Remove generic ad containers often present on Euronews
-        for div in soup.find_all('div', class_=lambda x: x and ('c-ad' in x)):
-            div.decompose()
-
-        # Remove contributor and publication date blocks
-        for p in soup.find_all('p', class_=lambda x: x and ('c-article-contributors' in x)):
-            p.decompose()
-        for p in soup.find_all('p', class_=lambda x: x and ('c-article-publication-date' in x)):
-            p.decompose()
-        for d in soup.find_all('div', class_=lambda x: x and ('o-article-newsy__contributors-publication-date' in x)):
-            d.decompose()
-
-        # Remove standalone ad label spans like PUBLICITÉ
-        for sp in soup.find_all('span'):
-            t = sp.get_text(strip=True)
-            if not t:
-                continue
-            t_simple = t.replace('\xa0', ' ').strip()
-            t_fold = t_simple.casefold()
-            if t_fold in ('publicité', 'publicite'):
-                sp.decompose()
-
-        # Unwrap any stray <body> inserted by Readability
-        for b in soup.find_all('body'):
-            b.unwrap()
-
-        # Remove empty paragraphs and tag paragraphs for styling
-        for p in soup.find_all('p'):
-            if not p.get_text().strip():
-                p.decompose()
-            else:
-                p['class'] = p.get('class', []) + ['article-paragraph']
-
-        # Prepend original summary header if available (Euronews: h2.c-article-summary)
-        try:
-            orig = BeautifulSoup(html_content, 'html.parser')
-            sum_h2 = orig.find('h2', class_=lambda x: x and ('c-article-summary' in x))
-            if sum_h2:
-                frag = BeautifulSoup(str(sum_h2), 'html.parser')
-                soup.insert(0, frag)
-        except Exception:
-            pass
-
-        # Drop any remaining empty nodes
-        for el in soup.find_all():
-            if not el.get_text().strip() and not el.find_all():
-                el.decompose()
-
-        return str(soup)
+        content_html = extract_main_content(html_content, EXTRACTOR, 'fr', SOURCE_ID)
+        return clean_html(content_html, RULES, page_html=html_content)
     except Exception as e:
         print(f"Error cleaning HTML content: {e}")
         return "[Error processing content]"
 
 
-# UTF-8 only character decoding
-
-def _decode_response_utf8(resp) -> str:
-    try:
-        # Avoid advertising Brotli to keep decoding simple; requests handles gzip/deflate
-        raw = resp.content
-        # Force UTF-8 only. Use 'replace' to avoid exceptions but never change charset.
-        return raw.decode('utf-8', errors='replace')
-    except Exception:
-        try:
-            return resp.text  # requests may already have decoded as utf-8
-        except Exception:
-            return ""
-
-
 def _extract_paragraphs_from_html(html: str) -> str:
-    try:
-        soup = BeautifulSoup(html, 'html.parser')
-        main = (
-            soup.find('div', class_=lambda x: x and ('c-article-content' in x or 'js-article-content' in x))
-            or soup.find('article')
-            or soup.find('main')
-            or soup
-        )
-        ps = main.find_all('p')
-        out = []
-        for p in ps:
-            txt = p.get_text(strip=True)
-            if len(txt) >= 40:
-                p['class'] = p.get('class', []) + ['article-paragraph']
-                out.append(p)
-        if out:
-            container = soup.new_tag('div')
-            for p in out:
-                container.append(p)
-            return str(container)
-        return ""
-    except Exception:
-        return ""
+    """Collect long paragraphs from the article container named in the site rules."""
+    return select_content(html, RULES)
 
 
-def _fetch_amp_content(session, headers, url: str) -> str:
+def _fetch_amp_content(session, headers, html: str) -> str:
     try:
-        r0 = session.get(url, headers=headers, timeout=12)
-        h0 = _decode_response_utf8(r0)
-        s0 = BeautifulSoup(h0, 'html.parser')
+        # The amphtml link comes from the article page we already downloaded
+        s0 = BeautifulSoup(html, 'html.parser')
         link = s0.find('link', rel=lambda x: x and ('amphtml' in x))
         if not link:
             return ""
         amp = link.get('href')
         if not amp:
             return ""
-        r = session.get(amp, headers=headers, timeout=12)
-        h = _decode_response_utf8(r)
-        s = BeautifulSoup(h, 'html.parser')
-        main = s.find('main') or s.find('article') or s
-        ps = main.find_all('p')
-        out = []
-        for p in ps:
-            txt = p.get_text(strip=True)
-            if len(txt) >= 40:
-                p['class'] = p.get('class', []) + ['article-paragraph']
-                out.append(p)
-        if out:
-            container = s.new_tag('div')
-            for p in out:
-                container.append(p)
-            return str(container)
-        return ""
+        with host_slot(amp) as slot:
+            r = session.get(amp, headers=headers, timeout=12, stream=True)
+            slot.done(r.status_code, r.headers)
+        h = read_html_sync(r, SOURCE_ID) or ""
+        return select_content(h, RULES, selectors=AMP_CONTENT_SELECTORS)
     except Exception:
         return ""
 
@@ -202,10 +91,18 @@ def _fetch_amp_content(session, headers, url: str) -> str:
 # Euronews FR RSS
 RSS_FEED = "https://fr.euronews.com/rss?format=mrss&level=theme&name=news"
 
+# Main-content extractor ('readability' or 'native'), see utils/extractor.py
+SOURCE_ID = 'euronews'
+EXTRACTOR = get_extractor(SOURCE_ID)
+RULES = get_rules(SOURCE_ID)
+
+# AMP pages have no Euronews classes, only the generic containers
+AMP_CONTENT_SELECTORS = ['main', 'article']
+
 
 async def fetch_articles_from_rss():
     """Fetch article metadata from Euronews FR RSS feed (UTF-8 pipeline)."""
-    feed = feedparser.parse(RSS_FEED)
+    feed = parse_feed(RSS_FEED, SOURCE_ID, limit=10)
     articles = []
 
     entries = feed.entries if hasattr(feed, 'entries') else []
@@ -213,20 +110,9 @@ async def fetch_articles_from_rss():
     for entry in entries[:10]:
         try:
             # published/pubDate handling
-            published_iso = None
-            date_fields = ['published', 'pubDate', 'dc:date', 'dc_date', 'updated']
-            for field in date_fields:
-                if hasattr(entry, field):
-                    try:
-                        dt = dateutil.parser.parse(getattr(entry, field))
-                        if dt.tzinfo is None:
-                            dt = dt.replace(tzinfo=timezone.utc)
-                        published_iso = dt.isoformat()
-                        break
-                    except Exception:
-                        continue
-            if not published_iso:
-                published_iso = datetime.now(timezone.utc).isoformat()
+            published = entry_timestamp(entry)
+            if not published:
+                published = datetime.now(timezone.utc)
 
             # summary/description
             summary_html = entry.get('summary', '')
@@ -254,15 +140,13 @@ async def fetch_articles_from_rss():
             if '/video/' in link:
                 continue
 
-            articles.append({
-                'title': entry.get('title', 'No title'),
-                'url': link,
-                'published': published_iso,
-                'source': 'Euronews',
-                'summary': summary_text,
-                'image': image_url,
-                'language': 'fr'
-            })
+            articles.append(Article(
+                entry.get('title', 'No title'), link, 'Euronews', SOURCE_ID, published, 'fr',
+                summary=summary_text,
+                guid=entry.get('id', ''),
+                image_url=image_url,
+                content=feed_body(entry, RULES)  # Full body from the feed, else fetched
+            ))
         except Exception as e:
             print(f"Error processing Euronews article: {e}")
 
@@ -270,7 +154,7 @@ async def fetch_articles_from_rss():
 
 
 def fetch_article_content_sync(url: str) -> str:
-    """Synchronously fetch and extract article content enforcing UTF-8-only decoding."""
+    """Synchronously fetch and extract article content (charset from headers/<meta>, UTF-8 default)."""
     try:
         user_agents = [
             'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/127.0.0.0 Safari/537.36',
@@ -281,8 +165,8 @@ def fetch_article_content_sync(url: str) -> str:
             'User-Agent': random.choice(user_agents),
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
             'Accept-Language': 'fr-FR,fr;q=0.9,en-US;q=0.8,en;q=0.7',
-            # Avoid Brotli to keep character decoding strictly UTF-8 from raw bytes
-            'Accept-Encoding': 'gzip, deflate',
+            # br/zstd/gzip are decompressed in utils/http_fetch.py before charset decoding
+            'Accept-Encoding': ACCEPT_ENCODING,
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1',
             'Cache-Control': 'max-age=0',
@@ -293,27 +177,33 @@ def fetch_article_content_sync(url: str) -> str:
         # Random human-like delay
         time.sleep(random.uniform(1.0, 2.5))
 
-        session = requests.Session()
-        session.get('https://fr.euronews.com/', headers=headers, timeout=12)
-        resp = session.get(url, headers=headers, timeout=12)
+        # Kept between refreshes in daemon mode (warm connections and cookies)
+        session = http_session()
+        # Only the cookies of the home page are needed, not its body. It counts
+        # against the host too: an open circuit skips both requests.
+        with host_slot('https://fr.euronews.com/') as slot:
+            home = session.get('https://fr.euronews.com/', headers=headers, timeout=12, stream=True)
+            slot.done(home.status_code, home.headers)
+            home.close()
+        # Honors Retry-After and pauses the host after 429/403/5xx (utils/host_limiter.py)
+        with host_slot(url) as slot:
+            resp = session.get(url, headers=headers, timeout=12, stream=True)
+            slot.done(resp.status_code, resp.headers)
         if resp.status_code == 200:
-            html = _decode_response_utf8(resp)
+            # Shared decoder: header/BOM/<meta> charset, strict with counted replacements
+            html = read_html_sync(resp, SOURCE_ID) or ""
             cleaned = clean_html_content(html)
-            from bs4 import BeautifulSoup as _BS
-            txt = _BS(cleaned or "", 'html.parser').get_text(" ", strip=True)
-            if len(txt) < 160:
-                amp_body = _fetch_amp_content(session, headers, url)
+            if text_length(cleaned) < RULES.min_content_length:
+                # AMP and paragraph fallbacks only return bodies of at least min_content_length
+                amp_body = _fetch_amp_content(session, headers, html)
                 if amp_body:
-                    txt2 = _BS(amp_body, 'html.parser').get_text(" ", strip=True)
-                    if len(txt2) >= 160:
-                        return amp_body
+                    return amp_body
                 para_body = _extract_paragraphs_from_html(html)
                 if para_body:
-                    txt3 = _BS(para_body, 'html.parser').get_text(" ", strip=True)
-                    if len(txt3) >= 160:
-                        return para_body
+                    return para_body
             return cleaned
         else:
+            resp.close()
             print(f"Error fetching Euronews article content: HTTP {resp.status_code} - {url}")
             return ""
     except Exception as e:
@@ -333,33 +223,54 @@ async def fetch_news_async():
         print("Starting to fetch Euronews FR news (UTF-8-only)...")
         articles = await fetch_articles_from_rss()
         print(f"Found {len(articles)} articles. Fetching content...")
+        # Headlines-first page while the bodies are fetched (progressive mode only)
+        publish_headlines(articles, 'output/euronews_utf8_articles.html', RULES, 'Euronews (FR)', 'fr')
 
-        for i, article in enumerate(articles):
-            try:
-                print(f"Fetching article {i+1}/{len(articles)}: {article['title']}")
-                content = await fetch_article_content(article['url'])
-
-                from bs4 import BeautifulSoup as _BS
-                text_len = len(_BS(content or "", 'html.parser').get_text().strip())
-                if not content or text_len < 60:
-                    summary_text = (article.get('summary') or '').strip()
-                    if summary_text:
-                        content = f"<p>{summary_text}</p>"
+        if headlines_only():
+            # Feed metadata only: no article page requests, no extraction
+            fill_headlines(articles, RULES)
+        else:
+            for i, article in enumerate(articles):
+                try:
+                    if article.content:
+                        # Full body supplied by the feed entry: no page fetch
+                        use_feed_body(article)
+                        continue
+                    # Body extracted by an earlier run: no page fetch, no delay
+                    content = seen_content(SOURCE_ID, article.url, article.guid)
+                    if content:
+                        article.content = content
+                        continue
+                    if deadline_passed():
+                        # Out of time: reuse the body cached by an earlier run, if any
+                        content = cached_content(SOURCE_ID, article.url)
                     else:
-                        content = (
-                            f"<p>Contenu complet indisponible.</p>"
-                            f"<p><a href=\"{article['url']}\" target=\"_blank\" rel=\"noopener\">Lire l'article</a></p>"
-                        )
-
-                article['content'] = content
-
-                # Gentle delay
-                if i < len(articles) - 1:
-                    await asyncio.sleep(random.uniform(1.5, 3.0))
-
-            except Exception as e:
-                print(f"Error processing article {article['url']}: {str(e)}")
-                article['content'] = f"<p>{article.get('summary', 'No content available.')}</p>"
+                        print(f"Fetching article {i+1}/{len(articles)}: {article.title}")
+                        content = await fetch_article_content(article.url)
+                        if content and text_length(content) >= RULES.min_text_length:
+                            remember(SOURCE_ID, article.url, content, article.guid)
+                        else:
+                            content = cached_content(SOURCE_ID, article.url) or content
+
+                    if not content or text_length(content) < RULES.min_text_length:
+                        summary_text = article.summary.strip()
+                        if summary_text:
+                            content = f"<p>{summary_text}</p>"
+                        else:
+                            content = (
+                                f"<p>Contenu complet indisponible.</p>"
+                                f"<p><a href=\"{article.url}\" target=\"_blank\" rel=\"noopener\">Lire l'article</a></p>"
+                            )
+
+                    article.content = content
+
+                    # Gentle delay
+                    if i < len(articles) - 1 and not deadline_passed():
+                        await asyncio.sleep(random.uniform(1.5, 3.0))
+
+                except Exception as e:
+                    print(f"Error processing article {article.url}: {str(e)}")
+                    article.content = f"<p>{article.summary or 'No content available.'}</p>"
 
         return {
             'source': 'Euronews',
@@ -381,34 +292,11 @@ def fetch_news():
 def save_to_html(data, filename_prefix='euronews_utf8'):
     """Save the scraped data to an HTML file (UTF-8-only pipeline)."""
     try:
-        os.makedirs('output', exist_ok=True)
         json_filename = f'output/{filename_prefix}_articles.json'
         html_filename = f'output/{filename_prefix}_articles.html'
 
-        # Prepare data for converter
-        articles_data = []
-        for article in data.get('articles', []):
-            articles_data.append({
-                'title': article.get('title', ''),
-                'content': article.get('content', ''),
-                'source': 'Euronews',
-                'url': article.get('url', ''),
-                'published': article.get('published', ''),
-                'language': 'fr'
-            })
-
-        feed_data = {
-            'title': 'Euronews (FR)',
-            'link': 'https://fr.euronews.com/',
-            'description': 'Dernières actualités de Euronews',
-            'language': 'fr',
-            'items': articles_data
-        }
-
-        with open(json_filename, 'w', encoding='utf-8') as f:
-            json.dump(feed_data, f, indent=2, ensure_ascii=False)
-
-        convert_json_to_html(json_filename, html_filename)
+        save_articles(data.get('articles', []), json_filename, html_filename, 'Euronews (FR)',
+                      'https://fr.euronews.com/', 'Dernières actualités de Euronews', 'fr', convert_json_to_html)
         print(f"Data saved to {html_filename}")
         return html_filename
     except Exception as e:
@@ -416,6 +304,15 @@ def save_to_html(data, filename_prefix='euronews_utf8'):
         return None
 
 
+async def refresh():
+    """One full refresh writing output/ (daemon.py runs this in-process)."""
+    result = await fetch_news_async()
+    if 'error' not in result:
+        save_to_html(result, 'euronews_utf8')
+    return result
+
+
+
 if __name__ == "__main__":
     result = asyncio.run(fetch_news_async())
     try:
@@ -1,58 +1,33 @@
 import asyncio
-import json
 import os
 import sys
-import feedparser
 import ssl
-import pytz
-from bs4 import BeautifulSoup
-from readability import Document
-from datetime import datetime, timezone, timedelta
-import dateutil.parser
 import aiohttp
 import random
-import asyncio as _asyncio
 
 # Add parent directory to path to allow imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.convert_to_html import convert_json_to_html
+from utils.article import Article, save_articles
+from utils.article_cache import fallback_content, remember
+from utils.circuit_breaker import HostUnavailable
+from utils.deadline import gather_until_deadline
+from utils.extractor import extract_main_content, get_extractor
+from utils.feeds import feed_body, page_or_feed_body, parse_feed
+from utils.http_fetch import fetch_page_async
+from utils.progressive import fill_headlines, headlines_only, publish_headlines
+from utils.site_rules import clean_html, get_rules, text_length
+from utils.timestamps import entry_timestamp
 
 def save_to_html(data, filename_prefix='kyodo_news'):
     """Save the scraped data to an HTML file."""
     try:
-        # Create output directory if it doesn't exist
-        os.makedirs('output', exist_ok=True)
-        
         # Generate filename without timestamp
         json_filename = f'output/{filename_prefix}_articles.json'
         html_filename = f'output/{filename_prefix}_articles.html'
         
-        # Prepare data in the format expected by convert_json_to_html
-        articles_data = []
-        for article in data.get('articles', []):
-            articles_data.append({
-                'title': article.get('title', ''),
-                'content': article.get('content', ''),
-                'source': '共同通信',
-                'url': article.get('url', ''),
-                'published': article.get('published', '')
-            })
-        
-        # Create the feed data structure
-        feed_data = {
-            'title': 'Kyodo News',
-            'link': 'https://www.kyodo.co.jp/',
-            'description': 'Latest news from Kyodo News',
-            'language': 'ja',
-            'items': articles_data
-        }
-        
-        # Save JSON file
-        with open(json_filename, 'w', encoding='utf-8') as f:
-            json.dump(feed_data, f, indent=2, ensure_ascii=False)
-        
-        # Convert to HTML
-        convert_json_to_html(json_filename, html_filename)
+        # Save JSON file and convert it to HTML
+        save_articles(data.get('articles', []), json_filename, html_filename, 'Kyodo News',
+                      'https://www.kyodo.co.jp/', 'Latest news from Kyodo News', 'ja')
         
         print(f"Data saved to {html_filename}")
         return html_filename
@@ -61,70 +36,43 @@ def save_to_html(data, filename_prefix='kyodo_news'):
         return None
 
 def clean_html_content(html_content):
-    """Clean HTML content by removing unwanted elements."""
-    if not html_content:
-        return html_content
-    
-    soup = BeautifulSoup(html_content, 'html.parser')
-    
-    # Remove script, style, navigation, and media elements
-    for element in soup(["script", "style", "iframe", "nav", "footer", "img", "picture", "figure", "video", "audio"]):
-        element.decompose()
-    
-    # Remove share and social media elements
-    for div in soup.find_all("div", class_=lambda x: x and ('share' in x or 'sns' in x or 'related' in x or 'advertisement' in x.lower())):
-        div.decompose()
-    
-    # Unwrap anchor/underline and common formatting wrappers (keep text only)
-    for tag in soup.find_all(["a", "u", "strong", "b", "em", "i", "span", "font"]):
-        tag.unwrap()
-
-    # Strip all attributes from remaining tags for cleaner HTML
-    for el in soup.find_all(True):
-        el.attrs = {}
-
-    # Remove empty elements (no text and no child tags)
-    removed = True
-    while removed:
-        removed = False
-        for el in list(soup.find_all(True)):
-            if not el.get_text(strip=True) and not el.find(True):
-                el.decompose()
-                removed = True
-    
-    return str(soup)
+    """Clean HTML content with the Kyodo site rules (config/rules/kyodo.json)."""
+    return clean_html(html_content, RULES)
 
 # RSS feed for Kyodo News (共同通信)
 RSS_FEED = "https://www.kyodo.co.jp/feed/"
 
+# Main-content extractor ('readability' or 'native'), see utils/extractor.py
+SOURCE_ID = 'kyodo'
+EXTRACTOR = get_extractor(SOURCE_ID)
+RULES = get_rules(SOURCE_ID)
+
 async def fetch_articles_from_rss():
     """Fetch article metadata from Kyodo News RSS feed."""
     if hasattr(ssl, '_create_unverified_context'):
         ssl._create_default_https_context = ssl._create_unverified_context
     
-    feed = feedparser.parse(RSS_FEED)
+    feed = parse_feed(RSS_FEED, SOURCE_ID, limit=10)
     articles = []
     
     for entry in feed.entries[:10]:  # Get latest 10 articles
         try:
-            published = dateutil.parser.parse(entry.published)
-            
-            if published.tzinfo is None:
-                published = published.replace(tzinfo=timezone.utc)
+            published = entry_timestamp(entry, fields=('published',))
+            if published is None:
+                raise ValueError('no publication date')
             
             # Extract image if available
             image_url = ''
             if 'media_content' in entry and len(entry.media_content) > 0:
                 image_url = entry.media_content[0]['url']
             
-            articles.append({
-                'title': entry.title,
-                'url': entry.link,
-                'published': published.isoformat(),
-                'source': '共同通信',
-                'summary': entry.get('summary', ''),
-                'image': image_url
-            })
+            articles.append(Article(
+                entry.title, entry.link, '共同通信', SOURCE_ID, published, 'ja',
+                summary=entry.get('summary', ''),
+                guid=entry.get('id', ''),
+                image_url=image_url,
+                content=feed_body(entry, RULES)  # Full body from the feed, else fetched
+            ))
         except Exception as e:
             print(f"Error processing Kyodo article: {e}")
     
@@ -141,29 +89,32 @@ async def fetch_article_content(url):
         ]
         timeout = aiohttp.ClientTimeout(total=20)
 
-        # up to 3 attempts, backoff if empty or error
+        # up to 3 attempts if empty or error
         for attempt in range(3):
             headers = {
                 'User-Agent': random.choice(uas),
                 'Accept-Language': 'ja-JP,ja;q=0.9,en-US;q=0.8,en;q=0.7'
             }
             try:
-                async with aiohttp.ClientSession(timeout=timeout) as session:
-                    async with session.get(url, headers=headers, ssl=False) as response:
-                        if response.status >= 400:
-                            await _asyncio.sleep(0.4 * (attempt + 1))
-                            continue
-                        html = await response.text()
-                doc = Document(html)
-                content = doc.summary() or ''
+                # Host limiter (pauses after 429/403/5xx), circuit breaker and opt-in hedging
+                status, page = await fetch_page_async(url, SOURCE_ID, headers, timeout)
+                if status >= 400:
+                    continue
+                if page is None:
+                    # Oversized or non-HTML; retrying would not help
+                    return ""
+                body, charset = page
+                content = extract_main_content(body, EXTRACTOR, 'ja', SOURCE_ID, charset) or ''
                 cleaned_content = clean_html_content(content)
-                # consider non-trivial when text length >= 60
-                text_len = len(BeautifulSoup(cleaned_content, 'html.parser').get_text().strip())
-                if text_len >= 60:
+                # consider non-trivial when text reaches the site's min_text_length
+                if text_length(cleaned_content) >= RULES.min_text_length:
                     return cleaned_content
+            except HostUnavailable as e:
+                # Circuit open or long Retry-After: fail fast to the RSS summary
+                print(f"Skipping {url}: {e}")
+                return ""
             except Exception:
-                # wait and retry
-                await _asyncio.sleep(0.4 * (attempt + 1))
+                # retry; errors already paused the host in the limiter
                 continue
         # if all retries failed or trivial, return empty string
         return ""
@@ -175,14 +126,23 @@ async def fetch_news_async():
     """Main async function to fetch Kyodo news."""
     try:
         articles = await fetch_articles_from_rss()
-        tasks = [fetch_article_content(article['url']) for article in articles]
-        contents = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        for i, content in enumerate(contents):
-            if isinstance(content, str):
-                articles[i]['content'] = content
-            else:
-                articles[i]['content'] = ""
+        # Headlines-first page while the bodies are fetched (progressive mode only)
+        publish_headlines(articles, 'output/kyodo_news_articles.html', RULES, 'Kyodo News', 'ja')
+        if headlines_only():
+            # Feed metadata only: no article page requests, no extraction
+            fill_headlines(articles, RULES)
+        else:
+            tasks = [page_or_feed_body(article, fetch_article_content, article.url) for article in articles]
+            # Fetches still running at the region deadline are cancelled (None)
+            contents = await gather_until_deadline(tasks, SOURCE_ID)
+
+            for i, content in enumerate(contents):
+                if isinstance(content, str) and content:
+                    articles[i].content = content
+                    remember(SOURCE_ID, articles[i].url, content, articles[i].guid)
+                else:
+                    # Page unavailable or deadline reached: cached body, else the RSS summary
+                    articles[i].content = fallback_content(articles[i].url, articles[i].summary, RULES)
         
         return {
             'source': '共同通信',
@@ -200,43 +160,27 @@ def fetch_news():
 def save_to_file(data, filename_prefix='kyodo_news'):
     """Save the scraped data to a JSON file."""
     try:
-        # Create output directory if it doesn't exist
-        os.makedirs('output', exist_ok=True)
-        
         # Generate filenames without timestamp
         json_filename = f'output/{filename_prefix}_articles.json'
         html_filename = f'output/{filename_prefix}_articles.html'
 
-        # Map 'articles' to the feed schema expected by convert_json_to_html ('items')
-        articles_data = []
-        for article in data.get('articles', []):
-            articles_data.append({
-                'title': article.get('title', ''),
-                'content': article.get('content', ''),
-                'source': article.get('source', '共同通信'),
-                'url': article.get('url', ''),
-                'published': article.get('published', ''),
-                'language': article.get('language', 'ja')
-            })
-
-        feed_data = {
-            'title': 'Kyodo News',
-            'link': 'https://www.kyodo.co.jp/',
-            'description': 'Latest news from Kyodo News',
-            'language': 'ja',
-            'items': articles_data
-        }
-
         # Save JSON then convert to HTML
-        with open(json_filename, 'w', encoding='utf-8') as f:
-            json.dump(feed_data, f, indent=2, ensure_ascii=False)
-        convert_json_to_html(json_filename, html_filename)
+        save_articles(data.get('articles', []), json_filename, html_filename, 'Kyodo News',
+                      'https://www.kyodo.co.jp/', 'Latest news from Kyodo News', 'ja')
         print(f"Data saved to {html_filename}")
         return html_filename
     except Exception as e:
         print(f"Error saving to file: {e}")
         return None
 
+async def refresh():
+    """One full refresh writing output/ (daemon.py runs this in-process)."""
+    result = await fetch_news_async()
+    if 'error' not in result:
+        save_to_html(result, 'kyodo_news')
+    return result
+
+
 if __name__ == "__main__":
     # Run the scraper
     result = asyncio.run(fetch_news_async())
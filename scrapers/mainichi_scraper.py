@@ -2,21 +2,27 @@ import asyncio
 import json
 import os
 import sys
-import feedparser
 import aiohttp
 import ssl
 import re
 import time
 import random
-import requests
 from datetime import datetime, timezone
-import dateutil.parser
 from bs4 import BeautifulSoup
-from readability import Document
 
 # Add parent directory to path to import utils
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.article import Article, save_articles
+from utils.article_cache import cached_content, remember, seen_content
 from utils.convert_to_html import convert_json_to_html as base_convert_json_to_html
+from utils.deadline import deadline_passed
+from utils.extractor import extract_main_content, get_extractor
+from utils.feeds import feed_body, parse_feed, use_feed_body
+from utils.host_limiter import host_slot
+from utils.http_fetch import ACCEPT_ENCODING, http_session, read_html_sync
+from utils.progressive import fill_headlines, headlines_only, publish_headlines
+from utils.site_rules import clean_html, get_rules, text_length
+from utils.timestamps import entry_timestamp
 
 def convert_json_to_html(json_file, output_file):
     """
@@ -50,44 +56,12 @@ def convert_json_to_html(json_file, output_file):
 
 
 def clean_html_content(html_content: str) -> str:
-    """Clean article HTML using Readability then strip noisy elements (mirrors Asahi style)."""
+    """Extract the main content, then clean it with the Mainichi site rules (config/rules/mainichi.json)."""
     if not html_content:
         return html_content
     try:
-        doc = Document(html_content)
-        content_html = doc.summary()
-
-        soup = BeautifulSoup(content_html, 'html.parser')
-
-        # Remove scripts, styles, media, utility blocks
-        for el in soup(["script", "style", "iframe", "nav", "footer", "img", "picture", "figure", "video", "audio"]):
-            el.decompose()
-
-        for el in soup.find_all(['a', 'u']):
-            el.unwrap()
-
-        # Remove obvious share/utility containers
-        def _cls(x):
-            try:
-                return (x and ('share' in x or 'sns' in x or 'related' in x or 'advertisement' in x.lower() or 'utility' in x))
-            except Exception:
-                return False
-        for div in soup.find_all("div", class_=_cls):
-            div.decompose()
-
-        # Remove empty paragraphs and tag paragraphs for styling
-        for p in soup.find_all('p'):
-            if not p.get_text().strip():
-                p.decompose()
-            else:
-                p['class'] = p.get('class', []) + ['article-paragraph']
-
-        # Drop any remaining empty nodes
-        for el in soup.find_all():
-            if not el.get_text().strip() and not el.find_all():
-                el.decompose()
-
-        return str(soup)
+        content_html = extract_main_content(html_content, EXTRACTOR, 'ja', SOURCE_ID)
+        return clean_html(content_html, RULES)
     except Exception as e:
         print(f"Error cleaning HTML content: {e}")
         return "[Error processing content]"
@@ -95,12 +69,17 @@ def clean_html_content(html_content: str) -> str:
 
 RSS_FEED = "https://mainichi.jp/rss/etc/mainichi-flash.rss"
 
+# Main-content extractor ('readability' or 'native'), see utils/extractor.py
+SOURCE_ID = 'mainichi'
+EXTRACTOR = get_extractor(SOURCE_ID)
+RULES = get_rules(SOURCE_ID)
+
 async def fetch_articles_from_rss():
     """Fetch article metadata from Mainichi RSS feed (flash)."""
     if hasattr(ssl, '_create_unverified_context'):
         ssl._create_default_https_context = ssl._create_unverified_context
 
-    feed = feedparser.parse(RSS_FEED)
+    feed = parse_feed(RSS_FEED, SOURCE_ID, limit=10)
     articles = []
 
     entries = feed.entries if hasattr(feed, 'entries') else []
@@ -108,20 +87,9 @@ async def fetch_articles_from_rss():
     for entry in entries[:10]:
         try:
             # published/pubDate handling
-            published_iso = None
-            date_fields = ['published', 'pubDate', 'dc:date', 'dc_date', 'updated']
-            for field in date_fields:
-                if hasattr(entry, field):
-                    try:
-                        dt = dateutil.parser.parse(getattr(entry, field))
-                        if dt.tzinfo is None:
-                            dt = dt.replace(tzinfo=timezone.utc)
-                        published_iso = dt.isoformat()
-                        break
-                    except Exception:
-                        continue
-            if not published_iso:
-                published_iso = datetime.now(timezone.utc).isoformat()
+            published = entry_timestamp(entry)
+            if not published:
+                published = datetime.now(timezone.utc)
 
             # summary/description
             summary_html = entry.get('summary', '')
@@ -138,15 +106,13 @@ async def fetch_articles_from_rss():
                 if img_match:
                     image_url = img_match.group(1)
 
-            articles.append({
-                'title': entry.title,
-                'url': entry.link,
-                'published': published_iso,
-                'source': '毎日新聞',
-                'summary': summary_text,
-                'image': image_url,
-                'language': 'ja'
-            })
+            articles.append(Article(
+                entry.title, entry.link, '毎日新聞', SOURCE_ID, published, 'ja',
+                summary=summary_text,
+                guid=entry.get('id', ''),
+                image_url=image_url,
+                content=feed_body(entry, RULES)  # Full body from the feed, else fetched
+            ))
         except Exception as e:
             print(f"Error processing Mainichi article: {e}")
 
@@ -165,7 +131,7 @@ def fetch_article_content_sync(url: str) -> str:
             'User-Agent': random.choice(user_agents),
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
             'Accept-Language': 'ja,en-US;q=0.7,en;q=0.3',
-            'Accept-Encoding': 'gzip, deflate, br',
+            'Accept-Encoding': ACCEPT_ENCODING,
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1',
             'Cache-Control': 'max-age=0',
@@ -176,12 +142,23 @@ def fetch_article_content_sync(url: str) -> str:
         # Random human-like delay
         time.sleep(random.uniform(1.0, 2.5))
 
-        session = requests.Session()
-        session.get('https://mainichi.jp/', headers=headers, timeout=12)
-        resp = session.get(url, headers=headers, timeout=12)
+        # Kept between refreshes in daemon mode (warm connections and cookies)
+        session = http_session()
+        # Only the cookies of the home page are needed, not its body. It counts
+        # against the host too: an open circuit skips both requests.
+        with host_slot('https://mainichi.jp/') as slot:
+            home = session.get('https://mainichi.jp/', headers=headers, timeout=12, stream=True)
+            slot.done(home.status_code, home.headers)
+            home.close()
+        # Honors Retry-After and pauses the host after 429/403/5xx (utils/host_limiter.py)
+        with host_slot(url) as slot:
+            resp = session.get(url, headers=headers, timeout=12, stream=True)
+            slot.done(resp.status_code, resp.headers)
         if resp.status_code == 200:
-            return clean_html_content(resp.text)
+            html = read_html_sync(resp, SOURCE_ID)
+            return clean_html_content(html) if html else ""
         else:
+            resp.close()
             print(f"Error fetching Mainichi article content: HTTP {resp.status_code} - {url}")
             return ""
     except Exception as e:
@@ -201,34 +178,55 @@ async def fetch_news_async():
         print("Starting to fetch Mainichi news...")
         articles = await fetch_articles_from_rss()
         print(f"Found {len(articles)} articles. Fetching content...")
+        # Headlines-first page while the bodies are fetched (progressive mode only)
+        publish_headlines(articles, 'output/mainichi_news_articles.html', RULES, 'Mainichi Flash', 'ja')
 
-        for i, article in enumerate(articles):
-            try:
-                print(f"Fetching article {i+1}/{len(articles)}: {article['title']}")
-                content = await fetch_article_content(article['url'])
-
-                # If content empty/too short, fallback to summary or link-out
-                from bs4 import BeautifulSoup as _BS
-                text_len = len(_BS(content or "", 'html.parser').get_text().strip())
-                if not content or text_len < 60:
-                    summary_text = (article.get('summary') or '').strip()
-                    if summary_text:
-                        content = f"<p>{summary_text}</p>"
+        if headlines_only():
+            # Feed metadata only: no article page requests, no extraction
+            fill_headlines(articles, RULES)
+        else:
+            for i, article in enumerate(articles):
+                try:
+                    if article.content:
+                        # Full body supplied by the feed entry: no page fetch
+                        use_feed_body(article)
+                        continue
+                    # Body extracted by an earlier run: no page fetch, no delay
+                    content = seen_content(SOURCE_ID, article.url, article.guid)
+                    if content:
+                        article.content = content
+                        continue
+                    if deadline_passed():
+                        # Out of time: reuse the body cached by an earlier run, if any
+                        content = cached_content(SOURCE_ID, article.url)
                     else:
-                        content = (
-                            f"<p>本文を取得できませんでした。</p>"
-                            f"<p><a href=\"{article['url']}\" target=\"_blank\" rel=\"noopener\">記事を読む</a></p>"
-                        )
-
-                article['content'] = content
-
-                # Gentle delay
-                if i < len(articles) - 1:
-                    await asyncio.sleep(random.uniform(1.5, 3.0))
-
-            except Exception as e:
-                print(f"Error processing article {article['url']}: {str(e)}")
-                article['content'] = f"<p>{article.get('summary', 'No content available.')}</p>"
+                        print(f"Fetching article {i+1}/{len(articles)}: {article.title}")
+                        content = await fetch_article_content(article.url)
+                        if content and text_length(content) >= RULES.min_text_length:
+                            remember(SOURCE_ID, article.url, content, article.guid)
+                        else:
+                            content = cached_content(SOURCE_ID, article.url) or content
+
+                    # If content empty/too short, fallback to summary or link-out
+                    if not content or text_length(content) < RULES.min_text_length:
+                        summary_text = article.summary.strip()
+                        if summary_text:
+                            content = f"<p>{summary_text}</p>"
+                        else:
+                            content = (
+                                f"<p>本文を取得できませんでした。</p>"
+                                f"<p><a href=\"{article.url}\" target=\"_blank\" rel=\"noopener\">記事を読む</a></p>"
+                            )
+
+                    article.content = content
+
+                    # Gentle delay
+                    if i < len(articles) - 1 and not deadline_passed():
+                        await asyncio.sleep(random.uniform(1.5, 3.0))
+
+                except Exception as e:
+                    print(f"Error processing article {article.url}: {str(e)}")
+                    article.content = f"<p>{article.summary or 'No content available.'}</p>"
 
         return {
             'source': '毎日新聞',
@@ -250,33 +248,11 @@ def fetch_news():
 def save_to_html(data, filename_prefix='mainichi_news'):
     """Save the scraped data to an HTML file (same pipeline shape as Asahi)."""
     try:
-        os.makedirs('output', exist_ok=True)
         json_filename = f'output/{filename_prefix}_articles.json'
         html_filename = f'output/{filename_prefix}_articles.html'
 
-        # Prepare data for converter
-        articles_data = []
-        for article in data.get('articles', []):
-            articles_data.append({
-                'title': article.get('title', ''),
-                'content': article.get('content', ''),
-                'source': '毎日新聞',
-                'url': article.get('url', ''),
-                'published': article.get('published', '')
-            })
-
-        feed_data = {
-            'title': 'Mainichi Flash',
-            'link': 'https://mainichi.jp/',
-            'description': 'Latest flash news from Mainichi',
-            'language': 'ja',
-            'items': articles_data
-        }
-
-        with open(json_filename, 'w', encoding='utf-8') as f:
-            json.dump(feed_data, f, indent=2, ensure_ascii=False)
-
-        convert_json_to_html(json_filename, html_filename)
+        save_articles(data.get('articles', []), json_filename, html_filename, 'Mainichi Flash',
+                      'https://mainichi.jp/', 'Latest flash news from Mainichi', 'ja', convert_json_to_html)
         print(f"Data saved to {html_filename}")
         return html_filename
     except Exception as e:
@@ -284,6 +260,15 @@ def save_to_html(data, filename_prefix='mainichi_news'):
         return None
 
 
+async def refresh():
+    """One full refresh writing output/ (daemon.py runs this in-process)."""
+    result = await fetch_news_async()
+    if 'error' not in result:
+        save_to_html(result, 'mainichi_news')
+    return result
+
+
+
 if __name__ == "__main__":
     result = asyncio.run(fetch_news_async())
     try:
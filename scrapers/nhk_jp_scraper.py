@@ -2,23 +2,27 @@ import asyncio
 import json
 import os
 import sys
-import feedparser
 import ssl
-import pytz
 from bs4 import BeautifulSoup
-from readability import Document
-from datetime import datetime, timezone, timedelta
-import dateutil.parser
 import aiohttp
 
 # Standard library
-import json as _json
 import random
-import asyncio as _asyncio
 
 # Add parent directory to path to allow imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.convert_to_html import convert_json_to_html, convert_data_to_html
+from utils.article import Article, save_articles
+from utils.article_cache import fallback_content, remember
+from utils.charset import decode_with
+from utils.circuit_breaker import HostUnavailable
+from utils.convert_to_html import convert_data_to_html
+from utils.deadline import gather_until_deadline
+from utils.extractor import extract_main_content, get_extractor
+from utils.feeds import feed_body, page_or_feed_body, parse_feed
+from utils.http_fetch import client_session, fetch_page_async
+from utils.progressive import fill_headlines, headlines_only, publish_headlines
+from utils.site_rules import clean_html, get_rules, is_trivial, select_content
+from utils.timestamps import entry_timestamp
 
 def save_to_html(data, filename_prefix='nhk_news'):
     """Save the scraped data to an HTML file."""
@@ -29,24 +33,13 @@ def save_to_html(data, filename_prefix='nhk_news'):
         # Generate simple filename without timestamp
         html_filename = f'output/{filename_prefix}.html'
         
-        # Prepare data in the format expected by convert_json_to_html
-        articles_data = []
-        for article in data.get('articles', []):
-            articles_data.append({
-                'title': article.get('title', ''),
-                'content': article.get('content', ''),
-                'source': 'NHKニュース',
-                'url': article.get('url', ''),
-                'published': article.get('published', '')
-            })
-        
         # Create the feed data structure
         feed_data = {
             'title': 'NHK News',
             'link': 'https://www.nhk.or.jp/news/',
             'description': 'Latest news from NHK (Japan Broadcasting Corporation)',
             'language': 'ja',
-            'items': articles_data
+            'items': [article.to_item() for article in data.get('articles', [])]
         }
         
         # Convert data to HTML directly
@@ -59,21 +52,8 @@ def save_to_html(data, filename_prefix='nhk_news'):
         return None
 
 def clean_html_content(html_content):
-    """Clean HTML content by removing unwanted elements."""
-    if not html_content:
-        return html_content
-    
-    soup = BeautifulSoup(html_content, 'html.parser')
-    
-    # Remove script and style elements
-    for script in soup(["script", "style", "iframe", "nav", "footer"]):
-        script.decompose()
-    
-    # Remove share and social media elements
-    for div in soup.find_all("div", class_=lambda x: x and ('share' in x or 'sns' in x or 'related' in x or 'advertisement' in x.lower())):
-        div.decompose()
-    
-    return str(soup)
+    """Clean HTML content with the NHK site rules (config/rules/nhk.json)."""
+    return clean_html(html_content, RULES)
 
 def _extract_from_json_ld(html: str) -> str | None:
     """Try to extract articleBody from JSON-LD structures if present."""
@@ -81,7 +61,7 @@ def _extract_from_json_ld(html: str) -> str | None:
         soup = BeautifulSoup(html, 'html.parser')
         for tag in soup.find_all('script', type='application/ld+json'):
             try:
-                data = _json.loads(tag.string or '')
+                data = json.loads(tag.string or '')
             except Exception:
                 continue
             # JSON-LD may be an object or a list
@@ -103,78 +83,42 @@ def _extract_from_json_ld(html: str) -> str | None:
     return None
 
 def _extract_from_selectors(html: str) -> str | None:
-    """Try common NHK article selectors as a fallback."""
-    soup = BeautifulSoup(html, 'html.parser')
-    # Known/likely containers for main body; keep broad but safe
-    selector_candidates = [
-        '#news_textbody',
-        'div#news_textbody',
-        'article .content',
-        'article .article-body',
-        'div.content--detail-body',
-        'div.module--content',
-        'main .content',
-        'main article',
-    ]
-    for sel in selector_candidates:
-        node = soup.select_one(sel)
-        if node:
-            # Collect paragraphs
-            ps = node.find_all(['p', 'li'])
-            text_parts = []
-            for p in ps:
-                t = p.get_text(strip=True)
-                if t and ('NHK' not in t and 'All rights reserved' not in t):
-                    text_parts.append(f"<p>{t}</p>")
-            content = '\n'.join(text_parts)
-            if len(BeautifulSoup(content, 'html.parser').get_text().strip()) > 80:
-                return content
-    # As last resort, use all paragraphs on page (risky but better than boilerplate)
-    ps = soup.find_all('p')
-    text_parts = [f"<p>{p.get_text(strip=True)}</p>" for p in ps if p.get_text(strip=True)]
-    content = '\n'.join(text_parts)
-    if len(BeautifulSoup(content, 'html.parser').get_text().strip()) > 120:
-        return content
-    return None
+    """Try the NHK article selectors from the site rules as a fallback."""
+    return select_content(html, RULES) or None
 
 def _is_trivial_content(html: str) -> bool:
-    if not html:
-        return True
-    txt = BeautifulSoup(html, 'html.parser').get_text(separator=' ').strip()
-    if len(txt) < 80:
-        return True
-    # Detect common NHK copyright-only boilerplate
-    if 'Copyright NHK' in txt or '許可なく転載することを禁じます' in txt:
-        return True
-    return False
+    # Too short, or NHK copyright-only boilerplate
+    return is_trivial(html, RULES)
 
 # RSS feed for NHK (Japanese)
 RSS_FEED = "https://www.nhk.or.jp/rss/news/cat0.xml"
 
+# Main-content extractor ('readability' or 'native'), see utils/extractor.py
+SOURCE_ID = 'nhk'
+EXTRACTOR = get_extractor(SOURCE_ID)
+RULES = get_rules(SOURCE_ID)
+
 async def fetch_articles_from_rss():
     """Fetch article metadata from NHK RSS feed."""
     if hasattr(ssl, '_create_unverified_context'):
         ssl._create_default_https_context = ssl._create_unverified_context
     
-    feed = feedparser.parse(RSS_FEED)
+    feed = parse_feed(RSS_FEED, SOURCE_ID, limit=10)
     articles = []
     
     for entry in feed.entries[:10]:  # Get latest 10 articles
         try:
-            published = dateutil.parser.parse(entry.published)
-            
-            if published.tzinfo is None:
-                published = published.replace(tzinfo=timezone.utc)
+            published = entry_timestamp(entry, fields=('published',))
+            if published is None:
+                raise ValueError('no publication date')
             
-            articles.append({
-                'title': entry.title,
-                'url': entry.link,
-                'published': published.isoformat(),
-                'source': 'NHKニュース',
-                'summary': entry.get('summary', ''),
-                'image': entry.get('media_thumbnail', [{}])[0].get('url', '') if hasattr(entry, 'media_thumbnail') else '',
-                'language': 'ja'
-            })
+            articles.append(Article(
+                entry.title, entry.link, 'NHKニュース', SOURCE_ID, published, 'ja',
+                summary=entry.get('summary', ''),
+                guid=entry.get('id', ''),
+                image_url=entry.get('media_thumbnail', [{}])[0].get('url', '') if hasattr(entry, 'media_thumbnail') else '',
+                content=feed_body(entry, RULES)  # Full body from the feed, else fetched
+            ))
         except Exception as e:
             print(f"Error processing NHK article: {e}")
     
@@ -202,26 +146,26 @@ async def fetch_article_content(url):
         # Simple retry logic, try normal and AMP variants
         for attempt in range(3):
             try:
-                async with aiohttp.ClientSession(timeout=timeout) as session:
+                async with client_session(timeout=timeout) as session:
                     html = None
                     for target_url in (url, f"{url}?amp=1"):
-                        async with session.get(target_url, headers=headers, ssl=False) as response:
-                            if response.status == 403:
-                                # Likely blocked; change UA and retry this attempt once
-                                headers['User-Agent'] = random.choice(uas)
-                                continue
-                            if response.status >= 400:
-                                continue
-                            html = await response.text()
-                            if html:
-                                break
+                        # 403/429/5xx halve the host's concurrency and pause it (Retry-After honored);
+                        # slow responses are hedged when QUICKNEWS_HEDGE_NHK is set
+                        status, page = await fetch_page_async(target_url, SOURCE_ID, dict(headers), session=session)
+                        if status == 403:
+                            # Likely blocked; also change UA for the next request
+                            headers['User-Agent'] = random.choice(uas)
+                            continue
+                        if page is None:
+                            continue
+                        html = decode_with(page[0], page[1], SOURCE_ID)
+                        if html:
+                            break
                     if not html:
-                        await _asyncio.sleep(0.5 * (attempt + 1))
                         continue
 
                 # 1) Try Readability first
-                doc = Document(html)
-                content = doc.summary() or ''
+                content = extract_main_content(html, EXTRACTOR, 'ja', SOURCE_ID) or ''
                 content = clean_html_content(content)
                 if not _is_trivial_content(content):
                     return content
@@ -236,9 +180,13 @@ async def fetch_article_content(url):
                 if sel and not _is_trivial_content(sel):
                     return clean_html_content(sel)
 
+            except HostUnavailable as e:
+                # Circuit open or long Retry-After: fail fast to the RSS summary
+                print(f"Skipping {url}: {e}")
+                return None
             except Exception:
-                # Backoff and retry
-                await _asyncio.sleep(0.5 * (attempt + 1))
+                # Retry; the limiter already paused the host after errors
+                pass
 
         return None
     except Exception as e:
@@ -251,20 +199,25 @@ async def fetch_news_async():
         print(f"Starting to fetch NHK news...")
         articles = await fetch_articles_from_rss()
         print(f"Found {len(articles)} articles. Fetching content...")
+        # Headlines-first page while the bodies are fetched (progressive mode only)
+        publish_headlines(articles, 'output/nhk_jp_news_articles.html', RULES, 'NHK News', 'ja')
         
-        # Process articles in batches with delay to avoid rate limiting
-        tasks = []
-        for i, article in enumerate(articles):
-            if i > 0 and i % 3 == 0:  # Add delay every 3 requests
-                await asyncio.sleep(1)
-            tasks.append(fetch_article_content(article['url']))
-        contents = await asyncio.gather(*tasks, return_exceptions=True)
+        if headlines_only():
+            # Feed metadata only: no article page requests, no extraction
+            fill_headlines(articles, RULES)
+        else:
+            # Rate limiting is adaptive per host, see utils/host_limiter.py
+            tasks = [page_or_feed_body(article, fetch_article_content, article.url) for article in articles]
+            # Fetches still running at the region deadline are cancelled (None)
+            contents = await gather_until_deadline(tasks, SOURCE_ID)
         
-        for i, content in enumerate(contents):
-            if isinstance(content, str):
-                articles[i]['content'] = content
-            else:
-                articles[i]['content'] = ""
+            for i, content in enumerate(contents):
+                if isinstance(content, str) and content:
+                    articles[i].content = content
+                    remember(SOURCE_ID, articles[i].url, content, articles[i].guid)
+                else:
+                    # Page unavailable or deadline reached: cached body, else the RSS summary
+                    articles[i].content = fallback_content(articles[i].url, articles[i].summary, RULES)
         
         return {
             'source': 'NHKニュース',
@@ -282,37 +235,13 @@ def fetch_news():
 def save_to_file(data, filename_prefix='nhk_jp_news'):
     """Save the scraped data to a JSON file."""
     try:
-        # Create output directory if it doesn't exist
-        os.makedirs('output', exist_ok=True)
-        
         # Generate filename without timestamp
         json_filename = f'output/{filename_prefix}_articles.json'
         html_filename = f'output/{filename_prefix}_articles.html'
         
-        # Map incoming data (which uses 'articles') to the feed schema expected by convert_json_to_html ('items')
-        articles_data = []
-        for article in data.get('articles', []):
-            articles_data.append({
-                'title': article.get('title', ''),
-                'content': article.get('content', ''),
-                'source': article.get('source', 'NHKニュース'),
-                'url': article.get('url', ''),
-                'published': article.get('published', ''),
-                'language': article.get('language', 'ja')
-            })
-        
-        feed_data = {
-            'title': 'NHK News',
-            'link': 'https://www.nhk.or.jp/news/',
-            'description': 'Latest news from NHK (Japan Broadcasting Corporation)',
-            'language': 'ja',
-            'items': articles_data
-        }
-        
-        # Save JSON in expected schema then convert to HTML
-        with open(json_filename, 'w', encoding='utf-8') as f:
-            json.dump(feed_data, f, ensure_ascii=False, indent=2)
-        convert_json_to_html(json_filename, html_filename)
+        # Save JSON in the feed schema then convert to HTML
+        save_articles(data.get('articles', []), json_filename, html_filename, 'NHK News',
+                      'https://www.nhk.or.jp/news/', 'Latest news from NHK (Japan Broadcasting Corporation)', 'ja')
         print(f"Data saved to {html_filename}")
         return html_filename
     except Exception as e:
@@ -324,7 +253,8 @@ if __name__ == "__main__":
     result = asyncio.run(fetch_news_async())
     
     # Print to console
-    print(json.dumps(result, indent=2, ensure_ascii=False))
+    articles = [article.to_item() for article in result.get('articles', [])]
+    print(json.dumps({**result, 'articles': articles}, indent=2, ensure_ascii=False))
     
     # Save to HTML file
     if 'error' not in result:
@@ -1,68 +1,38 @@
 import asyncio
-import json
 import os
 import sys
-import feedparser
 import ssl
-import pytz
-from bs4 import BeautifulSoup
-from readability import Document
-from datetime import datetime, timezone, timedelta
-import dateutil.parser
-import aiohttp
 
 # Add parent directory to path to allow imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.convert_to_html import convert_json_to_html
+from utils.article import Article, save_articles
+from utils.article_cache import fallback_content, remember
+from utils.deadline import gather_until_deadline
+from utils.extractor import extract_main_content, get_extractor
+from utils.feeds import feed_body, page_or_feed_body, parse_feed
+from utils.http_fetch import fetch_page_async
+from utils.progressive import fill_headlines, headlines_only, publish_headlines
+from utils.site_rules import clean_html, get_rules
+from utils.timestamps import day_window, entry_timestamp, get_zone
 
 def clean_html_content(html_content):
     """
-    Clean HTML content by removing unwanted classes and elements.
+    Clean HTML content with the NPR site rules (config/rules/npr.json).
 
-    Removes unwanted tags, empty paragraphs and divs, and empty attributes
+    Removes caption, audio/video, transcript and disclaimer blocks, media,
+    empty paragraphs and divs, and empty attributes
     """
-    if not html_content:
-        return html_content
-    
-    soup = BeautifulSoup(html_content, 'html.parser')
-    
-    # Remove unwanted classes from the HTML content
-    unwanted_classes = [
-        # Classes used by NPR to hide captions on images
-        'hide-caption',
-        'toggle-caption',
-        'credit-caption',
-        'caption-wrap',
-        # Classes used by NPR to wrap audio and video content
-        'bucketwrap',
-        # Classes used by NPR to hide transcript content
-        'icn-story-transcript',
-        # Classes used by NPR to display disclaimers
-        'disclaimer'
-    ]
-    
-    for class_name in unwanted_classes:
-        for element in soup.find_all(class_=class_name):
-            element.decompose()
-    
-    # Remove empty paragraphs and divs
-    for element in soup.find_all(['p', 'div']):
-        if not element.get_text(strip=True):
-            element.decompose()
-    
-    # Clean up any remaining empty elements
-    for element in soup.find_all(True):
-        # Remove empty attributes
-        for attr in list(element.attrs.keys()):
-            if not element[attr]:
-                del element[attr]
-    
-    return str(soup)
+    return clean_html(html_content, RULES)
 
 # 
 # RSS feed for NPR News
 RSS_FEED = "https://www.npr.org/rss/rss.php?id=1001"
 
+# Main-content extractor ('readability' or 'native'), see utils/extractor.py
+SOURCE_ID = 'npr'
+EXTRACTOR = get_extractor(SOURCE_ID)
+RULES = get_rules(SOURCE_ID)
+
 # Create unverified SSL context
 ssl._create_default_https_context = ssl._create_unverified_context
 
@@ -70,17 +40,14 @@ ssl._create_default_https_context = ssl._create_unverified_context
 def fetch_articles_from_rss():
     articles = []
     # Get the timezone from the RSS feed (NPR uses Eastern Time)
-    eastern = pytz.timezone('US/Eastern')
-    
-    # Get current time in Eastern Time
-    now = datetime.now(eastern)
+    eastern = get_zone('US/Eastern')
     
-    # Get yesterday at 00:00:00 in Eastern Time
-    yesterday = (now - timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=eastern)
+    # From yesterday at 00:00:00 until now, in Eastern Time
+    yesterday, now = day_window(eastern)
     
     print(f"\nFetching feed: {RSS_FEED}")
     try:
-        feed = feedparser.parse(RSS_FEED)
+        feed = parse_feed(RSS_FEED, SOURCE_ID, since=yesterday)
         print(f"Feed status: {feed.get('status')}")
         print(f"Feed version: {feed.get('version', 'N/A')}")
         print(f"Number of entries: {len(feed.entries)}")
@@ -89,38 +56,17 @@ def fetch_articles_from_rss():
             print(f"Feed parsing warning: {feed.bozo_exception}")
             
         for entry in feed.entries:
-            # Skip if no publication date
-            if not hasattr(entry, 'published_parsed'):
+            # Skip if no publication date (dates without a zone are Eastern)
+            pub_date = entry_timestamp(entry, eastern, fields=('published',))
+            if pub_date is None:
                 continue
                 
-            # Parse publication date with timezone info
-            try:
-                # Try to get the published date string
-                pub_date_str = entry.get('published', '')
-                if not pub_date_str and hasattr(entry, 'published_parsed'):
-                    # Fallback to parsed date if published string not available
-                    pub_date = datetime(*entry.published_parsed[:6], tzinfo=timezone.utc)
-                else:
-                    # Parse the date string with timezone info
-                    pub_date = dateutil.parser.parse(pub_date_str)
-                    
-                # Ensure the date has timezone info (NPR is in Eastern Time)
-                if pub_date.tzinfo is None:
-                    pub_date = eastern.localize(pub_date)
-                
-                # Only include articles from yesterday until now
-                if pub_date < yesterday or pub_date > now:
-                    continue
-                    
-            except Exception as e:
-                print(f"Error parsing date for article: {str(e)}")
+            # Only include articles from yesterday until now
+            if pub_date < yesterday or pub_date > now:
                 continue
                 
             print(f"Found article from {pub_date}: {entry.get('title', 'No title')}")
             
-            # Store the formatted publication date with timezone info as ISO format string
-            pub_date_str = pub_date.isoformat()
-            
             # Get the article URL
             article_url = entry.link
             
@@ -130,40 +76,26 @@ def fetch_articles_from_rss():
             # Get the description
             description = entry.get('description', '')
             
-            # Get the content from the entry
-            content = ''
-            if hasattr(entry, 'content'):
-                # Try to get content from content field first
-                for content_item in entry.content:
-                    if hasattr(content_item, 'value'):
-                        content = content_item.value
-                        break
-            
-            # If no content in content field, try description
-            if not content and hasattr(entry, 'description'):
-                content = entry.description
-            
             # Store the article data
-            article = {
-                'title': title,
-                'link': article_url,
-                'source': 'NPR News',
-                'pub_time': pub_date_str,
-                'description': description,
-                'content': content if content and len(content.strip()) > 50 else ''
-            }
+            article = Article(
+                title, article_url, 'NPR News', SOURCE_ID, pub_date, 'en',
+                summary=description,
+                guid=entry.get('id', ''),
+                # Full body from the feed entry when good enough; the page is not fetched then
+                content=feed_body(entry, RULES),
+            )
             
             # Get the author
             if hasattr(entry, 'author'):
-                article['author'] = entry.author
+                article.author = entry.author
             elif hasattr(entry, 'dc_creator'):
-                article['author'] = entry.dc_creator
+                article.author = entry.dc_creator
             
             # Get the image URL if available
             if hasattr(entry, 'media_content') and entry.media_content:
                 for media in entry.media_content:
                     if hasattr(media, 'url') and media.url:
-                        article['image_url'] = media.url
+                        article.image_url = media.url
                         break
             
             # Add to articles list
@@ -184,28 +116,21 @@ async def fetch_article_content(url):
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
         
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers, ssl=False) as response:
-                if response.status == 200:
-                    html = await response.text()
-                    # Extract main content using Readability
-                    doc = Document(html)
-                    content = doc.summary()
-                    
-                    # Remove images and videos
-                    soup = BeautifulSoup(content, 'html.parser')
-                    for element in soup.find_all(['img', 'video', 'iframe', 'picture', 'figure']):
-                        element.decompose()
-                    
-                    # Unwrap <a> and <u> tags
-                    for element in soup.find_all(['a', 'u']):
-                        element.unwrap()
-                    
-                    # Clean the HTML content using the clean_html_content function
-                    return clean_html_content(str(soup))
-                else:
-                    print(f"Failed to fetch {url}: {response.status}")
-                    return "[Failed to load content]"
+        # Host limiter, circuit breaker and (opt-in) hedging, see utils/http_fetch.py
+        status, page = await fetch_page_async(url, SOURCE_ID, headers)
+        if status != 200:
+            print(f"Failed to fetch {url}: {status}")
+            return "[Failed to load content]"
+        # Bounded read: oversized or non-HTML responses are aborted
+        if page is None:
+            return "[Failed to load content]"
+        # Extract main content using Readability
+        # Raw bytes go straight to lxml with the detected charset
+        body, charset = page
+        content = extract_main_content(body, EXTRACTOR, 'en', SOURCE_ID, charset)
+
+        # Clean the HTML content using the NPR site rules
+        return clean_html_content(content)
     except Exception as e:
         print(f"Error fetching article {url}: {str(e)}")
         return f"[Error: {str(e)}]"
@@ -213,49 +138,47 @@ async def fetch_article_content(url):
 # Main function to fetch news
 async def fetch_news_async():
     articles = fetch_articles_from_rss()
-    
-    # Process articles to fetch content
-    tasks = [fetch_article_content(article['link']) for article in articles]
-    
-    # Wait for all content to be fetched
-    contents = await asyncio.gather(*tasks)
-    
-    # Update articles with fetched content and filter out empty ones
-    valid_articles = []
-    for i, content in enumerate(contents):
-        if i < len(articles):
-            # Only keep articles with non-empty content
-            if content and content.strip() and content != '[Failed to load content]' and not content.startswith('[Error:'):
-                articles[i]['content'] = content
-                valid_articles.append(articles[i])
-    
-    # Create feed object with only valid articles
-    feed_object = {
-        "title": "NPR News",
-        "link": "https://www.npr.org/",
-        "description": "Latest news from NPR",
-        "items": valid_articles
-    }
-    
-    # Save articles to a JSON file
-    os.makedirs('output', exist_ok=True)
-    json_file = 'output/npr_news_articles.json'
-    html_file = 'output/npr_news_articles.html'
-    
-    with open(json_file, 'w', encoding='utf-8') as f:
-        json.dump(feed_object, f, ensure_ascii=False, indent=2)
-    
-    print(f"\nJSON file saved to: {os.path.abspath(json_file)}")
-    
-    # Convert the JSON to HTML
-    convert_json_to_html(json_file, html_file)
-    print(f"HTML file saved to: {os.path.abspath(html_file)}")
-    
-    return feed_object
+    # Headlines-first page while the bodies are fetched (progressive mode only)
+    publish_headlines(articles, 'output/npr_news_articles.html', RULES, 'NPR News', 'en')
+    
+    if headlines_only():
+        # Feed metadata only: no article page requests, no extraction
+        valid_articles = fill_headlines(articles, RULES)
+    else:
+        # Process articles to fetch content
+        tasks = [page_or_feed_body(article, fetch_article_content, article.url) for article in articles]
+
+        # Wait for all content to be fetched
+        # Fetches still running at the region deadline are cancelled (None)
+        contents = await gather_until_deadline(tasks, SOURCE_ID)
+
+        # Update articles with fetched content and filter out empty ones
+        valid_articles = []
+        for i, content in enumerate(contents):
+            if i < len(articles):
+                # Only keep articles with non-empty content
+                if isinstance(content, str) and content.strip() and content != '[Failed to load content]' and not content.startswith('[Error:'):
+                    articles[i].content = content
+                    remember(SOURCE_ID, articles[i].url, content, articles[i].guid)
+                    valid_articles.append(articles[i])
+                else:
+                    # Page unavailable or deadline reached: cached body, else the RSS summary
+                    fallback = fallback_content(articles[i].url, articles[i].summary, RULES)
+                    if fallback:
+                        articles[i].content = fallback
+                        valid_articles.append(articles[i])
+    
+    # Save only the valid articles as JSON and convert them to HTML
+    return save_articles(valid_articles, 'output/npr_news_articles.json', 'output/npr_news_articles.html',
+                         "NPR News", "https://www.npr.org/", "Latest news from NPR")
 
 def fetch_news():
     return asyncio.run(fetch_news_async())
 
+async def refresh():
+    """One full refresh writing output/ (daemon.py runs this in-process)."""
+    return await fetch_news_async()
+
 # Run script
 if __name__ == "__main__":
     result = asyncio.run(fetch_news_async())
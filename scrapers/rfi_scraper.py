@@ -3,60 +3,38 @@ import json
 import os
 import sys
 import random
-import feedparser
 import ssl
-import pytz
-from bs4 import BeautifulSoup
-from readability import Document
-from datetime import datetime, timezone, timedelta
-import dateutil.parser
-from playwright.async_api import async_playwright
+from datetime import timezone
 
 # Add parent directory to path to allow imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.convert_to_html import convert_json_to_html
+from utils.article import Article, save_articles
+from utils.article_cache import fallback_content, remember
+from utils.browser import chromium
+from utils.circuit_breaker import HostUnavailable
+from utils.deadline import gather_until_deadline
+from utils.extractor import extract_main_content, get_extractor
+from utils.feeds import feed_body, page_or_feed_body, parse_feed
+from utils.host_limiter import host_slot
+from utils.http_fetch import accept_response, record_transfer
+from utils.progressive import fill_headlines, headlines_only, publish_headlines
+from utils.site_rules import clean_html, get_rules
+from utils.timestamps import day_window, entry_timestamp
 
 
 def clean_html_content(html_content: str) -> str:
-    """Clean HTML content by removing unwanted classes and elements."""
-    if not html_content:
-        return html_content
-
-    soup = BeautifulSoup(html_content, 'html.parser')
-
-    unwanted_classes = [
-        'ad', 'advertisement', 'share-tools', 'related-links', 'newsletter',
-        'newsletter-signup', 'comments', 'author-info', 'timestamp', 'tags',
-        'social', 'media-wrapper', 'player', 'embed', 'footer', 'header'
-    ]
-    for class_name in unwanted_classes:
-        for element in soup.find_all(class_=class_name):
-            element.decompose()
-
-    # Remove scripts, styles, embeds
-    for element in soup(['script', 'style', 'noscript', 'iframe', 'object', 'embed']):
-        element.decompose()
-
-    # Remove media and unwrap anchors/underline
-    for el in soup.find_all(['img', 'video', 'picture', 'figure']):
-        el.decompose()
-    for el in soup.find_all(['a', 'u']):
-        el.unwrap()
-
-    # Remove empty elements / attributes
-    for element in soup.find_all(True):
-        for attr in list(element.attrs.keys()):
-            if not element[attr]:
-                del element[attr]
-        if not element.get_text(strip=True) and not element.find_all(True):
-            element.decompose()
-
-    return str(soup)
+    """Clean HTML content with the RFI site rules (config/rules/rfi.json)."""
+    return clean_html(html_content, RULES)
 
 
 # RFI main RSS (FR)
 RSS_FEED = "https://www.rfi.fr/fr/rss"
 
+# Main-content extractor ('readability' or 'native'), see utils/extractor.py
+SOURCE_ID = 'rfi'
+EXTRACTOR = get_extractor(SOURCE_ID)
+RULES = get_rules(SOURCE_ID)
+
 # Create unverified SSL context
 ssl._create_default_https_context = ssl._create_unverified_context
 
@@ -65,31 +43,19 @@ def fetch_articles_from_rss():
     """Fetch article metadata from RFI RSS feed."""
     print(f"\nFetching RFI feed: {RSS_FEED}")
 
-    utc = pytz.utc
-    now = datetime.now(utc)
-    yesterday = (now - timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=utc)
+    yesterday, now = day_window(timezone.utc)
 
     articles = []
 
     try:
-        feed = feedparser.parse(RSS_FEED)
+        feed = parse_feed(RSS_FEED, SOURCE_ID, since=yesterday)
         print(f"Feed status: {feed.get('status')}")
         print(f"Number of entries: {len(feed.entries)}")
 
         for entry in feed.entries:
             # Parse publication date
-            try:
-                pub_date_str = entry.get('published', '') or entry.get('pubDate', '')
-                if not pub_date_str and hasattr(entry, 'published_parsed'):
-                    pub_date = datetime(*entry.published_parsed[:6], tzinfo=timezone.utc)
-                else:
-                    pub_date = dateutil.parser.parse(pub_date_str)
-                if pub_date.tzinfo is None:
-                    pub_date = utc.localize(pub_date)
-                if pub_date < yesterday or pub_date > now:
-                    continue
-            except Exception as e:
-                print(f"Error parsing date for article: {str(e)}")
+            pub_date = entry_timestamp(entry, fields=('published',))
+            if pub_date is None or pub_date < yesterday or pub_date > now:
                 continue
 
             link = entry.get('link', '')
@@ -114,17 +80,15 @@ def fetch_articles_from_rss():
             elif hasattr(entry, 'author'):
                 author = entry.author
 
-            article = {
-                'title': entry.get('title', 'No title'),
-                'link': link,
-                'source': 'RFI',
-                'pub_time': pub_date.isoformat(),
-                'description': entry.get('description', ''),
-                'image_url': image_url,
-                'author': author,
-                'content': ''  # Will be filled by fetch_article_content
-            }
-            print(f"Found article from {article['pub_time']}: {article['title']}")
+            article = Article(
+                entry.get('title', 'No title'), link, 'RFI', SOURCE_ID, pub_date, 'fr',
+                summary=entry.get('description', ''),
+                guid=entry.get('id', ''),
+                image_url=image_url,
+                author=author,
+                content=feed_body(entry, RULES)  # Full body from the feed, else filled by fetch_article_content
+            )
+            print(f"Found article from {pub_date.isoformat()}: {article.title}")
             articles.append(article)
 
     except Exception as e:
@@ -144,6 +108,7 @@ async def fetch_article_content(url: str, browser) -> str:
     """Fetch and extract article content using Playwright with incognito contexts and rotation."""
     tries = 2
     for attempt in range(tries):
+        context = None
         try:
             ua = random.choice(USER_AGENTS)
             context = await browser.new_context(
@@ -159,24 +124,46 @@ async def fetch_article_content(url: str, browser) -> str:
                 }
             )
             page = await context.new_page()
-            await page.goto(url, wait_until='domcontentloaded', timeout=30000)
+            # Navigations per host are bounded and paused after 429/403/5xx (utils/host_limiter.py)
+            async with host_slot(url) as slot:
+                response = await page.goto(url, wait_until='domcontentloaded', timeout=30000)
+                if response is not None:
+                    slot.done(response.status, response.headers)
+            if response is not None and not accept_response(SOURCE_ID, url, response.headers):
+                # Oversized or non-HTML: stop before rendering, no point retrying
+                await context.close()
+                break
             await page.wait_for_timeout(500 + random.randint(0, 800))
             html = await page.content()
+            html_size = len(html.encode('utf-8'))
+            if response is not None:
+                # Chromium negotiates br/zstd itself; count the encoded body it received
+                sizes = await response.request.sizes()
+                record_transfer(url, sizes.get('responseBodySize', 0), html_size,
+                                response.headers.get('content-encoding'))
             await context.close()
+            if not accept_response(SOURCE_ID, url, None, html_size):
+                break
 
-            doc = Document(html)
-            content = doc.summary()
-            soup = BeautifulSoup(content, 'html.parser')
-            for el in soup.find_all(['img', 'video', 'iframe', 'picture', 'figure']):
-                el.decompose()
-            for el in soup.find_all(['a', 'u']):
-                el.unwrap()
-            cleaned = clean_html_content(str(soup))
+            content = extract_main_content(html, EXTRACTOR, 'fr', SOURCE_ID)
+            cleaned = clean_html_content(content)
             if cleaned and len(cleaned) > 50:
                 return cleaned
+        except HostUnavailable as e:
+            # Circuit open or long Retry-After: fail fast to the RSS summary
+            print(f"Skipping {url}: {e}")
+            if context is not None:
+                await context.close()
+            break
+        except asyncio.CancelledError:
+            # Deadline: do not leave the context open in a kept browser
+            if context is not None:
+                await context.close()
+            raise
         except Exception as e:
             print(f"Error fetching article (attempt {attempt+1}) {url}: {str(e)}")
-            await asyncio.sleep(0.5)
+            if context is not None:
+                await context.close()
     return "[Error: Failed to extract content]"
 
 
@@ -185,52 +172,54 @@ async def fetch_news():
     print("Fetching RFI metadata and content...")
     articles = fetch_articles_from_rss()
     print(f"\nFound {len(articles)} articles in total")
-
-    # Optional proxy support via env QUICKNEWS_HTTP_PROXY
-    proxy_server = os.environ.get('QUICKNEWS_HTTP_PROXY')
-
-    # Fetch full article content using Playwright
-    print("\nExtracting full article content with browser automation...")
-    async with async_playwright() as p:
+    # Headlines-first page while the bodies are fetched (progressive mode only)
+    publish_headlines(articles, 'output/rfi_articles.html', RULES, 'RFI', 'fr')
+
+    if headlines_only():
+        # Feed metadata only: no article page requests, no extraction
+        valid_articles = fill_headlines(articles, RULES)
+    else:
+        # Optional proxy support via env QUICKNEWS_HTTP_PROXY
+        proxy_server = os.environ.get('QUICKNEWS_HTTP_PROXY')
+
+        # Fetch full article content using Playwright
+        print("\nExtracting full article content with browser automation...")
         launch_kwargs = {"headless": True}
         if proxy_server:
             launch_kwargs["proxy"] = {"server": proxy_server}
-        browser = await p.chromium.launch(**launch_kwargs)
-        tasks = [fetch_article_content(article['link'], browser) for article in articles]
-        contents = await asyncio.gather(*tasks)
-        await browser.close()
-
-    # Update articles with fetched content and filter valid ones
-    valid_articles = []
-    for i, content in enumerate(contents):
-        if i < len(articles):
-            if content and content.strip() and not content.startswith('[Error:') and len(content) > 50:
-                articles[i]['content'] = content
-                valid_articles.append(articles[i])
-            else:
-                print(f"Skipping article with invalid content: {articles[i]['title']}")
+        # Kept running between refreshes in daemon mode (utils/browser.py)
+        async with chromium(**launch_kwargs) as browser:
+            tasks = [page_or_feed_body(article, fetch_article_content, article.url, browser) for article in articles]
+            # Pages still loading at the region deadline are cancelled (None)
+            contents = await gather_until_deadline(tasks, SOURCE_ID)
+
+        # Update articles with fetched content and filter valid ones
+        valid_articles = []
+        for i, content in enumerate(contents):
+            if i < len(articles):
+                if isinstance(content, str) and content.strip() and not content.startswith('[Error:') and len(content) > 50:
+                    articles[i].content = content
+                    remember(SOURCE_ID, articles[i].url, content, articles[i].guid)
+                    valid_articles.append(articles[i])
+                else:
+                    # Page unavailable or deadline reached: cached body, else the RSS summary
+                    fallback = fallback_content(articles[i].url, articles[i].summary, RULES)
+                    if fallback:
+                        articles[i].content = fallback
+                        valid_articles.append(articles[i])
+                    else:
+                        print(f"Skipping article with invalid content: {articles[i].title}")
     
     print(f"\nSuccessfully extracted {len(valid_articles)} articles with full content")
 
-    feed_object = {
-        'title': 'RFI',
-        'link': 'https://www.rfi.fr/fr/',
-        'description': "Dernières actualités de RFI",
-        'items': valid_articles,
-    }
-
-    os.makedirs('output', exist_ok=True)
-    json_file = 'output/rfi_articles.json'
-    html_file = 'output/rfi_articles.html'
+    return save_articles(valid_articles, 'output/rfi_articles.json', 'output/rfi_articles.html',
+                         'RFI', 'https://www.rfi.fr/fr/', "Dernières actualités de RFI")
 
-    with open(json_file, 'w', encoding='utf-8') as f:
-        json.dump(feed_object, f, ensure_ascii=False, indent=2)
-    print(f"\nJSON file saved to: {os.path.abspath(json_file)}")
 
-    convert_json_to_html(json_file, html_file)
-    print(f"HTML file saved to: {os.path.abspath(html_file)}")
+async def refresh():
+    """One full refresh writing output/ (daemon.py runs this in-process)."""
+    return await fetch_news()
 
-    return feed_object
 
 
 if __name__ == '__main__':
@@ -1,63 +1,37 @@
 import asyncio
-import json
 import os
 import sys
-import feedparser
 import ssl
-import pytz
-from bs4 import BeautifulSoup
-from readability import Document
-from datetime import datetime, timezone, timedelta
-import dateutil.parser
 import aiohttp
 import random
 
 # Add parent directory to path to allow imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.convert_to_html import convert_json_to_html
+from utils.article import Article, save_articles
+from utils.article_cache import fallback_content, remember
+from utils.circuit_breaker import HostUnavailable
+from utils.deadline import gather_until_deadline
+from utils.extractor import extract_main_content, get_extractor
+from utils.feeds import feed_body, page_or_feed_body, parse_feed
+from utils.http_fetch import fetch_page_async
+from utils.progressive import fill_headlines, headlines_only, publish_headlines
+from utils.site_rules import clean_html, get_rules, text_length
+from utils.timestamps import day_window, entry_timestamp, get_zone
 
 
 def clean_html_content(html_content: str) -> str:
-    """Clean HTML content by removing unwanted classes and elements."""
-    if not html_content:
-        return html_content
-
-    soup = BeautifulSoup(html_content, 'html.parser')
-
-    unwanted_classes = [
-        'ad', 'advertisement', 'share', 'related', 'newsletter', 'comments',
-        'author-info', 'timestamp', 'tags', 'social', 'player', 'embed',
-        'footer', 'header', 'subscription', 'paywall'
-    ]
-    for class_name in unwanted_classes:
-        for element in soup.find_all(class_=class_name):
-            element.decompose()
-
-    # Remove scripts, styles, embeds and media
-    for element in soup(['script', 'style', 'noscript', 'iframe', 'object', 'embed', 'img', 'video', 'picture', 'figure', 'audio']):
-        element.decompose()
-
-    # Unwrap anchors/underline and inline wrappers
-    for el in soup.find_all(['a', 'u', 'span', 'strong', 'em', 'b', 'i', 'font']):
-        el.unwrap()
-
-    # Strip attributes and remove empty elements
-    for element in soup.find_all(True):
-        element.attrs = {}
-    removed = True
-    while removed:
-        removed = False
-        for el in list(soup.find_all(True)):
-            if not el.get_text(strip=True) and not el.find(True):
-                el.decompose()
-                removed = True
-
-    return str(soup)
+    """Clean HTML content with the 20 Minutes site rules (config/rules/20minutes.json)."""
+    return clean_html(html_content, RULES)
 
 
 # 20 Minutes RSS (Monde)
 RSS_FEED = "https://www.20minutes.fr/feeds/rss-monde.xml"
 
+# Main-content extractor ('readability' or 'native'), see utils/extractor.py
+SOURCE_ID = '20minutes'
+EXTRACTOR = get_extractor(SOURCE_ID)
+RULES = get_rules(SOURCE_ID)
+
 # Create unverified SSL context (some feeds have cert issues in CI)
 ssl._create_default_https_context = ssl._create_unverified_context
 
@@ -66,32 +40,21 @@ def fetch_articles_from_rss():
     """Fetch article metadata from 20 Minutes RSS feed for the last 24h."""
     print(f"\nFetching 20 Minutes feed: {RSS_FEED}")
 
-    tz = pytz.timezone('Europe/Paris')
-    now = datetime.now(tz)
-    yesterday = (now - timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=tz)
+    tz = get_zone('Europe/Paris')
+    yesterday, now = day_window(tz)
 
     articles = []
 
     try:
-        feed = feedparser.parse(RSS_FEED)
+        feed = parse_feed(RSS_FEED, SOURCE_ID, since=yesterday)
         print(f"Feed status: {feed.get('status')}")
         print(f"Number of entries: {len(feed.entries)}")
 
         for entry in feed.entries:
             # Parse publication date
-            try:
-                pub_date_str = entry.get('published', '') or entry.get('pubDate', '')
-                if not pub_date_str and hasattr(entry, 'published_parsed'):
-                    pub_date = datetime(*entry.published_parsed[:6], tzinfo=timezone.utc)
-                else:
-                    pub_date = dateutil.parser.parse(pub_date_str)
-                if pub_date.tzinfo is None:
-                    pub_date = tz.localize(pub_date)
-                # Filter to yesterday..now
-                if pub_date < yesterday or pub_date > now:
-                    continue
-            except Exception as e:
-                print(f"Error parsing date for article: {str(e)}")
+            # Filter to yesterday..now (dates without a zone are Paris time)
+            pub_date = entry_timestamp(entry, tz, fields=('published',))
+            if pub_date is None or pub_date < yesterday or pub_date > now:
                 continue
 
             link = entry.get('link', '')
@@ -117,17 +80,15 @@ def fetch_articles_from_rss():
             elif hasattr(entry, 'author'):
                 author = entry.author
 
-            article = {
-                'title': entry.get('title', 'No title'),
-                'link': link,
-                'source': '20 Minutes',
-                'pub_time': pub_date.isoformat(),
-                'description': entry.get('description', ''),
-                'image_url': image_url,
-                'author': author,
-                'content': ''
-            }
-            print(f"Found article from {article['pub_time']}: {article['title']}")
+            article = Article(
+                entry.get('title', 'No title'), link, '20 Minutes', SOURCE_ID, pub_date, 'fr',
+                summary=entry.get('description', ''),
+                guid=entry.get('id', ''),
+                image_url=image_url,
+                author=author,
+                content=feed_body(entry, RULES)  # Full body from the feed, else fetched
+            )
+            print(f"Found article from {pub_date.isoformat()}: {article.title}")
             articles.append(article)
 
     except Exception as e:
@@ -151,21 +112,24 @@ async def fetch_article_content(url: str) -> str:
             'Accept-Language': 'fr-FR,fr;q=0.9,en-US;q=0.8,en;q=0.7'
         }
         try:
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                async with session.get(url, headers=headers, ssl=False) as response:
-                    if response.status >= 400:
-                        await asyncio.sleep(0.4 * (attempt + 1))
-                        continue
-                    html = await response.text()
-            doc = Document(html)
-            content = doc.summary() or ''
+            # Host limiter (pauses after 429/403/5xx), circuit breaker and opt-in hedging
+            status, page = await fetch_page_async(url, SOURCE_ID, headers, timeout)
+            if status >= 400:
+                continue
+            if page is None:
+                # Oversized or non-HTML; retrying would not help
+                return ""
+            body, charset = page
+            content = extract_main_content(body, EXTRACTOR, 'fr', SOURCE_ID, charset) or ''
             cleaned = clean_html_content(content)
-            text_len = len(BeautifulSoup(cleaned, 'html.parser').get_text().strip())
-            if text_len >= 60:
+            if text_length(cleaned) >= RULES.min_text_length:
                 return cleaned
+        except HostUnavailable as e:
+            # Circuit open or long Retry-After: fail fast to the RSS summary
+            print(f"Skipping {url}: {e}")
+            return ""
         except Exception as e:
             print(f"Error fetching article (attempt {attempt+1}) {url}: {e}")
-            await asyncio.sleep(0.5 * (attempt + 1))
             continue
     return ""
 
@@ -173,36 +137,39 @@ async def fetch_article_content(url: str) -> str:
 async def fetch_news_async():
     """Main async function to fetch 20 Minutes articles and contents."""
     articles = fetch_articles_from_rss()
-    tasks = [fetch_article_content(a['link']) for a in articles]
-    contents = await asyncio.gather(*tasks, return_exceptions=True)
-
-    valid_articles = []
-    for i, content in enumerate(contents):
-        if isinstance(content, str) and content.strip():
-            articles[i]['content'] = content
-            valid_articles.append(articles[i])
+    # Headlines-first page while the bodies are fetched (progressive mode only)
+    publish_headlines(articles, 'output/20minutes_articles.html', RULES, '20 Minutes', 'fr')
+    if headlines_only():
+        # Feed metadata only: no article page requests, no extraction
+        valid_articles = fill_headlines(articles, RULES)
+    else:
+        tasks = [page_or_feed_body(a, fetch_article_content, a.url) for a in articles]
+        # Fetches still running at the region deadline are cancelled (None)
+        contents = await gather_until_deadline(tasks, SOURCE_ID)
+
+        valid_articles = []
+        for i, content in enumerate(contents):
+            if isinstance(content, str) and content.strip():
+                remember(SOURCE_ID, articles[i].url, content, articles[i].guid)
+            else:
+                # Page unavailable or deadline reached: cached body, else the RSS summary
+                content = fallback_content(articles[i].url, articles[i].summary, RULES)
+            if content:
+                articles[i].content = content
+                valid_articles.append(articles[i])
+
+    return save_articles(valid_articles, 'output/20minutes_articles.json', 'output/20minutes_articles.html',
+                         '20 Minutes', 'https://www.20minutes.fr/', 'Dernières actualités de 20 Minutes')
 
-    feed_object = {
-        'title': '20 Minutes',
-        'link': 'https://www.20minutes.fr/',
-        'description': 'Dernières actualités de 20 Minutes',
-        'items': valid_articles,
-    }
 
-    os.makedirs('output', exist_ok=True)
-    json_file = 'output/20minutes_articles.json'
-    html_file = 'output/20minutes_articles.html'
-
-    with open(json_file, 'w', encoding='utf-8') as f:
-        json.dump(feed_object, f, ensure_ascii=False, indent=2)
-    convert_json_to_html(json_file, html_file)
-    print(f"Saved: {os.path.abspath(html_file)}")
+def fetch_news():
+    return asyncio.run(fetch_news_async())
 
-    return feed_object
 
+async def refresh():
+    """One full refresh writing output/ (daemon.py runs this in-process)."""
+    return await fetch_news_async()
 
-def fetch_news():
-    return asyncio.run(fetch_news_async())
 
 
 if __name__ == '__main__':
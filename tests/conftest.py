@@ -0,0 +1,14 @@
+import os
+import sys
+import tempfile
+
+# State, the article store and metrics of the test run go to a scratch directory
+_SCRATCH = tempfile.mkdtemp(prefix='quicknews-tests-')
+os.environ.setdefault('QUICKNEWS_STATE_DIR', os.path.join(_SCRATCH, 'state'))
+os.environ.setdefault('QUICKNEWS_STORE', os.path.join(_SCRATCH, 'articles.db'))
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import metrics  # noqa: E402
+
+metrics.METRICS_DIR = os.path.join(_SCRATCH, 'metrics')
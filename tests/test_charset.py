@@ -0,0 +1,44 @@
+import codecs
+
+import pytest
+
+from utils import metrics
+from utils.charset import SNIFF_BYTES, decode_html, decode_with, detect_charset, normalize_charset
+
+TEXT = '<p>日本語のニュース</p>'
+
+
+@pytest.mark.parametrize('label, name', [
+    ('Shift_JIS', 'cp932'), ('x-sjis', 'cp932'), ('ISO-8859-1', 'cp1252'), ('us-ascii', 'cp1252'),
+    ('"UTF-8"', 'utf-8'), ('EUC-JP', 'euc_jp'), ('no-such-charset', None), ('', None),
+])
+def test_labels_map_to_browser_codecs(label, name):
+    assert normalize_charset(label) == name
+
+
+def test_bom_wins_over_header_and_meta():
+    body = codecs.BOM_UTF8 + b'<meta charset="shift_jis">' + TEXT.encode('utf-8')
+    assert detect_charset(body, 'text/html; charset=euc-jp') == 'utf-8'
+    assert decode_html(body, 'text/html; charset=euc-jp') == '<meta charset="shift_jis">' + TEXT
+
+
+def test_header_wins_over_meta():
+    body = b'<meta charset="utf-8">' + TEXT.encode('euc-jp')
+    assert detect_charset(body, 'text/html; charset="EUC-JP"') == 'euc_jp'
+
+
+def test_meta_and_xml_declaration():
+    assert detect_charset(b'<html><head><meta http-equiv="Content-Type" content="text/html; charset=Shift_JIS">') == 'cp932'
+    assert detect_charset(b'<?xml version="1.0" encoding="EUC-JP"?><rss/>') == 'euc_jp'
+
+
+def test_meta_is_only_looked_for_near_the_start():
+    body = b' ' * SNIFF_BYTES + b'<meta charset="shift_jis">'
+    assert detect_charset(body, default='windows-1252') == 'cp1252'
+    assert detect_charset(body) == 'utf-8'
+
+
+def test_invalid_bytes_are_replaced_and_counted():
+    replaced = metrics.get('test-charset', 'decode.replaced')
+    assert decode_with('日本'.encode('utf-8')[:-1], 'utf-8', 'test-charset') == '日�'
+    assert metrics.get('test-charset', 'decode.replaced') == replaced + 1
@@ -0,0 +1,101 @@
+import types
+
+import pytest
+
+from utils import circuit_breaker, host_limiter
+from utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker, 'time', types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def _trip(breaker):
+    for _ in range(circuit_breaker.FAILURE_THRESHOLD):
+        assert breaker.before_request() is False
+        breaker.record(False)
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker('a.test')
+    for _ in range(circuit_breaker.FAILURE_THRESHOLD - 1):
+        breaker.record(False)
+    assert breaker.state == CLOSED
+    # A success in between starts the count again
+    breaker.record(True)
+    for _ in range(circuit_breaker.FAILURE_THRESHOLD - 1):
+        breaker.record(False)
+    assert breaker.state == CLOSED
+    breaker.record(False)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpen):
+        breaker.before_request()
+
+
+def test_half_open_lets_one_probe_through_and_closes_on_success(clock):
+    breaker = CircuitBreaker('b.test')
+    _trip(breaker)
+    clock[0] += circuit_breaker.OPEN_SECONDS
+    assert breaker.state == HALF_OPEN
+    assert breaker.before_request() is True
+    # Everyone else is still turned away while the probe is out
+    with pytest.raises(CircuitOpen):
+        breaker.before_request()
+    breaker.record(True, probe=True)
+    assert breaker.state == CLOSED
+    assert breaker.before_request() is False
+    assert breaker.trips == 0
+
+
+def test_failed_probe_reopens_for_twice_as_long(clock):
+    breaker = CircuitBreaker('c.test')
+    _trip(breaker)
+    clock[0] += circuit_breaker.OPEN_SECONDS
+    assert breaker.before_request() is True
+    breaker.record(False, probe=True)
+    assert breaker.state == OPEN
+    assert breaker.open_until == clock[0] + 2 * circuit_breaker.OPEN_SECONDS
+    clock[0] += circuit_breaker.OPEN_SECONDS
+    assert breaker.state == OPEN
+    clock[0] += circuit_breaker.OPEN_SECONDS
+    assert breaker.state == HALF_OPEN
+
+
+def test_open_period_is_capped(clock):
+    breaker = CircuitBreaker('d.test', {'trips': 20})
+    breaker.record(False, probe=True)
+    assert breaker.open_until - clock[0] == circuit_breaker.MAX_OPEN_SECONDS
+
+
+def test_cancelled_probe_lets_the_next_request_probe(clock):
+    breaker = CircuitBreaker('e.test')
+    _trip(breaker)
+    clock[0] += circuit_breaker.OPEN_SECONDS
+    assert breaker.before_request() is True
+    breaker.cancel_probe()
+    assert breaker.before_request() is True
+
+
+def test_state_round_trip(clock):
+    breaker = CircuitBreaker('f.test')
+    _trip(breaker)
+    restored = CircuitBreaker('f.test', breaker.to_state())
+    assert restored.state == OPEN
+    assert restored.trips == 1
+
+
+def test_host_slot_fails_fast_while_open(clock):
+    limiter = host_limiter.get_limiter('https://breaker-open.test/a')
+    _trip(limiter.breaker)
+    with pytest.raises(CircuitOpen):
+        with host_limiter.host_slot('https://breaker-open.test/b'):
+            pytest.fail('request sent while the circuit is open')
+    # The half-open probe goes through and its success closes the circuit
+    clock[0] += circuit_breaker.OPEN_SECONDS
+    with host_limiter.host_slot('https://breaker-open.test/c') as slot:
+        assert slot.probe
+        slot.done(200)
+    assert limiter.breaker.state == CLOSED
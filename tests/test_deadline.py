@@ -0,0 +1,64 @@
+import asyncio
+import time
+
+import pytest
+
+from utils import deadline, metrics
+
+
+@pytest.fixture(autouse=True)
+def no_deadline(monkeypatch):
+    monkeypatch.delenv(deadline.DEADLINE_ENV, raising=False)
+
+
+def test_deadline_from_environment(monkeypatch):
+    assert deadline.get_deadline() is None
+    assert deadline.time_left() is None
+    assert not deadline.deadline_passed()
+    monkeypatch.setenv(deadline.DEADLINE_ENV, str(time.time() + deadline.SAVE_MARGIN - 1))
+    assert deadline.deadline_passed()
+    monkeypatch.setenv(deadline.DEADLINE_ENV, 'soon')
+    assert deadline.get_deadline() is None
+
+
+def test_set_deadline_overrides_the_environment(monkeypatch):
+    monkeypatch.setenv(deadline.DEADLINE_ENV, str(time.time() - 100))
+
+    async def run():
+        deadline.set_deadline(time.time() + deadline.SAVE_MARGIN + 60)
+        return deadline.deadline_passed()
+
+    # The context variable is local to the task asyncio.run creates
+    assert asyncio.run(run()) is False
+    assert deadline.deadline_passed()
+
+
+def test_unfinished_fetches_are_cancelled_at_the_deadline():
+    async def fetch(delay, value):
+        await asyncio.sleep(delay)
+        return value
+
+    async def fail():
+        raise ValueError('broken page')
+
+    async def run():
+        deadline.set_deadline(time.time() + deadline.SAVE_MARGIN + 0.2)
+        return await deadline.gather_until_deadline([fetch(0, 'a'), fetch(10, 'b'), fail()], 'test-deadline')
+
+    cancelled = metrics.get('test-deadline', 'deadline.cancelled')
+    start = time.monotonic()
+    results = asyncio.run(run())
+    assert time.monotonic() - start < 2
+    assert results[0] == 'a'
+    assert results[1] is None
+    assert isinstance(results[2], ValueError)
+    assert metrics.get('test-deadline', 'deadline.cancelled') == cancelled + 1
+
+
+def test_without_deadline_everything_finishes():
+    async def fetch(value):
+        await asyncio.sleep(0.01)
+        return value
+
+    assert asyncio.run(deadline.gather_until_deadline([fetch(1), fetch(2)])) == [1, 2]
+    assert asyncio.run(deadline.gather_until_deadline([])) == []
@@ -0,0 +1,35 @@
+from utils.extractor import extract_main_content, native_summary
+
+BODY = ''.join(f'<p>Paragraph {i} of the story, with enough words to count as text.</p>' for i in range(6))
+PAGE = f'''<html><body>
+<div class="sidebar"><ul>{''.join(f'<li><a href="/{i}">Related headline number {i} here</a></li>' for i in range(10))}</ul></div>
+<div class="article-body"><section>{BODY}</section></div>
+<footer><p>Copyright notice of the site, all rights reserved.</p></footer>
+</body></html>'''
+
+
+def test_native_picks_the_article_body():
+    summary = native_summary(PAGE, 'en')
+    assert 'Paragraph 0 of the story' in summary
+    assert 'Paragraph 5 of the story' in summary
+    assert 'Related headline' not in summary
+    assert 'Copyright' not in summary
+
+
+def test_native_scores_cjk_text():
+    body = ''.join(f'<p>これは記事の本文です。段落{i}の文章が続きます、内容があります。</p>' for i in range(5))
+    page = f'<html><body><div class="menu"><p><a href="/a">トップページへ戻るリンクです一覧</a></p></div><div>{body}</div></body></html>'
+    summary = native_summary(page, 'ja')
+    assert '段落0' in summary and '段落4' in summary
+    assert 'トップページ' not in summary
+
+
+def test_pages_without_blocks():
+    assert native_summary('<html><body><p>short</p></body></html>') == ''
+    assert extract_main_content('', 'native') == ''
+
+
+def test_bytes_are_parsed_with_their_charset():
+    page = PAGE.replace('<html>', '<html><head><meta charset="cp1252"></head>').replace('story', 'stôry')
+    summary = extract_main_content(page.encode('cp1252'), 'native', 'fr')
+    assert 'Paragraph 3 of the stôry' in summary
@@ -0,0 +1,160 @@
+from datetime import datetime, timezone
+
+import feedparser
+import pytest
+
+from utils import feeds, site_rules
+from utils.feed_reader import FeedReadError, read_feed
+from utils.site_rules import SiteRules
+from utils.timestamps import get_zone
+
+RSS = b"""<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0" xmlns:dc="http://purl.org/dc/elements/1.1/"
+     xmlns:content="http://purl.org/rss/1.0/modules/content/"
+     xmlns:media="http://search.yahoo.com/mrss/">
+<channel>
+<title>Example</title>
+<link>https://example.com/</link>
+<item>
+  <title>Third</title>
+  <link>https://example.com/3</link>
+  <guid isPermaLink="false">id-3</guid>
+  <description>Summary three</description>
+  <pubDate>Mon, 19 Oct 2026 09:00:00 +0900</pubDate>
+  <dc:creator>Reporter</dc:creator>
+  <category>Politics</category>
+  <content:encoded><![CDATA[<p>Body three</p>]]></content:encoded>
+  <media:content url="https://example.com/3.jpg" medium="image"/>
+</item>
+<item>
+  <title>Second</title>
+  <link>https://example.com/2</link>
+  <pubDate>Sun, 18 Oct 2026 09:00:00 GMT</pubDate>
+  <enclosure url="https://example.com/2.jpg" type="image/jpeg" length="10"/>
+</item>
+<item>
+  <title>First</title>
+  <link>https://example.com/1</link>
+  <pubDate>Sat, 17 Oct 2026 09:00:00 GMT</pubDate>
+</item>
+</channel>
+</rss>
+"""
+
+ATOM = b"""<?xml version="1.0" encoding="utf-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+<title>Atom example</title>
+<link rel="alternate" href="https://example.org/"/>
+<entry>
+  <title>Entry</title>
+  <link rel="alternate" href="https://example.org/e"/>
+  <id>urn:e</id>
+  <updated>2026-10-19T09:00:00+09:00</updated>
+  <author><name>Writer</name></author>
+  <summary>Short</summary>
+  <category term="world"/>
+</entry>
+</feed>
+"""
+
+RDF = b"""<?xml version="1.0" encoding="UTF-8"?>
+<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+         xmlns="http://purl.org/rss/1.0/" xmlns:dc="http://purl.org/dc/elements/1.1/">
+<channel rdf:about="https://example.jp/"><title>RDF example</title><link>https://example.jp/</link></channel>
+<item rdf:about="https://example.jp/a">
+  <title>Item</title>
+  <link>https://example.jp/a</link>
+  <dc:date>2026-10-19T09:00:00+09:00</dc:date>
+</item>
+</rdf:RDF>
+"""
+
+# Dates without a zone, newest first
+NAIVE = b"""<?xml version="1.0"?>
+<rss version="2.0"><channel><title>Naive</title>
+<item><title>Morning</title><link>https://example.com/m</link><pubDate>2026-10-19T08:00:00</pubDate></item>
+<item><title>Night</title><link>https://example.com/n</link><pubDate>2026-10-18T23:30:00</pubDate></item>
+</channel></rss>
+"""
+
+# Oldest first
+UNSORTED = b"""<?xml version="1.0"?>
+<rss version="2.0"><channel><title>Unsorted</title>
+<item><title>Old</title><link>https://example.com/o</link><pubDate>Sat, 17 Oct 2026 09:00:00 GMT</pubDate></item>
+<item><title>New</title><link>https://example.com/n</link><pubDate>Mon, 19 Oct 2026 09:00:00 GMT</pubDate></item>
+</channel></rss>
+"""
+
+KEYS = ('title', 'link', 'id', 'summary', 'published', 'published_parsed', 'updated',
+        'updated_parsed', 'author', 'links', 'tags', 'media_content', 'content')
+
+
+@pytest.mark.parametrize('body', [RSS, ATOM, RDF], ids=['rss20', 'atom10', 'rss10'])
+def test_entries_match_feedparser(body):
+    expected = feedparser.parse(body)
+    result = read_feed(body)
+    assert result.version == expected.version
+    assert result.feed.title == expected.feed.title
+    assert result.feed.link == expected.feed.link
+    assert len(result.entries) == len(expected.entries)
+    for entry, reference in zip(result.entries, expected.entries):
+        for key in KEYS:
+            if key not in reference:
+                continue
+            if key == 'tags':
+                assert [t['term'] for t in entry.tags] == [t['term'] for t in reference.tags]
+            elif key == 'links':
+                assert [l['href'] for l in entry.links] == [l['href'] for l in reference.links]
+            elif key == 'content':
+                assert entry.content[0]['value'] == reference.content[0]['value']
+            elif key == 'media_content':
+                assert entry.media_content[0]['url'] == reference.media_content[0]['url']
+            else:
+                assert entry[key] == reference[key], key
+
+
+def test_limit_stops_reading():
+    result = read_feed(RSS, limit=2)
+    assert [e.title for e in result.entries] == ['Third', 'Second']
+    assert result.truncated
+
+
+def test_since_stops_at_the_first_older_entry():
+    result = read_feed(RSS, since=datetime(2026, 10, 18, tzinfo=timezone.utc))
+    assert [e.title for e in result.entries] == ['Third', 'Second']
+    assert result.truncated
+
+
+def test_since_reads_dates_without_zone_in_tz():
+    tokyo = get_zone('Asia/Tokyo')
+    since = tokyo.localize(datetime(2026, 10, 19, 0, 0))
+    # 23:30 UTC is 08:30 in Tokyo, after since
+    assert len(read_feed(NAIVE, since=since).entries) == 2
+    # 23:30 in Tokyo is before since
+    assert [e.title for e in read_feed(NAIVE, since=since, tz=tokyo).entries] == ['Morning']
+
+
+def test_not_a_feed():
+    with pytest.raises(FeedReadError):
+        read_feed(b'<html><body>nope</body></html>')
+
+
+@pytest.fixture
+def rules(monkeypatch):
+    def use(spec):
+        monkeypatch.setitem(site_rules.RULES, 'test-feed', SiteRules('test-feed', spec))
+    return use
+
+
+def test_unsorted_feeds_are_read_past_older_entries(rules):
+    since = datetime(2026, 10, 18, tzinfo=timezone.utc)
+
+    rules({})
+    result = feeds._parse('https://example.com/feed', UNSORTED, {}, 200, 'test-feed', since=since)
+    assert [e.title for e in result.entries] == ['Old', 'New']
+    assert not result.truncated
+
+    rules({'feed_sorted': True})
+    result = feeds._parse('https://example.com/feed', UNSORTED, {}, 200, 'test-feed', since=since)
+    assert result.entries == []
+    assert result.truncated
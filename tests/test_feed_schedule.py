@@ -0,0 +1,83 @@
+import pytest
+
+from utils import feed_schedule
+from utils.feed_schedule import FeedSchedule
+from utils.site_rules import SiteRules
+
+RULES = SiteRules('test-schedule', {'poll_min_interval': 60, 'poll_max_interval': 3600})
+T0 = 1_000_000.0
+
+
+def _guids(start, count):
+    return [f'g{i}' for i in range(start, start + count)]
+
+
+def test_first_poll_learns_guids_without_counting_them():
+    schedule = FeedSchedule('https://example.com/feed', RULES)
+    assert schedule.record(_guids(0, 20), now=T0) == 0
+    assert schedule.rate is None
+    assert schedule.interval == 60
+
+
+def test_interval_follows_the_arrival_rate():
+    schedule = FeedSchedule('https://example.com/feed', RULES)
+    schedule.record(_guids(0, 10), now=T0)
+    # 2 new items in 600 s: one every 300 s
+    assert schedule.record(_guids(0, 12), now=T0 + 600) == 2
+    assert schedule.rate == pytest.approx(2 / 600)
+    assert schedule.interval == pytest.approx(300)
+    # 6 new items in 300 s; the rate moves by RATE_ALPHA towards 1/50
+    assert schedule.record(_guids(0, 18), now=T0 + 900) == 6
+    expected = feed_schedule.RATE_ALPHA * 6 / 300 + (1 - feed_schedule.RATE_ALPHA) * 2 / 600
+    assert schedule.rate == pytest.approx(expected)
+    assert schedule.interval == pytest.approx(1 / expected)
+
+
+def test_interval_is_clamped():
+    schedule = FeedSchedule('https://example.com/feed', RULES)
+    schedule.record(_guids(0, 1), now=T0)
+    schedule.record(_guids(0, 101), now=T0 + 100)
+    assert schedule.interval == 60
+    slow = FeedSchedule('https://example.com/slow', RULES)
+    slow.record(_guids(0, 1), now=T0)
+    slow.record(_guids(0, 2), now=T0 + 86400)
+    assert slow.interval == 3600
+
+
+def test_unchanged_polls_back_off_to_the_maximum():
+    schedule = FeedSchedule('https://example.com/feed', RULES)
+    schedule.record(_guids(0, 5), now=T0)
+    now = T0
+    intervals = []
+    for _ in range(12):
+        now += schedule.interval
+        # 304 Not Modified
+        assert schedule.record(None, now=now) == 0
+        intervals.append(schedule.interval)
+    assert intervals[0] == pytest.approx(60 * feed_schedule.UNCHANGED_BACKOFF)
+    assert intervals[1] == pytest.approx(60 * feed_schedule.UNCHANGED_BACKOFF ** 2)
+    assert intervals[-1] == 3600
+    assert schedule.unchanged == 12
+    # New items reset the backoff
+    schedule.record(_guids(0, 6), now=now + 3600)
+    assert schedule.unchanged == 0
+
+
+def test_validators_and_due():
+    schedule = FeedSchedule('https://example.com/feed', RULES)
+    assert schedule.conditional_headers() == {}
+    schedule.record(_guids(0, 1), {'etag': '"v1"', 'last-modified': 'Mon, 19 Oct 2026 00:00:00 GMT'}, now=T0)
+    assert schedule.conditional_headers() == {'If-None-Match': '"v1"',
+                                              'If-Modified-Since': 'Mon, 19 Oct 2026 00:00:00 GMT'}
+    assert not schedule.due(now=T0 + 30)
+    assert schedule.due(now=T0 + 60)
+    assert 54 <= schedule.next_delay(now=T0) <= 66
+
+
+def test_state_round_trip():
+    schedule = FeedSchedule('https://example.com/feed', RULES)
+    schedule.record(_guids(0, 3), {'etag': 'x'}, now=T0)
+    schedule.record(_guids(0, 5), now=T0 + 120)
+    restored = FeedSchedule('https://example.com/feed', RULES, schedule.to_state())
+    assert restored.to_state() == schedule.to_state()
+    assert restored.record(_guids(0, 5), now=T0 + 240) == 0
@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+
+from utils import hedging, metrics
+
+
+class _Limiter:
+    def percentile(self, q=0.9):
+        return 0.05
+
+
+@pytest.fixture
+def hedge_on(monkeypatch):
+    monkeypatch.setenv('QUICKNEWS_HEDGE', '1')
+    monkeypatch.setattr(hedging, 'BUDGET', hedging.HedgeBudget())
+    monkeypatch.setattr(hedging, 'get_limiter', lambda url: _Limiter())
+
+
+def _call(queued, latency, calls):
+    async def make_call(acquired):
+        calls.append(acquired)
+        await asyncio.sleep(queued)
+        acquired.set()
+        await asyncio.sleep(latency)
+        return len(calls)
+    return make_call
+
+
+def test_waiting_for_a_host_slot_does_not_fire_a_hedge(hedge_on):
+    calls = []
+    fired = metrics.get('hedge-queued', 'hedge.fired')
+    # Queued four times the p90 for a slot, then fast
+    result = asyncio.run(hedging.hedged(_call(0.2, 0.01, calls), 'https://example.com/a', 'hedge-queued'))
+    assert result == 1
+    assert len(calls) == 1
+    assert metrics.get('hedge-queued', 'hedge.fired') == fired
+
+
+def test_slow_response_after_the_slot_fires_a_hedge(hedge_on):
+    calls = []
+    asyncio.run(hedging.hedged(_call(0, 0.3, calls), 'https://example.com/a', 'hedge-slow'))
+    assert len(calls) == 2
+    assert metrics.get('hedge-slow', 'hedge.fired') == 1
+
+
+def test_primary_failing_before_its_slot_is_raised(hedge_on):
+    async def make_call(acquired):
+        raise RuntimeError('circuit open')
+    with pytest.raises(RuntimeError):
+        asyncio.run(hedging.hedged(make_call, 'https://example.com/a', 'hedge-failed'))
@@ -0,0 +1,111 @@
+import asyncio
+import email.utils
+import time
+
+import pytest
+
+from utils import host_limiter
+from utils.host_limiter import HostBackoff, HostLimiter, parse_retry_after
+
+
+def test_successes_raise_the_limit_additively():
+    limiter = HostLimiter('aimd.test')
+    start = limiter.limit
+    # About one full window of healthy responses adds one slot
+    for _ in range(int(start)):
+        limiter.record(200, 0.1)
+    assert start + 0.8 < limiter.limit <= start + 1
+    for _ in range(1000):
+        limiter.record(200, 0.1)
+    assert limiter.limit == host_limiter.MAX_LIMIT
+
+
+def test_slow_responses_do_not_raise_the_limit():
+    limiter = HostLimiter('slow.test')
+    limiter.record(200, 0.1)
+    limit = limiter.limit
+    limiter.record(200, 0.1 * host_limiter.LATENCY_TOLERANCE * 2)
+    assert limiter.limit == limit
+
+
+def test_throttling_halves_the_limit_once_per_round_trip():
+    limiter = HostLimiter('md.test', {'limit': 8, 'updated': time.time()})
+    limiter.record(503)
+    assert limiter.limit == 4
+    # Responses that were already in flight don't cut it again
+    limiter.record(429)
+    assert limiter.limit == 4
+    limiter._last_decrease -= 10
+    limiter.record(None)
+    assert limiter.limit == 2
+    for _ in range(5):
+        limiter._last_decrease -= 10
+        limiter.record(403)
+    assert limiter.limit == host_limiter.MIN_LIMIT
+
+
+def test_failures_pause_the_host_with_growing_cooldown():
+    limiter = HostLimiter('cooldown.test')
+    limiter.record(503)
+    first = limiter.blocked_until - time.time()
+    assert 0 < first <= host_limiter.THROTTLE_COOLDOWN
+    limiter.record(503)
+    assert limiter.blocked_until - time.time() > first
+    limiter.record(200, 0.1)
+    assert limiter.failures == 0
+
+
+def test_retry_after_sets_the_pause():
+    limiter = HostLimiter('retry-after.test')
+    limiter.record(429, retry_after=30)
+    assert 29 < limiter.blocked_until - time.time() <= 30
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('120') == 120
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('soon') is None
+    now = time.time()
+    assert parse_retry_after(email.utils.formatdate(now + 90, usegmt=True), now) == pytest.approx(90, abs=1)
+    assert parse_retry_after(email.utils.formatdate(now - 90, usegmt=True), now) == 0
+
+
+def test_long_pause_raises_host_backoff():
+    limiter = HostLimiter('backoff.test')
+    limiter.record(429, retry_after=host_limiter.MAX_RETRY_WAIT + 60)
+    with pytest.raises(HostBackoff):
+        limiter.wait_sync()
+    with pytest.raises(HostBackoff):
+        asyncio.run(limiter.acquire())
+
+
+def test_slot_reports_retry_after_from_headers():
+    limiter = host_limiter.get_limiter('https://slot-retry.test/')
+    with host_limiter.host_slot('https://slot-retry.test/a') as slot:
+        slot.done(429, {'retry-after': '20'})
+    assert 19 < limiter.blocked_until - time.time() <= 20
+
+
+def test_concurrency_stays_within_the_limit():
+    limiter = HostLimiter('inflight.test', {'limit': 2, 'updated': time.time()})
+    peak = []
+
+    async def request():
+        await limiter.acquire()
+        peak.append(limiter.inflight)
+        await asyncio.sleep(0.01)
+        await limiter.release()
+
+    async def run():
+        await asyncio.gather(*(request() for _ in range(8)))
+
+    asyncio.run(run())
+    assert max(peak) == 2
+    assert limiter.inflight == 0
+
+
+def test_stale_saved_state_is_ignored():
+    old = {'limit': 12, 'latency': 0.5, 'updated': time.time() - host_limiter.STATE_TTL - 1}
+    assert HostLimiter('stale.test', old).limit == host_limiter.INITIAL_LIMIT
+    fresh = dict(old, updated=time.time())
+    assert HostLimiter('fresh.test', fresh).limit == 12
@@ -0,0 +1,143 @@
+import asyncio
+import gzip
+import zlib
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from utils import http_fetch, metrics
+
+SOURCE = 'test-http-fetch'
+PAGE = ('<html><head><title>t</title></head><body>' + '<p>Paragraph of text.</p>' * 500 + '</body></html>').encode()
+
+
+def _serve(body, headers, session=None, **read_kwargs):
+    """read_page_async of one response from a local server (session: kwargs of a plain aiohttp session)."""
+    async def handler(request):
+        return web.Response(body=body, headers=headers)
+
+    async def run():
+        app = web.Application()
+        app.router.add_get('/', handler)
+        async with TestServer(app) as server:
+            own = aiohttp.ClientSession(**session) if session is not None else http_fetch.client_session()
+            async with own:
+                async with own.get(server.make_url('/')) as response:
+                    if read_kwargs:
+                        return await http_fetch.read_body_async(response, SOURCE, session=own, **read_kwargs)
+                    return await http_fetch.read_page_async(response, SOURCE, own)
+    return asyncio.run(run())
+
+
+def _html(coding):
+    return {'Content-Type': 'text/html; charset=utf-8', 'Content-Encoding': coding}
+
+
+def test_gzip():
+    assert _serve(gzip.compress(PAGE), _html('gzip')) == (PAGE, 'utf-8')
+
+
+def test_deflate_zlib_wrapped_and_raw():
+    assert _serve(zlib.compress(PAGE), _html('deflate')) == (PAGE, 'utf-8')
+    raw = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    assert _serve(raw.compress(PAGE) + raw.flush(), _html('deflate')) == (PAGE, 'utf-8')
+
+
+@pytest.mark.skipif(http_fetch.brotli is None, reason='brotli not installed')
+def test_brotli():
+    assert _serve(http_fetch.brotli.compress(PAGE), _html('br')) == (PAGE, 'utf-8')
+
+
+@pytest.mark.skipif(http_fetch.zstandard is None, reason='zstandard not installed')
+def test_zstd():
+    body = http_fetch.zstandard.ZstdCompressor().compress(PAGE)
+    assert _serve(body, _html('zstd')) == (PAGE, 'utf-8')
+
+
+def test_transfer_counts_wire_and_decoded_bytes():
+    body = gzip.compress(PAGE)
+    before = (metrics.get('127.0.0.1', 'transfer.compressed_bytes'),
+              metrics.get('127.0.0.1', 'transfer.uncompressed_bytes'))
+    _serve(body, _html('gzip'))
+    assert metrics.get('127.0.0.1', 'transfer.compressed_bytes') - before[0] == len(body)
+    assert metrics.get('127.0.0.1', 'transfer.uncompressed_bytes') - before[1] == len(PAGE)
+
+
+def test_limit_applies_to_the_decompressed_body():
+    # 64 KB on the wire, 64 MB once inflated
+    bomb = gzip.compress(b'\0' * (64 * 1024 * 1024))
+    aborted = metrics.get(SOURCE, 'fetch.aborted_too_large')
+    assert _serve(bomb, _html('gzip'), content_types=(), max_bytes=1024 * 1024) is None
+    assert metrics.get(SOURCE, 'fetch.aborted_too_large') == aborted + 1
+
+
+def test_unknown_encoding_is_skipped():
+    aborted = metrics.get(SOURCE, 'fetch.aborted_encoding')
+    assert _serve(PAGE, _html('compress')) is None
+    assert metrics.get(SOURCE, 'fetch.aborted_encoding') == aborted + 1
+
+
+def test_session_that_decompresses_by_itself():
+    # Read through the session's public auto_decompress setting, not decoded twice
+    assert _serve(gzip.compress(PAGE), _html('gzip'), session={'auto_decompress': True}) == (PAGE, 'utf-8')
+
+
+def test_charset_from_meta_when_the_header_has_none():
+    page = '<html><head><meta charset="Shift_JIS"></head><body><p>日本語</p></body></html>'
+    body, charset = _serve(page.encode('cp932'), {'Content-Type': 'text/html'})
+    assert charset == 'cp932'
+    assert body.decode(charset) == page
+
+
+def test_charset_header_wins_over_meta():
+    page = '<html><head><meta charset="iso-8859-1"></head><body><p>日本語</p></body></html>'
+    assert _serve(page.encode('euc-jp'), {'Content-Type': 'text/html; charset=EUC-JP'})[1] == 'euc_jp'
+
+
+def test_content_type_outside_the_rules_is_skipped():
+    aborted = metrics.get(SOURCE, 'fetch.aborted_content_type')
+    assert _serve(b'%PDF-1.7', {'Content-Type': 'application/pdf'}) is None
+    assert metrics.get(SOURCE, 'fetch.aborted_content_type') == aborted + 1
+    # An empty set accepts anything (feeds)
+    assert _serve(b'%PDF-1.7', {'Content-Type': 'application/pdf'}, content_types=()) == b'%PDF-1.7'
+
+
+def test_declared_length_over_the_limit_is_skipped():
+    aborted = metrics.get(SOURCE, 'fetch.aborted_too_large')
+    assert _serve(PAGE, {'Content-Type': 'text/html'}, content_types=None, max_bytes=1024) is None
+    assert metrics.get(SOURCE, 'fetch.aborted_too_large') == aborted + 1
+
+
+def test_undeclared_length_is_cut_while_reading():
+    async def handler(request):
+        response = web.StreamResponse(headers={'Content-Type': 'text/html'})
+        response.enable_chunked_encoding()
+        await response.prepare(request)
+        for _ in range(64):
+            await response.write(b'x' * 1024)
+        return response
+
+    async def run():
+        app = web.Application()
+        app.router.add_get('/', handler)
+        async with TestServer(app) as server:
+            async with http_fetch.client_session() as session:
+                async with session.get(server.make_url('/')) as response:
+                    assert response.content_length is None
+                    return await http_fetch.read_body_async(response, SOURCE, max_bytes=16 * 1024, session=session)
+
+    aborted = metrics.get(SOURCE, 'fetch.aborted_too_large')
+    assert asyncio.run(run()) is None
+    assert metrics.get(SOURCE, 'fetch.aborted_too_large') == aborted + 1
+
+
+def test_accept_response_for_pages_fetched_elsewhere():
+    assert http_fetch.accept_response(SOURCE, 'https://example.com/', {'content-type': 'text/html'}, 100)
+    assert not http_fetch.accept_response(SOURCE, 'https://example.com/', {'Content-Type': 'image/png'})
+    limit = http_fetch.get_rules(SOURCE).max_body_bytes
+    assert not http_fetch.accept_response(SOURCE, 'https://example.com/', {'content-type': 'text/html'}, limit + 1)
+    # A compressed body's declared length says nothing about the decoded size
+    headers = {'content-type': 'text/html', 'content-encoding': 'gzip', 'content-length': str(limit + 1)}
+    assert http_fetch.accept_response(SOURCE, 'https://example.com/', headers)
@@ -0,0 +1,43 @@
+import pytest
+
+from utils.pretrim import PreTrimmer, slice_container, strip_payloads
+
+PAGE = (b'<html><head><title>T</title><script>var a = "<p>";</script></head><body>'
+        b'<svg class="icon" viewBox="0 0 10 10"/><p>First paragraph.</p>'
+        b'<style>p { color: red }</style><p>Second <b>paragraph</b>.</p>'
+        b'<svg><path d="M0 0"/></svg><noscript><img src="x"></noscript>'
+        b'<script src="a.js"/><p>Third paragraph.</p></body></html>')
+EXPECTED = (b'<html><head><title>T</title></head><body><p>First paragraph.</p>'
+            b'<p>Second <b>paragraph</b>.</p><p>Third paragraph.</p></body></html>')
+
+
+def test_strip_payloads():
+    assert strip_payloads(PAGE) == EXPECTED
+
+
+def test_self_closing_svg_keeps_the_markup_after_it():
+    page = b'<p>Before</p><svg class="icon"/><p>Article body</p><svg><g/></svg><p>After</p>'
+    assert strip_payloads(page) == b'<p>Before</p><p>Article body</p><p>After</p>'
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 5, 7, 13])
+def test_tags_split_across_chunks(size):
+    trimmer = PreTrimmer()
+    out = b''.join(trimmer.feed(PAGE[i:i + size]) for i in range(0, len(PAGE), size)) + trimmer.close()
+    assert out == EXPECTED
+    assert trimmer.bytes_in == len(PAGE)
+    assert trimmer.bytes_out == len(EXPECTED)
+
+
+def test_unclosed_payload_is_dropped_to_the_end():
+    assert strip_payloads(b'<p>Kept</p><script>never closed <p>x</p>') == b'<p>Kept</p>'
+
+
+def test_slice_container_keeps_head():
+    body = b'<p>' + b'x' * 600 + b'</p>'
+    page = (b'<html><head><meta charset="utf-8"></head><body><div id="nav"><div>menu</div></div>'
+            b'<div id="main"><div>' + body + b'</div></div><div id="footer"></div></body></html>')
+    sliced = slice_container(page, [b'id="main"'])
+    assert sliced == (b'<html><head><meta charset="utf-8"></head><body><div id="main"><div>' + body
+                      + b'</div></div></body></html>')
+    assert slice_container(page, [b'id="missing"']) is None
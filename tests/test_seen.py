@@ -0,0 +1,69 @@
+import pytest
+
+from utils import metrics, seen, store
+from utils.seen import BloomFilter
+
+
+@pytest.fixture
+def seen_store(tmp_path, monkeypatch):
+    """A fresh article store and no filters loaded."""
+    store.close()
+    monkeypatch.setattr(store, 'STORE_FILE', str(tmp_path / 'articles.db'))
+    monkeypatch.setattr(seen, '_filters', {})
+    monkeypatch.setattr(seen, '_dirty', set())
+    yield store
+    store.close()
+
+
+@pytest.mark.parametrize('error_rate', [0.01, 0.001])
+def test_false_positive_rate_at_capacity(error_rate):
+    capacity = 20000
+    bloom = BloomFilter(capacity, error_rate)
+    added = [f'https://example.com/news/{i}' for i in range(capacity)]
+    for key in added:
+        bloom.add(key)
+    # No false negatives
+    assert all(key in bloom for key in added)
+    probes = 100000
+    false_positives = sum(f'https://example.com/other/{i}' in bloom for i in range(probes))
+    assert false_positives / probes < 2 * error_rate
+    assert bloom.false_positive_rate() == pytest.approx(error_rate, rel=0.5)
+
+
+def test_add_reports_new_keys():
+    bloom = BloomFilter(100, 0.01)
+    assert bloom.add('a')
+    assert not bloom.add('a')
+    assert bloom.items == 1
+
+
+def test_saved_bits_are_reused():
+    bloom = BloomFilter(1000, 0.01)
+    bloom.add('x')
+    copy = BloomFilter(1000, 0.01, bytes(bloom.bits), bloom.items)
+    assert 'x' in copy and copy.items == 1
+    # Bits of another size are not trusted
+    assert 'x' not in BloomFilter(2000, 0.01, bytes(bloom.bits), 1)
+
+
+def test_seen_entries_survive_a_restart(seen_store, monkeypatch):
+    assert not seen.is_seen('npr', 'https://example.com/a?utm_source=x', 'guid-a')
+    seen.mark_seen('npr', 'https://example.com/a?utm_source=x', 'guid-a')
+    assert seen.is_seen('npr', 'https://example.com/a')
+    seen.save()
+
+    # Next run: the filter is read back from the store
+    monkeypatch.setattr(seen, '_filters', {})
+    assert seen.is_seen('npr', 'https://example.com/other', 'guid-a')
+    assert not seen.is_seen('npr', 'https://example.com/b')
+
+
+def test_filter_is_rebuilt_from_the_seen_table(seen_store, monkeypatch):
+    seen.mark_seen('npr', 'https://example.com/a')
+    store.flush()
+    # No saved filter: rebuilt from the recorded keys
+    monkeypatch.setattr(seen, '_filters', {})
+    monkeypatch.setattr(seen, '_dirty', set())
+    rebuilt = metrics.get('npr', 'seen.rebuilt')
+    assert seen.is_seen('npr', 'https://example.com/a')
+    assert metrics.get('npr', 'seen.rebuilt') == rebuilt + 1
@@ -0,0 +1,60 @@
+import os
+
+from utils.site_rules import RULES_DIR, SiteRules, clean_html, is_trivial, load_rules, select_content, summary_content
+
+
+def test_every_rule_file_compiles():
+    names = {name[:-len('.json')] for name in os.listdir(RULES_DIR) if name.endswith('.json')}
+    assert set(load_rules()) == names
+
+
+def test_clean_html_applies_the_rules():
+    rules = SiteRules('test-rules', {
+        'drop_tags': ['script'],
+        'drop_classes': ['ad'],
+        'drop_class_substrings': [{'tags': ['div'], 'patterns': ['Related']}],
+        'drop_selectors': ['aside.promo'],
+        'drop_text': {'tags': ['span'], 'values': ['Advertisement']},
+        'unwrap_tags': ['a'],
+        'paragraph_class': 'body-p',
+        'strip_attributes': 'empty',
+        'remove_empty': 'repeat',
+        'remove_empty_tags': ['div', 'p'],
+        'drop_figures_without_media': True,
+    })
+    html = ('<div><script>x()</script><p class="ad">Buy</p><div class="story-related-links">More</div>'
+            '<aside class="promo">Sub</aside><span>ADVERTISEMENT</span><p id="">Read <a href="/x">this</a>.</p>'
+            '<p> </p><div><div></div></div><figure><figcaption>No image</figcaption></figure></div>')
+    assert clean_html(html, rules) == '<div><p class="body-p">Read this.</p></div>'
+
+
+def test_prepend_selectors_copy_from_the_page():
+    rules = SiteRules('test-prepend', {'prepend_selectors': ['.lead']})
+    page = '<html><body><p class="lead">Lead</p><div><p>Body</p></div></body></html>'
+    assert clean_html('<p>Body</p>', rules, page) == '<p class="lead">Lead</p><p>Body</p>'
+
+
+def test_select_content_tries_selectors_then_the_page():
+    rules = SiteRules('test-select', {
+        'content_selectors': ['#missing', 'article'],
+        'min_paragraph_length': 10,
+        'paragraph_exclude': ['Copyright'],
+        'min_content_length': 20,
+    })
+    page = ('<html><body><article><p>First paragraph of text.</p><p>short</p>'
+            '<p>Copyright the newspaper</p><p>Second &amp; last.  </p></article></body></html>')
+    assert select_content(page, rules) == '<p>First paragraph of text.</p>\n<p>Second &amp; last.</p>'
+    assert select_content('<p>Paragraph outside any container.</p>', rules) == ''
+    rules = SiteRules('test-select', {'fallback_to_page': True})
+    assert select_content('<p>Paragraph outside any container.</p>', rules) == '<p>Paragraph outside any container.</p>'
+
+
+def test_trivial_bodies_and_summary_fallback():
+    rules = SiteRules('test-trivial', {'min_text_length': 10, 'boilerplate_text': ['Please enable JavaScript'],
+                                       'paragraph_class': 'p'})
+    assert is_trivial('', rules)
+    assert is_trivial('<p>Too short</p>', rules)
+    assert is_trivial('<p>Please enable JavaScript to read this article.</p>', rules)
+    assert not is_trivial('<p>A real article body.</p>', rules)
+    assert summary_content('<b>Summary</b> &lt;text&gt;', rules) == '<p class="p">Summary &lt;text&gt;</p>'
+    assert summary_content('', rules) == ''
@@ -0,0 +1,92 @@
+import json
+import os
+
+from utils import sources
+from utils.sources import load_registry
+
+
+def _registry(tmp_path, spec):
+    path = tmp_path / 'sources.json'
+    path.write_text(json.dumps(spec), encoding='utf-8')
+    return load_registry(str(path))
+
+
+def test_regions_list_their_sources_in_order(tmp_path):
+    regions, found = _registry(tmp_path, {
+        'regions': {
+            'us': {'timezone': 'US/Eastern', 'budget': 90, 'sources': ['cbs', 'npr', 'gone'], 'concurrency': 1},
+            'jp': {'timezone': 'Asia/Tokyo', 'sources': ['nhk']},
+        },
+        'sources': {
+            'cbs': {'script': 'scrapers/cbs_scraper.py'},
+            'npr': {'script': 'scrapers/npr_scraper.py', 'output': 'output/npr_news_articles.html', 'enabled': False},
+            'nhk': {'script': 'scrapers/nhk_jp_scraper.py'},
+            'broken': {},
+        },
+    })
+    assert list(regions) == ['us', 'jp']
+    us = regions['us']
+    assert [s.source_id for s in us.all_sources] == ['cbs', 'npr']
+    assert [s.source_id for s in us.sources] == ['cbs']
+    assert us.budget == 90 and us.concurrency == 1
+    assert found['cbs'].output == 'output/cbs_articles.html'
+    assert found['npr'].output == 'output/npr_news_articles.html'
+    assert 'broken' not in found
+    assert regions['jp'].concurrency == 1
+    assert regions['jp'].timestamp_prefix == sources.DEFAULT_TIMESTAMP_PREFIX
+
+
+def test_missing_registry_file(tmp_path):
+    assert load_registry(str(tmp_path / 'missing.json')) == ({}, {})
+
+
+def test_configured_sources_have_scrapers():
+    for name in sources.region_names():
+        region = sources.get_region(name)
+        assert region.sources
+        for source in region.sources:
+            assert os.path.exists(os.path.join(sources.ROOT_DIR, source.script)), source.script
+    assert sources.source_timezone('nhk') == 'Asia/Tokyo'
+    assert sources.source_timezone('no-such-source') == sources.DEFAULT_TIMEZONE
+
+
+OPML = '''<?xml version="1.0" encoding="UTF-8"?>
+<opml version="2.0"><head><title>Feeds</title></head><body>
+<outline text="World">
+  <outline text="Le Monde - International" xmlUrl="https://www.lemonde.fr/international/rss_full.xml" htmlUrl="https://www.lemonde.fr/"/>
+  <outline text="朝日新聞" xmlUrl="https://www.asahi.com/rss/asahi/newsheadlines.rdf" language="ja"/>
+  <outline text="Duplicate" xmlUrl="https://www.lemonde.fr/international/rss_full.xml"/>
+</outline>
+<outline text="Folder without feed"/>
+</body></opml>
+'''
+
+
+def test_feeds_and_opml_become_generic_sources(tmp_path):
+    opml = tmp_path / 'feeds.opml'
+    opml.write_text(OPML, encoding='utf-8')
+    regions, found = _registry(tmp_path, {
+        'regions': {'fr': {
+            'language': 'fr',
+            'sources': ['rfi'],
+            'feeds': [{'id': 'Ouest France', 'url': 'https://www.ouest-france.fr/rss/une', 'max_items': 5},
+                      {'id': 'rfi', 'url': 'https://example.com/clash'}],
+            'opml': str(opml),
+        }},
+        'sources': {'rfi': {'script': 'scrapers/rfi_scraper.py'}},
+    })
+    region = regions['fr']
+    assert [s.source_id for s in region.sources] == [
+        'rfi', 'ouest_france', 'le_monde_international', 'www_asahi_com_rss_asahi_newsheadlines_rdf']
+    assert [s.source_id for s in region.feeds()] == [s.source_id for s in region.sources[1:]]
+    assert region.scripts == ['scrapers/rfi_scraper.py', sources.RSS_DRIVER_SCRIPT]
+    ouest = found['ouest_france']
+    assert ouest.generic and ouest.max_items == 5 and ouest.language == 'fr'
+    le_monde = found['le_monde_international']
+    assert le_monde.title == 'Le Monde - International'
+    assert le_monde.site == 'https://www.lemonde.fr/'
+    assert le_monde.max_items == sources.DEFAULT_MAX_ITEMS
+    # The outline's own language wins over the region's
+    assert found['www_asahi_com_rss_asahi_newsheadlines_rdf'].language == 'ja'
+    # A feed may not take over a scraper's id
+    assert found['rfi'].script == 'scrapers/rfi_scraper.py'
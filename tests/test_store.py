@@ -0,0 +1,95 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from utils import fts, progressive, store
+from utils.article import Article, save_articles
+from utils.article_cache import fallback_content
+from utils.site_rules import get_rules
+
+BODY = '<p>' + ' '.join(f'Full text of the article, sentence {i}.' for i in range(40)) + '</p>'
+
+
+@pytest.fixture
+def article_store(tmp_path, monkeypatch):
+    """A fresh article store in tmp_path."""
+    store.close()
+    monkeypatch.setattr(store, 'STORE_FILE', str(tmp_path / 'articles.db'))
+    monkeypatch.setattr(store, '_near_dup_index', None)
+    monkeypatch.setattr(store, '_extracted', {})
+    yield store
+    store.close()
+
+
+def _article(url, source_id='npr', language='en', title='Election results', content=''):
+    return Article(title, url, source_id.upper(), source_id, datetime(2024, 6, 1, tzinfo=timezone.utc),
+                   language, summary='A short summary.', content=content)
+
+
+def _save(articles, tmp_path):
+    save_articles(articles, str(tmp_path / 'out.json'), str(tmp_path / 'out.html'), 'Test', 'https://example.com/')
+
+
+def test_headlines_run_keeps_stored_body(article_store, tmp_path, monkeypatch):
+    url = 'https://example.com/news/1'
+    article = _article(url, content=BODY)
+    store.record_extraction(url, 'npr', 'page', BODY)
+    _save([article], tmp_path)
+
+    monkeypatch.setenv(progressive.HEADLINES_ENV, '1')
+    _save(progressive.fill_headlines([_article(url)], get_rules('npr')), tmp_path)
+
+    assert store.find_article(url)['content'] == BODY
+    assert store.extracted_body(url) == BODY
+    assert [item['url'] for item in store.search('sentence')] == [url]
+
+
+def test_summary_fallback_keeps_stored_body(article_store, tmp_path):
+    url = 'https://example.com/news/2'
+    store.record_extraction(url, 'npr', 'page', BODY)
+    _save([_article(url, content=BODY)], tmp_path)
+
+    # A later run that cannot fetch the page (nor find it in the cache) falls back to the summary
+    article = _article(url)
+    article.content = fallback_content(url, article.summary, get_rules('npr'))
+    _save([article], tmp_path)
+
+    assert store.find_article(url)['content'] == BODY
+
+
+def test_extracted_body_replaces_summary(article_store, tmp_path):
+    url = 'https://example.com/news/3'
+    _save([_article(url, content='<p>A short summary.</p>')], tmp_path)
+    assert store.extracted_body(url) == ''
+
+    store.record_extraction(url, 'npr', 'page', BODY)
+    _save([_article(url, content=BODY)], tmp_path)
+
+    assert store.extracted_body(url) == BODY
+
+
+def test_filtered_search_ranks_the_newest_matches_of_the_source(article_store, tmp_path, monkeypatch):
+    monkeypatch.setattr(fts, 'RANK_WINDOW', 3)
+    asahi = [_article(f'https://example.com/asahi/{i}', 'asahi', content=BODY) for i in range(2)]
+    npr = [_article(f'https://example.com/npr/{i}', content=BODY) for i in range(5)]
+    _save(asahi + npr, tmp_path)
+
+    assert {item['url'] for item in store.search('election', source_id='asahi')} == {a.url for a in asahi}
+    assert len(store.search('election', language='en')) == 3
+    assert store.search('election', source_id='asahi', language='ja') == []
+    # The filter tags are not words of the articles
+    assert store.search('npr') == store.search('source') == []
+
+
+def test_near_duplicate_index_drops_articles_older_than_the_window(article_store):
+    text = '<p>' + ' '.join(f'Wire story word{i}' for i in range(60)) + '</p>'
+    start = 1_700_000_000
+    store.add_articles([_article('https://example.com/wire/1', content=text)], seen=start)
+    store.add_articles([_article('https://example.com/wire/2', content=text)], seen=start + 3600)
+    assert store.near_duplicates('https://example.com/wire/1') == ['https://example.com/wire/2']
+
+    later = start + (store.NEAR_DUP_HOURS + 2) * 3600
+    store.add_articles([_article('https://example.com/wire/3', content=text)], seen=later)
+    assert store.near_duplicates('https://example.com/wire/1') == ['https://example.com/wire/2']
+    assert store.near_duplicates('https://example.com/wire/2') == []
+    assert list(store._recent_index().signatures) == ['https://example.com/wire/3']
@@ -0,0 +1,29 @@
+from utils.story_clusters import TOP_TERMS, StoryClusters
+
+
+def _body(prefix, words):
+    return ' '.join(f'{prefix}{i}' for i in range(words))
+
+
+def test_expired_articles_leave_no_document_frequencies():
+    clusters = StoryClusters(window_hours=1)
+    clusters.assign([('old', 'Storm hits coast', _body('old', 200))], now=1000)
+    assert clusters.df.sum() > TOP_TERMS
+
+    clusters.assign([('new', 'Senate vote', 'budget tariff')], now=1000 + 2 * 3600)
+
+    assert len(clusters) == 1
+    assert 'old' not in clusters.labels
+    assert clusters.df.sum() == 4
+
+
+def test_same_story_shares_a_label():
+    clusters = StoryClusters()
+    labels = clusters.assign([
+        ('a', 'Earthquake strikes Hokkaido', 'A magnitude 6 earthquake struck Hokkaido on Monday, Sapporo officials said.'),
+        ('b', 'Hokkaido earthquake', 'Officials in Sapporo said the magnitude 6 earthquake in Hokkaido caused damage.'),
+        ('c', 'Senate passes budget', 'The Senate passed the budget bill late on Friday after a long debate.'),
+    ], now=1000)
+    assert labels[0] == labels[1] != labels[2]
+    # Labels are kept on the next call
+    assert clusters.assign([('c', '', ''), ('a', '', '')], now=1001) == [labels[2], labels[0]]
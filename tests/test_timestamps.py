@@ -0,0 +1,61 @@
+import time
+from datetime import datetime, timezone
+
+import dateutil.parser
+import feedparser
+import pytest
+
+from utils.timestamps import day_window, entry_timestamp, get_zone, parse_timestamp
+
+TOKYO = get_zone('Asia/Tokyo')
+
+
+@pytest.mark.parametrize('value', [
+    'Sun, 19 Oct 2026 09:00:00 +0900',
+    'Mon, 19 Oct 2026 09:00:00 GMT',
+    '19 Oct 2026 09:00 -0400',
+    'Monday, 19 October 2026 09:00:00 EDT',
+    'Mon, 19 Oct 26 09:00:00 PST',
+    '2026-10-19T09:00:00+09:00',
+    '2026-10-19T09:00:00Z',
+    '2026-10-19T09:00:00.123456+00:00',
+    '2026-10-19 09:00:00-05:00',
+])
+def test_fast_paths_agree_with_dateutil(value):
+    tzinfos = {'EDT': -4 * 3600, 'PST': -8 * 3600}
+    assert parse_timestamp(value) == dateutil.parser.parse(value, tzinfos=tzinfos)
+
+
+def test_dates_without_zone_are_read_in_tz():
+    assert parse_timestamp('2026-10-19T09:00:00') == datetime(2026, 10, 19, 9, tzinfo=timezone.utc)
+    assert parse_timestamp('2026-10-19T09:00:00', TOKYO) == TOKYO.localize(datetime(2026, 10, 19, 9))
+    assert parse_timestamp('Mon, 19 Oct 2026 09:00:00', TOKYO) == TOKYO.localize(datetime(2026, 10, 19, 9))
+
+
+def test_unparseable_values():
+    assert parse_timestamp('') is None
+    assert parse_timestamp(None) is None
+    assert parse_timestamp('yesterday-ish') is None
+    assert parse_timestamp('Mon, 45 Oct 2026 09:00:00 GMT') is None
+
+
+def test_entry_timestamp_uses_feedparser_struct_for_zoned_dates():
+    entry = feedparser.FeedParserDict(published='Mon, 19 Oct 2026 09:00:00 +0900',
+                                      published_parsed=time.strptime('2026-10-19 00:00:00', '%Y-%m-%d %H:%M:%S'))
+    assert entry_timestamp(entry) == datetime(2026, 10, 19, 0, tzinfo=timezone.utc)
+    assert entry_timestamp(entry, TOKYO) == TOKYO.localize(datetime(2026, 10, 19, 9))
+
+
+def test_entry_timestamp_relocalises_naive_dates():
+    # feedparser reads a date without a zone as UTC
+    entry = feedparser.FeedParserDict(updated='2026-10-19T09:00:00',
+                                      updated_parsed=time.strptime('2026-10-19 09:00:00', '%Y-%m-%d %H:%M:%S'))
+    assert entry_timestamp(entry, TOKYO) == TOKYO.localize(datetime(2026, 10, 19, 9))
+    assert entry_timestamp(entry, fields=('published',)) is None
+
+
+def test_day_window_starts_at_local_midnight():
+    since, now = day_window(TOKYO)
+    assert (since.hour, since.minute, since.second) == (0, 0, 0)
+    assert since.utcoffset() == now.utcoffset()
+    assert 24 * 3600 <= (now - since).total_seconds() < 48 * 3600
@@ -0,0 +1,121 @@
+"""The article record used from feed parse to render.
+
+Every scraper builds ``Article`` objects from its feed entries, fills in
+``content`` and writes them with ``save_articles``; utils/progressive.py,
+utils/feeds.py and the generic driver work on the same type. Timestamps are
+normalised to aware UTC datetimes when the record is created (naive values are
+taken as UTC, so scrapers localise them first) and only turned into ISO
+strings when written out.
+
+The class uses ``__slots__``: no per-instance ``__dict__``, which keeps large
+archives of articles small.
+"""
+
+import json
+import os
+from datetime import datetime, timezone
+
+from utils import store
+from utils.convert_to_html import convert_json_to_html
+from utils.progressive import headlines_only
+
+
+def to_utc(value):
+    """Aware UTC datetime from a datetime (naive = UTC) or an ISO 8601 string; None if missing or invalid."""
+    if not value:
+        return None
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+class Article:
+    """One article: feed metadata plus the body once fetched."""
+
+    __slots__ = ('title', 'url', 'source', 'source_id', 'published', 'language',
+                 'summary', 'content', 'image_url', 'author', 'guid')
+
+    def __init__(self, title, url, source, source_id, published=None, language=None,
+                 summary='', content='', image_url='', author='', guid=''):
+        self.title = title or ''
+        self.url = url or ''
+        self.source = source or ''
+        self.source_id = source_id
+        self.published = to_utc(published)
+        self.language = language
+        self.summary = summary or ''
+        self.content = content or ''
+        self.image_url = image_url or ''
+        self.author = author or ''
+        # Feed entry id (RSS guid, Atom id), if the feed has one
+        self.guid = guid or ''
+
+    def __repr__(self):
+        return f"Article({self.source_id!r}, {self.url!r})"
+
+    def to_item(self):
+        """JSON item for output/*.json and utils/convert_to_html.py."""
+        item = {
+            'title': self.title,
+            'url': self.url,
+            'source': self.source,
+            'source_id': self.source_id,
+            'published': self.published.isoformat() if self.published else '',
+            'language': self.language,
+            'summary': self.summary,
+            'content': self.content,
+        }
+        if self.image_url:
+            item['image_url'] = self.image_url
+        if self.author:
+            item['author'] = self.author
+        if self.guid:
+            item['guid'] = self.guid
+        return item
+
+    @classmethod
+    def from_item(cls, item, source_id=None):
+        """Article from a JSON item written by to_item()."""
+        return cls(
+            item.get('title'), item.get('url'), item.get('source'), item.get('source_id') or source_id,
+            item.get('published'), item.get('language'), item.get('summary'), item.get('content'),
+            item.get('image_url'), item.get('author'), item.get('guid'),
+        )
+
+
+def save_articles(articles, json_file, html_file, title, link='', description='', language=None, convert=None):
+    """
+    Write articles as a JSON feed and convert it to the HTML page with
+    convert(json_file, html_file) (default utils.convert_to_html's; some
+    scrapers adjust the bodies in a wrapper first), then add them to the
+    article store.
+
+    Returns:
+        dict: The feed written ({title, link, description, language, items})
+    """
+    feed = {
+        'title': title,
+        'link': link,
+        'description': description,
+        'items': [article.to_item() for article in articles],
+    }
+    if language:
+        feed['language'] = language
+    os.makedirs(os.path.dirname(json_file) or '.', exist_ok=True)
+    with open(json_file, 'w', encoding='utf-8') as f:
+        json.dump(feed, f, ensure_ascii=False, indent=2)
+    print(f"\nJSON file saved to: {os.path.abspath(json_file)}")
+    (convert or convert_json_to_html)(json_file, html_file)
+    print(f"HTML file saved to: {os.path.abspath(html_file)}")
+    # Keep them in the article store as well (utils/store.py); a headlines
+    # card is not a body, so headlines-only runs leave the stored ones alone
+    store.add_articles(articles, with_content=not headlines_only())
+    store.flush()
+    return feed
@@ -0,0 +1,113 @@
+"""Last good body of recent articles, per source.
+
+Scrapers ``remember`` every body they fetch and extract successfully. When an
+article cannot be fetched in time (region deadline, circuit open, host down),
+``fallback_content`` returns the body cached by an earlier run, or else the
+RSS summary. The cache is ``state/articles_<source>.json``; entries older
+than ``MAX_AGE`` are dropped and at most ``MAX_ENTRIES`` are kept.
+
+Entries processed by an earlier run (utils/seen.py) are not fetched again:
+``seen_content`` returns their cached body, or the one kept in the article
+store once it has left the cache.
+"""
+
+import atexit
+import threading
+import time
+
+from utils import metrics, seen, store
+from utils.site_rules import summary_content
+from utils.state import load_state, write_state
+
+MAX_AGE = 3 * 24 * 3600
+MAX_ENTRIES = 200
+
+_lock = threading.Lock()
+_caches = {}
+_dirty = set()
+_registered = False
+
+
+def _name(source_id):
+    return f'articles_{source_id}'
+
+
+def _cache(source_id):
+    cache = _caches.get(source_id)
+    if cache is None:
+        cache = _caches[source_id] = load_state(_name(source_id))
+    return cache
+
+
+def cached_content(source_id, url):
+    """Body saved for url by this or an earlier run ('' if none)."""
+    with _lock:
+        entry = _cache(source_id).get(url)
+    if not entry or time.time() - entry.get('saved', 0) > MAX_AGE:
+        return ''
+    return entry.get('content') or ''
+
+
+def remember(source_id, url, content, guid=None):
+    """Record a successfully extracted body (saved when the process exits)."""
+    global _registered
+    if not url or not content:
+        return
+    store.record_extraction(url, source_id, 'page', content)
+    seen.mark_seen(source_id, url, guid)
+    with _lock:
+        _cache(source_id)[url] = {'content': content, 'saved': time.time()}
+        _dirty.add(source_id)
+        if not _registered:
+            atexit.register(save_cache)
+            _registered = True
+
+
+def seen_content(source_id, url, guid=None):
+    """
+    Body extracted for an entry by an earlier run, from the cache or the
+    article store; '' for an entry not seen before, which is then fetched.
+    Only entries the seen filter reports are looked up.
+    """
+    if not seen.is_seen(source_id, url, guid):
+        return ''
+    content = cached_content(source_id, url)
+    if content:
+        method = 'cache'
+    else:
+        content = store.extracted_body(url)
+        method = 'store'
+    if not content:
+        metrics.incr(source_id, 'seen.no_body')
+        return ''
+    metrics.incr(source_id, f'seen.reused_{method}')
+    store.record_extraction(url, source_id, 'cache', content)
+    return content
+
+
+def fallback_content(url, summary, rules):
+    """
+    Body for an article whose page could not be fetched: the cached body if
+    there is one (counted as fallback.cached), else the RSS summary.
+    """
+    content = cached_content(rules.source_id, url)
+    if content:
+        metrics.incr(rules.source_id, 'fallback.cached')
+        store.record_extraction(url, rules.source_id, 'cache', content)
+        return content
+    content = summary_content(summary, rules)
+    store.record_extraction(url, rules.source_id, 'summary', content)
+    return content
+
+
+def save_cache():
+    """Write the caches changed in this process, pruned by age and size."""
+    with _lock:
+        dirty = list(_dirty)
+        _dirty.clear()
+        snapshots = {source_id: dict(_caches[source_id]) for source_id in dirty}
+    now = time.time()
+    for source_id, cache in snapshots.items():
+        fresh = [(url, e) for url, e in cache.items() if now - e.get('saved', 0) <= MAX_AGE]
+        fresh.sort(key=lambda item: item[1].get('saved', 0), reverse=True)
+        write_state(_name(source_id), dict(fresh[:MAX_ENTRIES]))
@@ -0,0 +1,55 @@
+"""Chromium for the Playwright scrapers.
+
+``chromium()`` launches a browser for one refresh and closes it afterwards.
+In daemon mode (utils/warm.py) the browser is launched once per event loop
+and kept running; each refresh only opens new incognito contexts in it.
+"""
+
+from contextlib import asynccontextmanager
+
+from playwright.async_api import async_playwright
+
+from utils import warm
+
+
+async def _launch(launch_kwargs):
+    playwright = await async_playwright().start()
+    try:
+        return playwright, await playwright.chromium.launch(**launch_kwargs)
+    except Exception:
+        await playwright.stop()
+        raise
+
+
+async def _close(kept):
+    playwright, browser = kept
+    try:
+        await browser.close()
+    finally:
+        await playwright.stop()
+
+
+@asynccontextmanager
+async def chromium(**launch_kwargs):
+    """Yield a Chromium browser launched with launch_kwargs."""
+    if not warm.enabled():
+        async with async_playwright() as playwright:
+            browser = await playwright.chromium.launch(**launch_kwargs)
+            try:
+                yield browser
+            finally:
+                await browser.close()
+        return
+
+    name = f'chromium:{sorted(launch_kwargs.items())!r}'
+    kept = await warm.get_async(name, lambda: _launch(launch_kwargs), _close)
+    if not kept[1].is_connected():
+        # Crashed or killed since the last refresh: start a new one
+        print("Chromium is gone, relaunching")
+        warm.discard(name)
+        try:
+            await _close(kept)
+        except Exception:
+            pass
+        kept = await warm.get_async(name, lambda: _launch(launch_kwargs), _close)
+    yield kept[1]
@@ -0,0 +1,126 @@
+"""Charset detection and decoding for fetched pages.
+
+The charset is chosen from, in order: a byte order mark, the Content-Type
+header, then an XML declaration or ``<meta charset>`` / ``<meta http-equiv>``
+within the first few KB of the body. The whole body is never scanned by a
+statistical detector. Decoding is strict; bytes that do not fit the chosen
+charset are replaced and counted in metrics.
+"""
+
+import codecs
+import re
+
+from lxml import html as lxml_html
+
+from utils import metrics
+
+# How far into the body we look for <meta charset>
+SNIFF_BYTES = 4096
+
+_BOMS = [
+    (codecs.BOM_UTF8, 'utf-8'),
+    (codecs.BOM_UTF16_LE, 'utf-16-le'),
+    (codecs.BOM_UTF16_BE, 'utf-16-be'),
+]
+
+_META_CHARSET = re.compile(
+    rb'<meta[^>]+charset\s*=\s*["\']?\s*([a-zA-Z0-9_\-:.]+)', re.I
+)
+_XML_ENCODING = re.compile(rb'^\s*<\?xml[^>]+encoding\s*=\s*["\']([a-zA-Z0-9_\-.]+)', re.I)
+
+# Labels browsers treat as supersets (WHATWG encoding standard)
+_ALIASES = {
+    'shift_jis': 'cp932',
+    'shift-jis': 'cp932',
+    'sjis': 'cp932',
+    'x-sjis': 'cp932',
+    'windows-31j': 'cp932',
+    'iso-8859-1': 'cp1252',
+    'latin1': 'cp1252',
+    'latin-1': 'cp1252',
+    'us-ascii': 'cp1252',
+    'ascii': 'cp1252',
+    'euc_jp': 'euc-jp',
+    'x-euc-jp': 'euc-jp',
+}
+
+
+def normalize_charset(name):
+    """Canonical Python codec name for a charset label, or None if unknown."""
+    if not name:
+        return None
+    if isinstance(name, bytes):
+        name = name.decode('ascii', errors='ignore')
+    label = name.strip().strip('"\'').lower()
+    label = _ALIASES.get(label, label)
+    try:
+        return codecs.lookup(label).name
+    except LookupError:
+        return None
+
+
+def header_charset(content_type):
+    """Charset parameter of a Content-Type header, if any."""
+    for param in (content_type or '').split(';')[1:]:
+        key, _, value = param.partition('=')
+        if key.strip().lower() == 'charset' and value.strip():
+            return normalize_charset(value)
+    return None
+
+
+def sniff_charset(body):
+    """Charset from a BOM, XML declaration or <meta> in the first SNIFF_BYTES."""
+    for bom, name in _BOMS:
+        if body.startswith(bom):
+            return name
+    head = body[:SNIFF_BYTES]
+    m = _XML_ENCODING.match(head) or _META_CHARSET.search(head)
+    if m:
+        return normalize_charset(m.group(1))
+    return None
+
+
+def detect_charset(body, content_type=None, default='utf-8'):
+    """
+    Pick the charset of a fetched body without full-body detection.
+
+    A BOM wins over the header (as in browsers), the header over <meta>.
+    """
+    for bom, name in _BOMS:
+        if body.startswith(bom):
+            return name
+    return header_charset(content_type) or sniff_charset(body) or normalize_charset(default) or 'utf-8'
+
+
+def decode_html(body, content_type=None, default='utf-8', scope=None):
+    """
+    Decode a body with the detected charset.
+
+    Args:
+        body (bytes): Raw (already content-decoded) body
+        content_type (str): Content-Type header value
+        default (str): Charset used when nothing is declared
+        scope (str): Metrics scope (source id) for counting lossy decodes
+
+    Returns:
+        str: Decoded text (BOM removed)
+    """
+    return decode_with(body, detect_charset(body, content_type, default), scope)
+
+
+def decode_with(body, charset, scope=None):
+    """Strictly decode with a known charset, replacing (and counting) invalid bytes."""
+    try:
+        text = body.decode(charset)
+    except UnicodeDecodeError:
+        if scope:
+            metrics.incr(scope, 'decode.replaced')
+        text = body.decode(charset, errors='replace')
+    except LookupError:
+        text = body.decode('utf-8', errors='replace')
+    return text[1:] if text.startswith('\ufeff') else text
+
+
+def html_parser_for(charset):
+    """lxml HTML parser that decodes bytes with an explicit charset."""
+    return lxml_html.HTMLParser(encoding=charset)
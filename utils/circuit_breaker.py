@@ -0,0 +1,107 @@
+"""Per-host circuit breaker.
+
+After ``FAILURE_THRESHOLD`` consecutive failures (transport errors, timeouts,
+429/403/5xx) a host's circuit opens: requests to it raise ``CircuitOpen``
+immediately instead of waiting for their timeout, and the scrapers fall back
+to the RSS summary. Once the open period is over the circuit is half-open and
+lets exactly one probe request through; success closes it, failure opens it
+again for twice as long (up to ``MAX_OPEN_SECONDS``).
+
+Breakers belong to the host limiters (utils/host_limiter.py) and are saved
+with them in ``state/hosts.json``, so a host that was down at the end of one
+run is probed once at the start of the next instead of being hammered.
+"""
+
+import threading
+import time
+
+from utils import metrics
+
+FAILURE_THRESHOLD = 5
+OPEN_SECONDS = 60.0
+MAX_OPEN_SECONDS = 30 * 60.0
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class HostUnavailable(Exception):
+    """Base for fail-fast errors: the host should not be contacted right now."""
+
+
+class CircuitOpen(HostUnavailable):
+    def __init__(self, host, wait):
+        super().__init__(f"circuit open for {host} ({max(wait, 0):.0f}s left)")
+        self.host = host
+        self.wait = wait
+
+
+class CircuitBreaker:
+    """Closed / open / half-open state machine for one host."""
+
+    def __init__(self, host, saved=None):
+        saved = saved or {}
+        self.host = host
+        self.failures = int(saved.get('failures', 0))
+        self.trips = int(saved.get('trips', 0))
+        self.open_until = float(saved.get('open_until', 0))
+        self.probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if not self.open_until:
+            return CLOSED
+        return OPEN if time.time() < self.open_until else HALF_OPEN
+
+    def before_request(self):
+        """
+        Raise CircuitOpen if the request must not be sent.
+
+        Returns:
+            bool: True if this request is the half-open probe
+        """
+        with self._lock:
+            state = self.state
+            if state == CLOSED:
+                return False
+            if state == HALF_OPEN and not self.probing:
+                self.probing = True
+                metrics.incr(self.host, 'breaker.probes')
+                return True
+            metrics.incr(self.host, 'breaker.rejected')
+            raise CircuitOpen(self.host, self.open_until - time.time())
+
+    def record(self, ok, probe=False):
+        """Record the outcome of a request (probe: it was the half-open probe)."""
+        with self._lock:
+            if probe:
+                self.probing = False
+            if ok:
+                if self.open_until:
+                    print(f"Circuit closed for {self.host}")
+                    metrics.incr(self.host, 'breaker.closed')
+                self.failures = 0
+                self.trips = 0
+                self.open_until = 0
+                return
+            self.failures += 1
+            if probe or (self.state == CLOSED and self.failures >= FAILURE_THRESHOLD):
+                self._trip()
+
+    def cancel_probe(self):
+        """The probe never completed (e.g. cancelled); let the next request probe."""
+        with self._lock:
+            self.probing = False
+
+    def _trip(self):
+        self.trips += 1
+        duration = min(MAX_OPEN_SECONDS, OPEN_SECONDS * 2 ** (self.trips - 1))
+        self.open_until = time.time() + duration
+        self.failures = 0
+        metrics.incr(self.host, 'breaker.opened')
+        print(f"Circuit open for {self.host} for {duration:.0f}s")
+
+    def to_state(self):
+        return {'failures': self.failures, 'trips': self.trips, 'open_until': self.open_until}
@@ -86,9 +86,11 @@ def convert_json_to_html(json_file, output_file):
 </html>
 """
 
-    # Write the HTML file
-    with open(output_file, 'w', encoding='utf-8') as f:
+    # Write the HTML file (replaced atomically: main.py may be reading it)
+    tmp_file = f'{output_file}.{os.getpid()}.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
         f.write(html_content)
+    os.replace(tmp_file, output_file)
 
     print(f"HTML file created from JSON: {output_file}")
     return output_file
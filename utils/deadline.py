@@ -0,0 +1,84 @@
+"""Region deadline shared by main.py and the scrapers.
+
+main.py gives each region a time budget and passes the absolute deadline to
+the scraper processes in ``QUICKNEWS_DEADLINE`` (epoch seconds). Scrapers stop
+starting page fetches ``SAVE_MARGIN`` seconds before it, cancel what is still
+outstanding and save whatever is ready; unfinished articles fall back to the
+cached body or the RSS summary (utils/article_cache.py). Without the variable
+there is no deadline. daemon.py runs several sources in one process and sets
+each refresh's deadline with ``set_deadline`` instead.
+"""
+
+import asyncio
+import contextvars
+import os
+import time
+
+from utils import metrics
+
+DEADLINE_ENV = 'QUICKNEWS_DEADLINE'
+
+# Time kept free before the deadline to clean, save and convert the results
+SAVE_MARGIN = 5.0
+
+_deadline = contextvars.ContextVar('quicknews_deadline', default=None)
+
+
+def set_deadline(deadline):
+    """Deadline for the current task and the tasks it starts (overrides the environment)."""
+    _deadline.set(deadline)
+
+
+def get_deadline():
+    """Absolute deadline (epoch seconds) or None."""
+    deadline = _deadline.get()
+    if deadline is not None:
+        return deadline
+    value = os.environ.get(DEADLINE_ENV)
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def time_left():
+    """Seconds left for fetching (deadline minus SAVE_MARGIN), or None without a deadline."""
+    deadline = get_deadline()
+    if deadline is None:
+        return None
+    return deadline - SAVE_MARGIN - time.time()
+
+
+def deadline_passed():
+    left = time_left()
+    return left is not None and left <= 0
+
+
+async def gather_until_deadline(coros, source_id=None):
+    """
+    Like ``asyncio.gather(*coros, return_exceptions=True)``, but tasks still
+    running when the fetch time is up are cancelled and yield None.
+    """
+    tasks = [asyncio.ensure_future(c) for c in coros]
+    if not tasks:
+        return []
+    left = time_left()
+    if left is None:
+        await asyncio.wait(tasks)
+        pending = set()
+    else:
+        _, pending = await asyncio.wait(tasks, timeout=max(left, 0))
+    if pending:
+        print(f"Deadline reached: cancelling {len(pending)} unfinished fetches")
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        if source_id:
+            metrics.incr(source_id, 'deadline.cancelled', len(pending))
+    results = []
+    for task in tasks:
+        if task in pending or task.cancelled():
+            results.append(None)
+        else:
+            results.append(task.exception() or task.result())
+    return results
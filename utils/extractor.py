@@ -0,0 +1,220 @@
+"""Main-content extraction for article pages.
+
+Two backends are available:
+
+- ``readability``: readability-lxml's ``Document(html).summary()`` (default).
+- ``native``: a lightweight extractor built directly on lxml. It computes one
+  row of features per text block (text length, link text length, punctuation
+  count, CJK character count) in a single pass over the tree, scores all
+  blocks at once from those NumPy feature columns, sums the scores per
+  container with ``np.bincount`` and returns the best scoring container.
+
+The backend is chosen per source with environment variables, e.g.
+``QUICKNEWS_EXTRACTOR_NHK=native``, or globally with ``QUICKNEWS_EXTRACTOR``.
+"""
+
+import hashlib
+import os
+import re
+
+import numpy as np
+from lxml import etree
+from lxml import html as lxml_html
+from readability import Document
+
+from utils.charset import decode_with, detect_charset, html_parser_for
+from utils.pretrim import pretrim_html
+from utils.site_rules import get_rules
+
+EXTRACTORS = ('readability', 'native')
+DEFAULT_EXTRACTOR = 'readability'
+
+# Tags that never carry article text
+_JUNK_TAGS = [
+    'script', 'style', 'noscript', 'svg', 'iframe', 'form', 'nav', 'footer',
+    'header', 'aside', 'button', 'input', 'select', 'textarea', 'template',
+]
+
+# Elements whose text is scored as a paragraph
+_BLOCK_TAGS = {'p', 'pre', 'blockquote', 'li', 'td', 'h2', 'h3'}
+
+# Class/id hints, same spirit as Readability's regexes but compiled once
+_NEGATIVE_HINTS = re.compile(
+    r'comment|footer|share|sns|social|related|recommend|ranking|promo|sidebar|'
+    r'banner|advert|\bad\b|c-ad|sponsor|newsletter|subscribe|paywall|breadcrumb|utility',
+    re.I,
+)
+_POSITIVE_HINTS = re.compile(r'article|body|content|entry|main|story|text|honbun|news_textbody', re.I)
+
+# ASCII/Latin punctuation plus Japanese and French typographic marks
+_PUNCT = re.compile(r'[,.;:!?、。，．！？「」«»]')
+_CJK = re.compile(r'[぀-ヿ㐀-䶿一-鿿ｦ-ﾟ]')
+
+
+def get_extractor(source_id):
+    """Return the extractor configured for a source (env override, then global, then default)."""
+    name = (
+        os.environ.get(f'QUICKNEWS_EXTRACTOR_{source_id.upper()}')
+        or os.environ.get('QUICKNEWS_EXTRACTOR')
+        or DEFAULT_EXTRACTOR
+    ).strip().lower()
+    if name not in EXTRACTORS:
+        print(f"Warning: unknown extractor '{name}' for {source_id}, using {DEFAULT_EXTRACTOR}")
+        return DEFAULT_EXTRACTOR
+    return name
+
+
+def extract_main_content(html, extractor=DEFAULT_EXTRACTOR, language=None, source_id=None, charset=None):
+    """
+    Extract the main article HTML from a full page.
+
+    Args:
+        html (str | bytes): Raw page HTML
+        extractor (str): 'readability' or 'native'
+        language (str): Article language, e.g. 'ja' (tunes CJK scoring)
+        source_id (str): Source id, enables pre-trimming with the source's
+            rules and recording pages for benchmarks
+        charset (str): Charset of html when it is bytes (sniffed if omitted)
+
+    Returns:
+        str: HTML fragment containing the main content
+    """
+    if not html:
+        return ''
+    if source_id:
+        record_page(source_id, html)
+        # Drop script/style/svg payloads and slice to the content container first
+        html = pretrim_html(html, get_rules(source_id))
+    if isinstance(html, bytes):
+        charset = charset or detect_charset(html)
+        if extractor == 'native':
+            # lxml decodes the bytes itself with the known charset
+            return native_summary(html, language, charset)
+        # Readability would run chardet over undeclared bytes; decode here instead
+        html = decode_with(html, charset, source_id)
+    if extractor == 'native':
+        return native_summary(html, language)
+    return Document(html).summary()
+
+
+def record_page(source_id, html):
+    """Save the raw page under QUICKNEWS_RECORD_DIR/<source_id>/ when recording is enabled."""
+    record_dir = os.environ.get('QUICKNEWS_RECORD_DIR')
+    if not record_dir:
+        return
+    try:
+        data = html.encode('utf-8') if isinstance(html, str) else html
+        target_dir = os.path.join(record_dir, source_id)
+        os.makedirs(target_dir, exist_ok=True)
+        name = hashlib.sha1(data).hexdigest()[:16] + '.html'
+        with open(os.path.join(target_dir, name), 'wb') as f:
+            f.write(data)
+    except Exception as e:
+        print(f"Warning: could not record page for {source_id}: {e}")
+
+
+def _parse(html, charset=None):
+    if isinstance(html, str):
+        # lxml refuses unicode input that still carries an XML encoding declaration
+        html = re.sub(r'^\s*<\?xml[^>]*\?>', '', html)
+        return lxml_html.document_fromstring(html)
+    return lxml_html.document_fromstring(html, parser=html_parser_for(charset or detect_charset(html)))
+
+
+def _class_weight(el):
+    hints = f"{el.get('class', '')} {el.get('id', '')}"
+    if not hints.strip():
+        return 0
+    weight = 0
+    if _NEGATIVE_HINTS.search(hints):
+        weight -= 25
+    if _POSITIVE_HINTS.search(hints):
+        weight += 25
+    return weight
+
+
+def native_summary(html, language=None, charset=None):
+    """
+    Score text blocks and return the best candidate container as an HTML fragment.
+
+    Every block element contributes a score computed from its feature row to
+    its parent (full score) and grandparent (half score). The top parent is
+    then expanded with sibling blocks that scored well, like Readability does.
+    """
+    try:
+        doc = _parse(html, charset)
+    except (etree.ParserError, ValueError):
+        return ''
+
+    etree.strip_elements(doc, *_JUNK_TAGS, with_tail=False)
+    etree.strip_elements(doc, etree.Comment, with_tail=False)
+
+    # Feature columns, one row per block element
+    blocks, rows = [], []
+    for el in doc.iter(*_BLOCK_TAGS):
+        text = el.text_content().strip()
+        if len(text) < 20:
+            continue
+        blocks.append(el)
+        rows.append((len(text), sum(len(a.text_content()) for a in el.iter('a')),
+                     len(_PUNCT.findall(text)), len(_CJK.findall(text))))
+
+    if not blocks:
+        return ''
+
+    lengths, link_lengths, puncts, cjk_chars = np.array(rows, dtype=np.float64).T
+    # CJK text packs more content per character, so its length counts more
+    if (language or '').startswith(('ja', 'zh', 'ko')):
+        lengths_weighted = lengths * (1 + cjk_chars / lengths)
+    else:
+        lengths_weighted = lengths
+    scores = (1 + puncts + np.minimum(lengths_weighted / 100, 3)) * (1 - np.minimum(link_lengths / lengths, 1))
+
+    # Each block scores for its parent (full) and grandparent (half)
+    index = {}
+    targets, weights = [], []
+    for i, el in enumerate(blocks):
+        parent = el.getparent()
+        if parent is None:
+            continue
+        targets.append(index.setdefault(parent, len(index)))
+        weights.append(scores[i])
+        grand = parent.getparent()
+        if grand is not None:
+            targets.append(index.setdefault(grand, len(index)))
+            weights.append(scores[i] / 2)
+
+    if not index:
+        return ''
+
+    totals = np.bincount(targets, weights=weights, minlength=len(index))
+    candidates = dict(zip(index, totals.tolist()))
+
+    def _final(el):
+        text_len = len(el.text_content()) or 1
+        link_len = sum(len(a.text_content()) for a in el.iter('a'))
+        return (candidates[el] + _class_weight(el)) * (1 - link_len / text_len)
+
+    top = max(candidates, key=_final)
+    top_score = _final(top)
+
+    # Pull in siblings that look like they belong to the same article body
+    threshold = max(10, top_score * 0.2)
+    parts = []
+    parent = top.getparent()
+    siblings = list(parent) if parent is not None else [top]
+    for sib in siblings:
+        if sib is top:
+            parts.append(sib)
+        elif sib in candidates and _final(sib) >= threshold:
+            parts.append(sib)
+        elif sib.tag == 'p':
+            text = sib.text_content().strip()
+            link_len = sum(len(a.text_content()) for a in sib.iter('a'))
+            if len(text) > 80 and link_len / len(text) < 0.25:
+                parts.append(sib)
+
+    body = ''.join(
+        lxml_html.tostring(p, encoding='unicode', with_tail=False) for p in parts
+    )
+    return f'<div>{body}</div>'
@@ -0,0 +1,183 @@
+"""Streaming feed reader for RSS 2.0, Atom and RSS 1.0 (RDF).
+
+feedparser builds its rich objects for every entry of a feed, while the
+scrapers only keep the first ten entries (JP/FR) or the ones since yesterday
+(US). ``read_feed`` walks the document with ``lxml.etree.iterparse``, turns
+each finished item into a ``feedparser.FeedParserDict`` with the keys the
+scrapers use (same names and shapes as feedparser's) and stops as soon as it
+has ``limit`` entries or, when given ``since``, meets the first entry older
+than it. Only feeds known to list their newest entries first may be read with
+``since`` (utils/feeds.py passes it for sources whose rules set
+``feed_sorted``); dates without a zone are read in the caller's ``tz``.
+Finished elements are cleared, so the parsed tree never holds more than the
+current entry.
+
+Malformed documents (undefined entities, broken markup) raise
+``FeedReadError``; utils/feeds.py then hands the body to feedparser, which
+recovers from them.
+"""
+
+import io
+
+import feedparser
+from lxml import etree
+
+from utils.timestamps import parse_timestamp
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+RSS10 = '{http://purl.org/rss/1.0/}'
+RDF = '{http://www.w3.org/1999/02/22-rdf-syntax-ns#}'
+DC = '{http://purl.org/dc/elements/1.1/}'
+CONTENT = '{http://purl.org/rss/1.0/modules/content/}'
+MEDIA = '{http://search.yahoo.com/mrss/}'
+
+# Root element -> feedparser's version name
+_VERSIONS = {'rss': 'rss20', f'{RDF}RDF': 'rss10', f'{ATOM}feed': 'atom10'}
+_ENTRY_TAGS = {'item', f'{RSS10}item', f'{ATOM}entry'}
+_CHANNEL_TAGS = {'channel', f'{RSS10}channel', f'{ATOM}feed'}
+# Element -> entry key, as feedparser names them (pubDate is published,
+# dc:date is updated)
+_TEXT_KEYS = {
+    'title': 'title', f'{RSS10}title': 'title', f'{ATOM}title': 'title',
+    'link': 'link', f'{RSS10}link': 'link',
+    'guid': 'id', f'{ATOM}id': 'id',
+    'description': 'summary', f'{RSS10}description': 'summary', f'{ATOM}summary': 'summary',
+    'pubDate': 'published', f'{ATOM}published': 'published', f'{DC}date': 'updated',
+    f'{ATOM}updated': 'updated', 'author': 'author', f'{DC}creator': 'author',
+}
+
+
+class FeedReadError(Exception):
+    """The document is not a feed this reader can stream."""
+
+
+def _text(elem):
+    return (elem.text or '').strip()
+
+
+def _atom_text(elem):
+    # type="xhtml" content is markup, not text
+    if elem.get('type') == 'xhtml':
+        return ''.join(etree.tostring(child, encoding='unicode') for child in elem).strip()
+    return _text(elem)
+
+
+def _date_struct(value):
+    parsed = parse_timestamp(value)
+    return parsed.utctimetuple() if parsed else None
+
+
+def _entry(elem):
+    entry = feedparser.FeedParserDict()
+    links = []
+    tags = []
+    for child in elem.iter():
+        tag = child.tag
+        if not isinstance(tag, str) or child is elem:
+            continue
+        key = _TEXT_KEYS.get(tag)
+        if key is not None:
+            if key in entry:
+                continue
+            if tag.startswith(ATOM):
+                entry[key] = _atom_text(child)
+            else:
+                entry[key] = _text(child)
+        elif tag == f'{CONTENT}encoded' or tag == f'{ATOM}content':
+            value = _atom_text(child) if tag.startswith(ATOM) else _text(child)
+            entry.setdefault('content', []).append({'type': 'text/html', 'language': None, 'base': '', 'value': value})
+        elif tag == f'{ATOM}link':
+            link = {'href': child.get('href', ''), 'rel': child.get('rel', 'alternate'),
+                    'type': child.get('type', 'text/html')}
+            links.append(link)
+            if link['rel'] == 'alternate' and 'link' not in entry:
+                entry['link'] = link['href']
+        elif tag == 'enclosure':
+            links.append({'type': child.get('type', ''), 'length': child.get('length', ''),
+                          'href': child.get('url', ''), 'rel': 'enclosure'})
+        elif tag == 'category' or tag == f'{ATOM}category':
+            tags.append({'term': child.get('term') or _text(child),
+                         'scheme': child.get('scheme') or child.get('domain'), 'label': child.get('label')})
+        elif tag == f'{MEDIA}content':
+            entry.setdefault('media_content', []).append(dict(child.attrib))
+        elif tag == f'{MEDIA}thumbnail':
+            entry.setdefault('media_thumbnail', []).append(dict(child.attrib))
+        elif tag == f'{ATOM}name' and child.getparent().tag == f'{ATOM}author':
+            entry.setdefault('author', _text(child))
+    if 'link' not in entry:
+        # RSS 1.0 items name themselves in rdf:about; RSS 2.0 guids may be permalinks
+        entry['link'] = elem.get(f'{RDF}about') or (entry.get('id', '') if entry.get('id', '').startswith('http') else '')
+    if entry['link'] and not any(l['rel'] == 'alternate' for l in links):
+        links.insert(0, {'rel': 'alternate', 'type': 'text/html', 'href': entry['link']})
+    entry['links'] = links
+    if tags:
+        entry['tags'] = tags
+    if elem.get(f'{RDF}about'):
+        entry.setdefault('id', elem.get(f'{RDF}about'))
+    if 'summary' not in entry and entry.get('content'):
+        entry['summary'] = entry['content'][0]['value']
+    for key in ('published', 'updated'):
+        if entry.get(key):
+            entry[f'{key}_parsed'] = _date_struct(entry[key])
+    return entry
+
+
+def read_feed(body, limit=None, since=None, tz=None):
+    """
+    Stream a feed's entries.
+
+    Args:
+        body (bytes): Feed document
+        limit (int): Stop after this many entries
+        since (datetime): Stop at the first entry published before this
+            (entries without a date are kept); only for newest-first feeds
+        tz: Zone of dates without one when comparing with ``since`` (UTC if None)
+
+    Returns:
+        feedparser.FeedParserDict: ``feed`` (title, link), ``entries``,
+        ``version``, ``bozo`` = 0 and ``truncated`` (True if reading stopped
+        early)
+
+    Raises:
+        FeedReadError: Malformed or unknown document
+    """
+    result = feedparser.FeedParserDict(feed=feedparser.FeedParserDict(), entries=[], bozo=0, truncated=False)
+    events = etree.iterparse(io.BytesIO(body), events=('start', 'end'), resolve_entities=False,
+                             no_network=True, remove_comments=True, huge_tree=False)
+    depth = 0
+    try:
+        for event, elem in events:
+            if event == 'start':
+                if depth == 0:
+                    version = _VERSIONS.get(elem.tag)
+                    if version is None:
+                        raise FeedReadError(f'not a feed: <{elem.tag}>')
+                    result['version'] = version
+                depth += 1
+                continue
+            depth -= 1
+            tag = elem.tag
+            if tag in _ENTRY_TAGS:
+                entry = _entry(elem)
+                # Drop the finished entry and the siblings before it
+                elem.clear()
+                while elem.getprevious() is not None:
+                    del elem.getparent()[0]
+                if since is not None:
+                    published = parse_timestamp(entry.get('published') or entry.get('updated'), tz)
+                    if published is not None and published < since:
+                        result['truncated'] = True
+                        break
+                result['entries'].append(entry)
+                if limit is not None and len(result['entries']) >= limit:
+                    result['truncated'] = True
+                    break
+            elif not result['entries'] and elem.getparent() is not None and elem.getparent().tag in _CHANNEL_TAGS:
+                key = _TEXT_KEYS.get(tag)
+                if key in ('title', 'link'):
+                    result['feed'].setdefault(key, _text(elem))
+                elif tag == f'{ATOM}link' and elem.get('rel', 'alternate') == 'alternate':
+                    result['feed'].setdefault('link', elem.get('href', ''))
+    except etree.XMLSyntaxError as e:
+        raise FeedReadError(str(e)) from e
+    return result
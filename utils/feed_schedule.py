@@ -0,0 +1,142 @@
+"""Adaptive per-feed poll intervals for the daemon.
+
+Each feed gets a ``FeedSchedule`` that learns how fast new items (GUIDs)
+appear in it and polls accordingly:
+
+- the arrival rate is an exponentially weighted average of ``new items /
+  seconds since the previous poll``; the next interval is the time in which
+  one new item is expected, clamped to the source's ``poll_min_interval`` /
+  ``poll_max_interval`` (config/rules, defaults 2 min and 1 hour);
+- a poll that finds nothing new (304 Not Modified or only known GUIDs)
+  stretches the current interval by ``UNCHANGED_BACKOFF`` up to the maximum;
+- every interval is jittered by ``JITTER`` so feeds do not synchronise.
+
+Polls are conditional GETs (ETag / Last-Modified, see utils.feeds.poll_feed).
+Schedules are saved in ``state/feeds.json``.
+"""
+
+import random
+import threading
+import time
+
+from utils.state import load_state, update_state
+
+STATE_NAME = 'feeds'
+
+# Weight of the newest observation in the arrival rate
+RATE_ALPHA = 0.3
+UNCHANGED_BACKOFF = 1.5
+JITTER = 0.1
+# Known GUIDs remembered per feed (newest first)
+MAX_GUIDS = 500
+
+
+class FeedSchedule:
+    """Poll timing and conditional-GET validators of one feed."""
+
+    def __init__(self, url, rules, saved=None):
+        saved = saved or {}
+        self.url = url
+        self.min_interval = rules.poll_min_interval
+        self.max_interval = max(rules.poll_max_interval, self.min_interval)
+        self.etag = saved.get('etag')
+        self.last_modified = saved.get('last_modified')
+        self.guids = list(saved.get('guids', []))
+        self.rate = saved.get('rate')
+        self.interval = float(saved.get('interval', self.min_interval))
+        self.last_poll = float(saved.get('last_poll', 0))
+        self.unchanged = int(saved.get('unchanged', 0))
+        self._known = set(self.guids)
+        self._lock = threading.Lock()
+
+    def conditional_headers(self):
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def _clamp(self, seconds):
+        return min(self.max_interval, max(self.min_interval, seconds))
+
+    def _rate_interval(self):
+        return self._clamp(1.0 / self.rate) if self.rate else self.interval
+
+    def record(self, guids=None, headers=None, now=None):
+        """
+        Record a successful poll.
+
+        Args:
+            guids (list): GUIDs in the feed, or None for 304 Not Modified
+            headers (dict): Response headers (lower-case names) with new validators
+
+        Returns:
+            int: Number of GUIDs not seen before (0 on the very first poll)
+        """
+        now = now or time.time()
+        with self._lock:
+            if headers:
+                self.etag = headers.get('etag') or self.etag
+                self.last_modified = headers.get('last-modified') or self.last_modified
+            first = not self._known
+            new = [g for g in (guids or []) if g not in self._known]
+            if new:
+                self.guids = (new + self.guids)[:MAX_GUIDS]
+                self._known = set(self.guids)
+            if not first and self.last_poll:
+                observed = len(new) / max(now - self.last_poll, 1.0)
+                self.rate = observed if self.rate is None else RATE_ALPHA * observed + (1 - RATE_ALPHA) * self.rate
+            self.last_poll = now
+            if new and not first:
+                self.unchanged = 0
+                self.interval = self._rate_interval()
+            elif not first:
+                self.unchanged += 1
+                self.interval = self._clamp(self.interval * UNCHANGED_BACKOFF)
+            return 0 if first else len(new)
+
+    def due(self, now=None):
+        """Whether the feed may be polled now (its interval, less the jitter, has passed)."""
+        now = now or time.time()
+        return now >= self.last_poll + self.interval * (1 - JITTER)
+
+    def next_delay(self, now=None):
+        """Seconds until the next poll is due (jittered)."""
+        now = now or time.time()
+        due = self.last_poll + self.interval * random.uniform(1 - JITTER, 1 + JITTER)
+        return max(due - now, 0.0)
+
+    def to_state(self):
+        return {
+            'etag': self.etag,
+            'last_modified': self.last_modified,
+            'guids': self.guids,
+            'rate': self.rate,
+            'interval': self.interval,
+            'last_poll': self.last_poll,
+            'unchanged': self.unchanged,
+        }
+
+
+_schedules = {}
+_registry_lock = threading.Lock()
+_saved = None
+
+
+def get_schedule(url, rules):
+    """Schedule of a feed, created from the saved state on first use."""
+    global _saved
+    with _registry_lock:
+        schedule = _schedules.get(url)
+        if schedule is None:
+            if _saved is None:
+                _saved = load_state(STATE_NAME)
+            schedule = _schedules[url] = FeedSchedule(url, rules, _saved.get(url))
+        return schedule
+
+
+def save_schedules():
+    with _registry_lock:
+        updates = {url: schedule.to_state() for url, schedule in _schedules.items()}
+    update_state(STATE_NAME, updates)
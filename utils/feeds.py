@@ -0,0 +1,236 @@
+"""Feed downloading for the scrapers.
+
+Feeds are fetched through utils.http_fetch (same Accept-Encoding, size limit
+and per-host transfer counters as article pages) and the bytes are handed to
+feedparser, instead of letting feedparser open the URL itself. Scrapers that
+only want the first ``limit`` entries or those since ``since`` get them from
+the streaming reader in utils/feed_reader.py, which stops there (at ``since``
+only for sources whose rules set ``feed_sorted``); feedparser still reads
+feeds the streaming reader cannot.
+
+Some feeds carry the whole article in the entry (``content:encoded``,
+Atom ``content``). ``feed_body`` returns it, cleaned with the source's rules,
+when it passes the source's ``feed_body_*`` thresholds; the scrapers then use
+it as the article body and skip the page fetch (``page_or_feed_body``),
+which also skips it for entries whose body an earlier run extracted
+(utils/seen.py).
+
+The daemon polls feeds with ``poll_feed`` (conditional GET, new-GUID count
+for utils/feed_schedule.py) before deciding to refresh a source. A body the
+poll downloaded is kept for ``POLL_REUSE_SECONDS`` and served to the
+scraper's own ``parse_feed`` call, so a changed feed is downloaded once.
+Status, validators and entry count of every download and poll are kept in
+the article store (utils/store.py).
+"""
+
+import threading
+import time
+
+import feedparser
+import urllib3
+from bs4 import BeautifulSoup
+
+from utils import metrics, seen, store
+from utils.article_cache import seen_content
+from utils.feed_reader import FeedReadError, read_feed
+from utils.host_limiter import host_slot
+from utils.http_fetch import http_session, read_body_sync
+from utils.site_rules import clean_html, get_rules
+from utils.sources import source_timezone
+from utils.timestamps import get_zone
+
+FEED_TIMEOUT = 20
+POLL_REUSE_SECONDS = 120
+
+# url -> (time, body, lower-case headers, status) from the last poll
+_polled = {}
+_polled_lock = threading.Lock()
+
+# Feeds were always fetched without certificate checks (see the scrapers' ssl setup)
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+
+def _failed(url, status=None, exc=None):
+    result = feedparser.parse(b'')
+    result['href'] = url
+    if status is not None:
+        result['status'] = status
+    if exc is not None:
+        result['bozo'] = 1
+        result['bozo_exception'] = exc
+    return result
+
+
+def parse_feed(url, source_id, session=None, limit=None, since=None, tz=None):
+    """
+    Download and parse a feed.
+
+    Args:
+        url (str): Feed URL
+        source_id (str): Source id (size limit and metrics scope)
+        session (requests.Session): Optional session to reuse
+        limit (int): Only the first this many entries are needed
+        since (datetime): Only entries published since this are needed
+            (reading may stop at the first older one if the feed is sorted)
+        tz: Zone of entry dates without one (default: the source's region zone)
+
+    Returns:
+        feedparser.FeedParserDict: Parsed feed with 'status' set like
+        ``feedparser.parse(url)`` would
+    """
+    with _polled_lock:
+        polled = _polled.pop(url, None)
+    if polled is not None and time.time() - polled[0] <= POLL_REUSE_SECONDS:
+        _, body, headers, status = polled
+        return _parse(url, body, headers, status, source_id, limit, since, tz)
+
+    session = session or http_session()
+    try:
+        # Same User-Agent feedparser sends when it opens the URL itself
+        with host_slot(url) as slot:
+            resp = session.get(url, headers={'User-Agent': feedparser.USER_AGENT},
+                               timeout=FEED_TIMEOUT, stream=True, verify=False)
+            slot.done(resp.status_code, resp.headers)
+    except Exception as e:
+        return _failed(url, exc=e)
+    status = resp.status_code
+    headers = {k.lower(): v for k, v in resp.headers.items()}
+    if status >= 400:
+        resp.close()
+        store.record_feed(url, source_id, status)
+        return _failed(url, status)
+    body = read_body_sync(resp, source_id, content_types=(), max_bytes=get_rules(source_id).max_feed_bytes)
+    if body is None:
+        return _failed(url, status)
+    result = _parse(url, body, headers, status, source_id, limit, since, tz)
+    store.record_feed(url, source_id, status, headers, len(result.entries))
+    return result
+
+
+def _parse(url, body, headers, status, source_id=None, limit=None, since=None, tz=None):
+    rules = get_rules(source_id)
+    if (limit is not None or since is not None) and rules.stream_feed:
+        if not rules.feed_sorted:
+            # An older entry may be followed by newer ones
+            since = None
+        elif tz is None:
+            tz = get_zone(source_timezone(source_id))
+        try:
+            result = read_feed(body, limit, since, tz)
+            metrics.incr(source_id, 'feed_reader.streamed')
+            if result.truncated:
+                metrics.incr(source_id, 'feed_reader.stopped_early')
+            result['status'] = status
+            result['href'] = url
+            return result
+        except FeedReadError as e:
+            print(f"Streaming read of {url} failed ({e}), using feedparser")
+            metrics.incr(source_id, 'feed_reader.fallback')
+    # feedparser needs the decoded body's headers, not the compressed ones
+    headers = dict(headers)
+    headers.pop('content-encoding', None)
+    headers.pop('content-length', None)
+    result = feedparser.parse(body, response_headers=headers)
+    result['status'] = status
+    result['href'] = url
+    return result
+
+
+def _guid(entry):
+    return entry.get('id') or entry.get('link') or entry.get('title') or ''
+
+
+def poll_feed(url, source_id, schedule, session=None):
+    """
+    Conditional GET of a feed for the daemon's scheduler.
+
+    Args:
+        url (str): Feed URL
+        source_id (str): Source id (size limit and metrics scope)
+        schedule (FeedSchedule): The feed's schedule; validators are sent
+            from it and the poll's outcome is recorded in it
+
+    Returns:
+        int: Number of new items (0 when unchanged), or None if the poll failed
+    """
+    session = session or http_session()
+    headers = {'User-Agent': feedparser.USER_AGENT}
+    headers.update(schedule.conditional_headers())
+    metrics.incr(source_id, 'poll.requests')
+    try:
+        with host_slot(url) as slot:
+            resp = session.get(url, headers=headers, timeout=FEED_TIMEOUT, stream=True, verify=False)
+            slot.done(resp.status_code, resp.headers)
+    except Exception as e:
+        print(f"Error polling feed {url}: {e}")
+        return None
+    status = resp.status_code
+    if status == 304:
+        resp.close()
+        store.record_feed(url, source_id, status)
+        metrics.incr(source_id, 'poll.not_modified')
+        schedule.record(None)
+        return 0
+    if status >= 400:
+        resp.close()
+        return None
+    resp_headers = {k.lower(): v for k, v in resp.headers.items()}
+    body = read_body_sync(resp, source_id, content_types=(), max_bytes=get_rules(source_id).max_feed_bytes)
+    if body is None:
+        return None
+    result = _parse(url, body, resp_headers, status)
+    store.record_feed(url, source_id, status, resp_headers, len(result.entries))
+    new = schedule.record([_guid(e) for e in result.entries], resp_headers)
+    metrics.incr(source_id, 'poll.new_items', new)
+    with _polled_lock:
+        _polled[url] = (time.time(), body, resp_headers, status)
+    return new
+
+
+def feed_body(entry, rules):
+    """
+    The entry's own full body, cleaned, or '' if it has none good enough.
+
+    A body is used when its text reaches feed_body_min_length, it has at
+    least feed_body_min_paragraphs paragraphs, it is not boilerplate and it
+    does not end like an excerpt. Counted as feed_body.used / .rejected.
+    """
+    if rules.feed_body_min_length <= 0:
+        return ''
+    values = [c.get('value') or '' for c in entry.get('content') or []]
+    raw = max(values, key=len, default='')
+    if not raw.strip():
+        return ''
+    try:
+        body = clean_html(raw, rules)
+        soup = BeautifulSoup(body, 'html.parser')
+        text = soup.get_text(' ', strip=True)
+        good = (len(text) >= rules.feed_body_min_length
+                and len(soup.find_all('p')) >= rules.feed_body_min_paragraphs
+                and not any(marker in text for marker in rules.boilerplate_text)
+                and not text.endswith(rules.feed_body_truncation))
+    except Exception as e:
+        print(f"Error checking feed body: {e}")
+        good = False
+    metrics.incr(rules.source_id, 'feed_body.used' if good else 'feed_body.rejected')
+    return body if good else ''
+
+
+def use_feed_body(article):
+    """Record that article.content, a full body from the feed, stands for the page."""
+    store.record_extraction(article.url, article.source_id, 'feed', article.content)
+    seen.mark_seen(article.source_id, article.url, article.guid)
+    return article.content
+
+
+async def page_or_feed_body(article, fetch, *args):
+    """
+    article.content if the feed supplied a full body, else the body extracted
+    by an earlier run (utils/seen.py), else await fetch(*args).
+    """
+    if article.content:
+        return use_feed_body(article)
+    content = seen_content(article.source_id, article.url, article.guid)
+    if content:
+        return content
+    return await fetch(*args)
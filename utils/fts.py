@@ -0,0 +1,195 @@
+"""Full-text index of the article store (SQLite FTS5).
+
+``articles_fts`` holds the title and plain body text of every stored article
+(rowid = ``articles.id``) and is updated in the same transaction as the
+articles themselves, so each scraper's articles are searchable as soon as
+``save_articles`` has stored them. ``store.search`` runs the queries.
+
+Tokenization: FTS5's ``unicode61`` tokenizer (diacritics folded, so
+``election`` finds ``élection``) splits English and French text on word
+boundaries, but Japanese has no spaces and a whole sentence would become one
+token. Runs of CJK characters are therefore rewritten as overlapping bigrams
+(``東京都庁`` -> ``東京 京都 都庁``) before indexing, and query terms the same
+way (as a phrase, so the bigrams must be adjacent). Any Japanese word of two or
+more characters is found wherever it occurs; a single character is matched as
+a prefix, through a prefix index of one character (``prefix = '1'``).
+
+The ``tags`` column holds one token each for the source and the language
+(``=source=npr =language=en``; ``=`` and ``_`` are token characters), so the
+source and language filters of a search are terms of the MATCH expression:
+FTS5 intersects them with the query terms without reading the articles of
+the matches they exclude. A user query has no ``=`` and cannot match a tag.
+
+Ranking is BM25 with the title weighted above the body (the tags count for
+nothing). Scoring every match of a common word costs time in proportion to
+the archive, so only the newest ``RANK_WINDOW`` matches (of the filters too)
+are ranked; queries stay fast at a million articles and a news search
+favours recent articles anyway. Snippets are cut from the original text of
+the returned rows only, around the first match.
+"""
+
+import html as html_lib
+import re
+import unicodedata
+
+# Hiragana, katakana (incl. half-width), CJK ideographs and Hangul
+_CJK_RUN = re.compile('[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff66-\uff9f\uac00-\ud7af]+')
+_TAG = re.compile(r'<[^>]+>')
+_SPACE = re.compile(r'\s+')
+_WORD = re.compile(r'\w+\*?')
+
+# Title matches count this many times more than body matches
+TITLE_WEIGHT = 5.0
+SNIPPET_CHARS = 160
+# Newest matches of a query that are ranked
+RANK_WINDOW = 10000
+
+SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+    title, body, tags, tokenize = "unicode61 remove_diacritics 2 tokenchars '=_'", prefix = '1'
+);
+"""
+
+
+def plain_text(value):
+    """Text of an HTML fragment, whitespace collapsed."""
+    if not value:
+        return ''
+    return _SPACE.sub(' ', html_lib.unescape(_TAG.sub(' ', value))).strip()
+
+
+def _bigrams(run):
+    if len(run) < 2:
+        return run
+    return ' '.join(run[i:i + 2] for i in range(len(run) - 1))
+
+
+def index_text(text):
+    """Text as indexed: CJK runs replaced by space-separated bigrams."""
+    return _CJK_RUN.sub(lambda m: f' {_bigrams(m.group())} ', text)
+
+
+def tags(source_id, language):
+    """Text of the tags column of an article."""
+    return f'=source={source_id or ""} =language={language or ""}'
+
+
+def match_query(query, source_id=None, language=None):
+    """
+    FTS5 MATCH expression for a user query: every term must match, and the
+    tags the source and language given. CJK runs become bigram phrases, other
+    words are quoted (a trailing * keeps prefix search). Returns '' when the
+    query has no terms.
+    """
+    terms = []
+    for part in query.split():
+        for cjk, other in re.findall(f'({_CJK_RUN.pattern})|([^\u3000-\u303f\\s]+)', part):
+            if cjk:
+                if len(cjk) == 1:
+                    terms.append(f'"{cjk}"*')
+                else:
+                    terms.append(f'"{_bigrams(cjk)}"')
+                continue
+            for word in _WORD.findall(other):
+                prefix = word.endswith('*')
+                word = word.rstrip('*')
+                if word:
+                    terms.append(f'"{word}"*' if prefix else f'"{word}"')
+    if not terms:
+        return ''
+    if source_id is not None:
+        terms.append(f'"=source={source_id}"')
+    if language is not None:
+        terms.append(f'"=language={language}"')
+    return ' '.join(terms)
+
+
+def ensure(conn):
+    """
+    Create the index (filled from the stored articles) if the database has
+    none, or only one without the tags column (rebuilt once).
+    """
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(articles_fts)')}
+    if 'tags' in columns:
+        return
+    with conn:
+        if columns:
+            print("Rebuilding the full-text index of the article store...")
+            conn.execute('DROP TABLE articles_fts')
+        conn.executescript(SCHEMA)
+        conn.execute(f"INSERT INTO articles_fts (articles_fts, rank) VALUES ('rank', 'bm25({TITLE_WEIGHT}, 1.0, 0.0)')")
+    last = 0
+    while True:
+        rows = conn.execute(f'SELECT {_INDEXED} FROM articles WHERE id > ? ORDER BY id LIMIT 1000',
+                            (last,)).fetchall()
+        if not rows:
+            break
+        with conn:
+            _insert(conn, rows)
+        last = rows[-1][0]
+
+
+# Columns of articles read to index a row
+_INDEXED = 'id, title, content, summary, source_id, language'
+
+
+def _insert(conn, rows):
+    conn.executemany('INSERT INTO articles_fts (rowid, title, body, tags) VALUES (?, ?, ?, ?)', [
+        (article_id, index_text(title or ''), index_text(plain_text(content or summary)), tags(source_id, language))
+        for article_id, title, content, summary, source_id, language in rows
+    ])
+
+
+def index_articles(conn, canonical_urls):
+    """(Re)index the stored articles with these canonical URLs; call inside the write transaction."""
+    for start in range(0, len(canonical_urls), 500):
+        chunk = canonical_urls[start:start + 500]
+        marks = ','.join('?' * len(chunk))
+        rows = conn.execute(f'SELECT {_INDEXED} FROM articles WHERE canonical_url IN ({marks})',
+                            chunk).fetchall()
+        conn.executemany('DELETE FROM articles_fts WHERE rowid = ?', [(r[0],) for r in rows])
+        _insert(conn, rows)
+
+
+class _FoldTable(dict):
+    """str.translate table dropping the accents of Latin letters (é -> e), one character for one."""
+
+    def __missing__(self, code):
+        char = chr(code)
+        folded = self[code] = unicodedata.normalize('NFD', char)[0] if code < 0x250 else char
+        return folded
+
+
+_FOLD = _FoldTable()
+
+
+def _fold(text):
+    # Same length as text, so match offsets apply to both
+    return text.translate(_FOLD)
+
+
+def snippet(text, query, length=SNIPPET_CHARS):
+    """About `length` characters of text around the first query term, matches in <b> (HTML-escaped)."""
+    terms = []
+    for part in _fold(query).split():
+        terms.extend(t.rstrip('*') for t in re.findall(f'{_CJK_RUN.pattern}|\\w+\\*?', part))
+    terms = [t for t in terms if t]
+    if not text:
+        return ''
+    pattern = re.compile('|'.join(re.escape(t) for t in sorted(terms, key=len, reverse=True)), re.I) if terms else None
+    match = pattern.search(text) if pattern else None
+    if match is None and pattern and not text.isascii():
+        # Only an accented form occurs; folding the whole text is the slow path
+        match = pattern.search(_fold(text))
+    start = max(0, (match.start() if match else 0) - length // 3)
+    window = text[start:start + length]
+    parts = []
+    pos = 0
+    for m in (pattern.finditer(_fold(window)) if pattern else []):
+        parts.append(html_lib.escape(window[pos:m.start()]))
+        parts.append(f'<b>{html_lib.escape(window[m.start():m.end()])}</b>')
+        pos = m.end()
+    parts.append(html_lib.escape(window[pos:]))
+    prefix = '…' if start > 0 else ''
+    suffix = '…' if start + length < len(text) else ''
+    return prefix + ''.join(parts) + suffix
@@ -0,0 +1,125 @@
+"""Hedged requests for slow article fetches.
+
+When hedging is enabled for a source and a request has not completed within
+its host's p90 latency (see ``HostLimiter.percentile``) of getting its host
+slot, an identical second request is started; whichever finishes first wins
+and the other is cancelled. Time spent queued in the host limiter does not
+count: the latency behind the p90 starts at the slot too, and a hedge would
+only queue for the same slot. Hedges are paid from a process-wide token
+budget: every request earns ``BUDGET_RATIO`` of a token and a hedge costs
+one, so hedging adds at most about 10% load (plus a small burst).
+
+Hedging is opt-in, per source with ``QUICKNEWS_HEDGE_<SOURCE>=1`` or for all
+sources with ``QUICKNEWS_HEDGE=1``. Counters ``hedge.fired``, ``hedge.won``
+(the hedge finished first), ``hedge.lost`` and ``hedge.denied`` (no budget)
+appear in the run report under the source id.
+"""
+
+import asyncio
+import os
+import threading
+
+from utils import metrics
+from utils.host_limiter import get_limiter
+
+BUDGET_RATIO = 0.1
+BUDGET_BURST = 3.0
+# Never hedge sooner than this, whatever the p90 says
+MIN_HEDGE_DELAY = 0.05
+
+_TRUE = ('1', 'true', 'yes', 'on')
+
+
+def hedging_enabled(source_id):
+    value = os.environ.get(f'QUICKNEWS_HEDGE_{source_id.upper()}')
+    if value is None:
+        value = os.environ.get('QUICKNEWS_HEDGE', '')
+    return value.strip().lower() in _TRUE
+
+
+class HedgeBudget:
+    """Token bucket shared by all hedged calls of the process."""
+
+    def __init__(self, ratio=BUDGET_RATIO, burst=BUDGET_BURST):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = 1.0
+        self._lock = threading.Lock()
+
+    def earn(self):
+        with self._lock:
+            self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def spend(self):
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+BUDGET = HedgeBudget()
+
+
+async def _cancel(task):
+    task.cancel()
+    try:
+        await task
+    except BaseException:
+        pass
+
+
+async def hedged(make_call, url, source_id):
+    """
+    Await make_call(), hedging it with a second make_call() if it is slow.
+
+    Args:
+        make_call: Coroutine function performing the whole request; it is
+            given an asyncio.Event to set once it holds its host slot
+        url (str): Request URL (its host's p90 sets the hedge delay)
+        source_id (str): Source id (opt-in switch and metrics scope)
+
+    Returns:
+        The result of the first call to complete successfully; if both calls
+        fail, the primary's exception is raised.
+    """
+    if not hedging_enabled(source_id):
+        return await make_call(asyncio.Event())
+    BUDGET.earn()
+    delay = get_limiter(url).percentile(0.9)
+    if delay is None:
+        # No latency history for this host yet
+        return await make_call(asyncio.Event())
+
+    acquired = asyncio.Event()
+    primary = asyncio.ensure_future(make_call(acquired))
+    slot = asyncio.ensure_future(acquired.wait())
+    pending = {primary, slot}
+    try:
+        # The hedge delay starts once the primary holds its host slot
+        await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        pending = {primary}
+        if primary.done():
+            return primary.result()
+        done, _ = await asyncio.wait(pending, timeout=max(delay, MIN_HEDGE_DELAY))
+        if done:
+            return primary.result()
+        if not BUDGET.spend():
+            metrics.incr(source_id, 'hedge.denied')
+            return await primary
+
+        metrics.incr(source_id, 'hedge.fired')
+        hedge = asyncio.ensure_future(make_call(asyncio.Event()))
+        pending = {primary, hedge}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    metrics.incr(source_id, 'hedge.won' if task is hedge else 'hedge.lost')
+                    return task.result()
+        return primary.result()
+    finally:
+        slot.cancel()
+        for task in pending:
+            if not task.done():
+                await _cancel(task)
@@ -0,0 +1,365 @@
+"""Adaptive per-host concurrency (AIMD) with Retry-After support.
+
+Every article request goes through a ``HostLimiter`` for its host. The
+limiter allows ``limit`` requests in flight and adapts it like TCP congestion
+control:
+
+- a successful response whose latency stays within ``LATENCY_TOLERANCE`` times
+  the host's average raises the limit additively (about +1 per full window);
+- a 429, 403 or 5xx response, or a connection error/timeout, halves the limit
+  (at most once per round trip) and pauses the host, for ``Retry-After`` if the
+  response carries one, otherwise for an exponentially growing cooldown.
+
+Limits, average latency and pauses are saved to ``state/hosts.json`` when the
+process exits, so the next run starts from what the host tolerated last time.
+A pause longer than ``MAX_RETRY_WAIT`` is not waited out: ``HostBackoff`` is
+raised instead and the caller falls back to the RSS summary.
+
+Each limiter also owns the host's circuit breaker (utils/circuit_breaker.py):
+``host_slot`` raises ``CircuitOpen`` without sending anything while the circuit
+is open. Both errors derive from ``HostUnavailable``.
+
+Usage::
+
+    async with host_slot(url) as slot:
+        async with session.get(url) as response:
+            slot.done(response.status, response.headers)
+            ...
+"""
+
+import asyncio
+import atexit
+import email.utils
+import threading
+import time
+import weakref
+from collections import deque
+from urllib.parse import urlparse
+
+from utils import metrics
+from utils.circuit_breaker import OPEN, CircuitBreaker, CircuitOpen, HostUnavailable
+from utils.state import load_state, update_state
+
+STATE_NAME = 'hosts'
+
+INITIAL_LIMIT = 4
+MIN_LIMIT = 1
+MAX_LIMIT = 16
+BACKOFF_FACTOR = 0.5
+LATENCY_TOLERANCE = 2.0
+# Weight of the newest sample in the latency average
+LATENCY_ALPHA = 0.2
+# Recent latencies kept for percentiles, and how many make a percentile usable
+LATENCY_SAMPLES = 50
+MIN_PERCENTILE_SAMPLES = 8
+
+# Cooldown without Retry-After: base * 2^(consecutive failures - 1), capped
+THROTTLE_COOLDOWN = 1.0
+ERROR_COOLDOWN = 0.5
+MAX_COOLDOWN = 30.0
+# Longest pause we sleep through instead of giving up on the host
+MAX_RETRY_WAIT = 60.0
+# Saved limits older than this are ignored
+STATE_TTL = 7 * 24 * 3600
+
+THROTTLE_STATUSES = frozenset({403, 429})
+
+
+class HostBackoff(HostUnavailable):
+    """The host asked us to stay away for longer than MAX_RETRY_WAIT."""
+
+    def __init__(self, host, wait):
+        super().__init__(f"{host} paused for another {wait:.0f}s")
+        self.host = host
+        self.wait = wait
+
+
+async def _notify(cond):
+    async with cond:
+        cond.notify_all()
+
+
+def parse_retry_after(value, now=None):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    return max(0.0, when.timestamp() - (now or time.time()))
+
+
+def host_of(url):
+    return (urlparse(url).hostname or url or 'unknown').lower()
+
+
+def is_throttle(status):
+    return status in THROTTLE_STATUSES or status >= 500
+
+
+class HostLimiter:
+    """AIMD concurrency limit and pause state for one host."""
+
+    def __init__(self, host, saved=None):
+        saved = saved or {}
+        fresh = time.time() - saved.get('updated', 0) < STATE_TTL
+        self.host = host
+        self.limit = float(saved.get('limit', INITIAL_LIMIT)) if fresh else float(INITIAL_LIMIT)
+        self.limit = min(MAX_LIMIT, max(MIN_LIMIT, self.limit))
+        self.latency = saved.get('latency') if fresh else None
+        # p90 of the previous run, used until this run has enough samples
+        self.saved_p90 = saved.get('p90') if fresh else None
+        self.samples = deque(maxlen=LATENCY_SAMPLES)
+        self.blocked_until = float(saved.get('blocked_until', 0))
+        self.breaker = CircuitBreaker(host, saved.get('breaker'))
+        self.inflight = 0
+        self.failures = 0
+        self.used = False
+        self._last_decrease = 0.0
+        # Guards inflight and the AIMD state: in daemon mode the sources'
+        # event loops run on their own threads and share a host's limiter
+        self._lock = threading.Lock()
+        # One condition per event loop waiting on this host
+        self._conds = weakref.WeakKeyDictionary()
+
+    def _condition(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            cond = self._conds.get(loop)
+            if cond is None:
+                cond = self._conds[loop] = asyncio.Condition()
+            return cond
+
+    def _take(self):
+        with self._lock:
+            if self.inflight < int(self.limit):
+                self.inflight += 1
+                return True
+            return False
+
+    def _pause_left(self):
+        wait = self.blocked_until - time.time()
+        if wait > MAX_RETRY_WAIT:
+            metrics.incr(self.host, 'limiter.gave_up')
+            raise HostBackoff(self.host, wait)
+        return wait
+
+    async def acquire(self):
+        """Wait for a free slot and for any pause to end."""
+        cond = self._condition()
+        start = time.monotonic()
+        async with cond:
+            while True:
+                wait = self._pause_left()
+                if wait > 0:
+                    try:
+                        await asyncio.wait_for(cond.wait(), wait)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                if self._take():
+                    break
+                await cond.wait()
+        self.used = True
+        waited = time.monotonic() - start
+        if waited > 0.001:
+            metrics.incr(self.host, 'limiter.wait_ms', waited * 1000)
+
+    async def release(self):
+        current = asyncio.get_running_loop()
+        with self._lock:
+            self.inflight -= 1
+            conds = list(self._conds.items())
+        # Wake the waiters of every loop, each on its own thread
+        for loop, cond in conds:
+            if loop is current:
+                await _notify(cond)
+            elif not loop.is_closed():
+                try:
+                    asyncio.run_coroutine_threadsafe(_notify(cond), loop)
+                except RuntimeError:
+                    pass
+
+    def wait_sync(self):
+        """Blocking variant of acquire() for the one-at-a-time requests scrapers."""
+        wait = self._pause_left()
+        if wait > 0:
+            metrics.incr(self.host, 'limiter.wait_ms', wait * 1000)
+            time.sleep(wait)
+        self.used = True
+
+    def record(self, status=None, latency=None, retry_after=None):
+        """Feed one outcome into the AIMD loop (status None means a transport error)."""
+        with self._lock:
+            if status is not None and not is_throttle(status):
+                self._on_success(latency)
+            else:
+                self._on_failure(status, retry_after)
+
+    def _on_success(self, latency):
+        self.failures = 0
+        if latency is None:
+            return
+        self.samples.append(latency)
+        healthy = self.latency is None or latency <= self.latency * LATENCY_TOLERANCE
+        self.latency = latency if self.latency is None else (
+            (1 - LATENCY_ALPHA) * self.latency + LATENCY_ALPHA * latency
+        )
+        if healthy:
+            self.limit = min(MAX_LIMIT, self.limit + 1 / self.limit)
+
+    def _on_failure(self, status, retry_after):
+        self.failures += 1
+        metrics.incr(self.host, f"limiter.{'status_' + str(status) if status else 'errors'}")
+        now = time.monotonic()
+        # Responses already in flight when the limit dropped don't cut it again
+        if now - self._last_decrease > (self.latency or 1.0):
+            self.limit = max(MIN_LIMIT, self.limit * BACKOFF_FACTOR)
+            self._last_decrease = now
+            metrics.incr(self.host, 'limiter.decreases')
+        if retry_after is not None:
+            metrics.incr(self.host, 'limiter.retry_after')
+            pause = retry_after
+        else:
+            base = THROTTLE_COOLDOWN if status else ERROR_COOLDOWN
+            pause = min(MAX_COOLDOWN, base * 2 ** (self.failures - 1))
+        self.blocked_until = max(self.blocked_until, time.time() + pause)
+
+    def percentile(self, q=0.9):
+        """Latency percentile of recent successful responses (seconds), or None."""
+        with self._lock:
+            samples = sorted(self.samples)
+        if len(samples) < MIN_PERCENTILE_SAMPLES:
+            return self.saved_p90 if q == 0.9 else None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def to_state(self):
+        p90 = self.percentile(0.9)
+        return {
+            'limit': round(self.limit, 2),
+            'latency': round(self.latency, 3) if self.latency is not None else None,
+            'p90': round(p90, 3) if p90 is not None else None,
+            'blocked_until': self.blocked_until if self.blocked_until > time.time() else 0,
+            'breaker': self.breaker.to_state(),
+            'updated': time.time(),
+        }
+
+
+_limiters = {}
+_registry_lock = threading.Lock()
+_saved = None
+
+
+def get_limiter(url):
+    """Limiter for the host of url, created from the saved state on first use."""
+    global _saved
+    host = host_of(url)
+    with _registry_lock:
+        limiter = _limiters.get(host)
+        if limiter is None:
+            if _saved is None:
+                _saved = load_state(STATE_NAME)
+                atexit.register(save_limiters)
+            limiter = _limiters[host] = HostLimiter(host, _saved.get(host))
+        return limiter
+
+
+def save_limiters():
+    """Persist the state of every host used in this process."""
+    with _registry_lock:
+        updates = {host: lim.to_state() for host, lim in _limiters.items() if lim.used}
+    update_state(STATE_NAME, updates)
+
+
+class _Slot:
+    def __init__(self, limiter):
+        self.limiter = limiter
+        self.breaker = limiter.breaker
+        self.status = None
+        self.retry_after = None
+        self.start = None
+        self.probe = False
+
+    def done(self, status, headers=None):
+        """Report the response status (and headers, for Retry-After)."""
+        self.status = status
+        if headers is not None and is_throttle(status):
+            # Playwright gives plain dicts with lower-case names
+            self.retry_after = parse_retry_after(headers.get('Retry-After') or headers.get('retry-after'))
+
+    def _check_open(self):
+        # The circuit may have opened while we were queued for a slot
+        if not self.probe and self.breaker.state == OPEN:
+            raise CircuitOpen(self.breaker.host, self.breaker.open_until - time.time())
+
+    def _finish(self, exc):
+        if isinstance(exc, asyncio.CancelledError) or (exc is not None and self.status is None
+                                                      and isinstance(exc, HostUnavailable)):
+            if self.probe:
+                self.breaker.cancel_probe()
+            return
+        if exc is not None and self.status is None:
+            # Timeout or connection error before any status
+            self.limiter.record(None)
+            self.breaker.record(False, self.probe)
+            return
+        if self.status is not None:
+            self.limiter.record(self.status, time.monotonic() - self.start, self.retry_after)
+            self.breaker.record(not is_throttle(self.status), self.probe)
+        elif self.probe:
+            self.breaker.cancel_probe()
+
+    async def __aenter__(self):
+        self.probe = self.breaker.before_request()
+        try:
+            await self.limiter.acquire()
+        except BaseException:
+            if self.probe:
+                self.breaker.cancel_probe()
+            raise
+        try:
+            self._check_open()
+        except CircuitOpen:
+            await self.limiter.release()
+            raise
+        self.start = time.monotonic()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            self._finish(exc)
+        finally:
+            await self.limiter.release()
+        return False
+
+    def __enter__(self):
+        self.probe = self.breaker.before_request()
+        try:
+            self.limiter.wait_sync()
+            self._check_open()
+        except BaseException:
+            if self.probe:
+                self.breaker.cancel_probe()
+            raise
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._finish(exc)
+        return False
+
+
+def host_slot(url):
+    """
+    Context manager (async or sync) holding a request slot for url's host.
+
+    Raises HostUnavailable (CircuitOpen or HostBackoff) on entry when the host
+    must not be contacted.
+    """
+    return _Slot(get_limiter(url))
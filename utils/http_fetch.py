@@ -0,0 +1,454 @@
+"""Bounded HTTP body reading shared by the scrapers.
+
+Article bodies are read in chunks instead of ``response.text()`` /
+``resp.content``. A response is abandoned as soon as it declares or reaches
+more than the source's ``max_body_bytes``, or declares a Content-Type outside
+the source's ``content_types`` (HTML by default). Aborted responses are
+counted in utils.metrics under the source id.
+
+Content-Encoding is handled here rather than by aiohttp/requests so that every
+fetch negotiates the same codings (``ACCEPT_ENCODING``: br and zstd when their
+packages are installed, then gzip and deflate), the size limit applies to the
+decompressed body, and compressed versus uncompressed bytes are counted per
+host. aiohttp sessions must be created with ``client_session()`` and requests
+responses opened with ``stream=True``.
+
+Bodies are decoded with utils.charset (header, BOM or <meta> charset, never
+full-body detection); ``read_page_*`` return the bytes and charset instead
+so that lxml can parse the bytes directly.
+
+In daemon mode (utils/warm.py) ``fetch_page_async`` and ``http_session``
+reuse long-lived sessions instead of opening new ones per call.
+"""
+
+import zlib
+from urllib.parse import urlparse
+
+import aiohttp
+import requests
+
+from utils import metrics, store, warm
+from utils.charset import decode_with, detect_charset
+from utils.hedging import hedged
+from utils.host_limiter import host_slot
+from utils.site_rules import get_rules
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CHUNK_SIZE = 64 * 1024
+
+# Errors raised by the decompressors on corrupt or truncated bodies
+_DECODE_ERRORS = (zlib.error, OSError, ValueError)
+if brotli is not None:
+    _DECODE_ERRORS += (brotli.error,)
+if zstandard is not None:
+    _DECODE_ERRORS += (zstandard.ZstdError,)
+
+
+def _accept_encoding():
+    codings = []
+    if brotli is not None:
+        codings.append('br')
+    if zstandard is not None:
+        codings.append('zstd')
+    return ', '.join(codings + ['gzip', 'deflate'])
+
+
+# Advertised by every scraper fetch; only codings we can decode are listed
+ACCEPT_ENCODING = _accept_encoding()
+
+
+class UnsupportedEncoding(ValueError):
+    """Raised for a Content-Encoding we did not advertise and cannot decode."""
+
+
+class _Deflate:
+    """'deflate' is meant to be zlib-wrapped, but some servers send raw deflate."""
+
+    def __init__(self):
+        self._obj = zlib.decompressobj()
+        self._started = False
+
+    def decompress(self, data, max_length=0):
+        if self._started:
+            return self._obj.decompress(data, max_length)
+        try:
+            out = self._obj.decompress(data, max_length)
+        except zlib.error:
+            self._obj = zlib.decompressobj(-zlib.MAX_WBITS)
+            out = self._obj.decompress(data, max_length)
+        self._started = bool(data)
+        return out
+
+    def flush(self):
+        return self._obj.flush()
+
+
+def _brotli_step():
+    obj = brotli.Decompressor()
+
+    def decompress(data, max_length=0):
+        if max_length:
+            try:
+                return obj.process(data, output_buffer_limit=max_length)
+            except TypeError:
+                # brotli < 1.2 has no output limit
+                pass
+        return obj.process(data)
+    return decompress, lambda: b''
+
+
+def _decoder_step(coding):
+    """(decompress(data, max_length), flush) for one coding; max_length 0 is unbounded."""
+    if coding in ('gzip', 'x-gzip'):
+        obj = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        return obj.decompress, obj.flush
+    if coding == 'deflate':
+        obj = _Deflate()
+        return obj.decompress, obj.flush
+    if coding == 'br' and brotli is not None:
+        return _brotli_step()
+    if coding == 'zstd' and zstandard is not None:
+        # zstandard cannot cap the output of a single call
+        obj = zstandard.ZstdDecompressor().decompressobj()
+        return lambda data, max_length=0: obj.decompress(data), obj.flush
+    raise UnsupportedEncoding(coding)
+
+
+class ContentDecoder:
+    """Incremental decoder for a Content-Encoding header value (codings applied in order)."""
+
+    def __init__(self, content_encoding):
+        codings = [c.strip().lower() for c in (content_encoding or '').split(',')]
+        self.codings = [c for c in codings if c and c != 'identity']
+        self._steps = [_decoder_step(c) for c in reversed(self.codings)]
+
+    def decompress(self, data, max_length=0):
+        """
+        Decode a chunk. With max_length, the final step stops after that many
+        bytes so that a compression bomb is caught before it is inflated.
+        """
+        last = len(self._steps) - 1
+        for i, (decompress, _) in enumerate(self._steps):
+            data = decompress(data, max_length if i == last else 0)
+        return data
+
+    def flush(self):
+        data = b''
+        for decompress, flush in self._steps:
+            data = (decompress(data) if data else b'') + flush()
+        return data
+
+
+# DNS answers cached by the kept aiohttp sessions (daemon mode), in seconds
+KEPT_DNS_TTL = 1800
+
+
+def client_session(**kwargs):
+    """aiohttp session that leaves Content-Encoding to this module and advertises ACCEPT_ENCODING."""
+    headers = {'Accept-Encoding': ACCEPT_ENCODING}
+    headers.update(kwargs.pop('headers', None) or {})
+    return aiohttp.ClientSession(auto_decompress=False, headers=headers, **kwargs)
+
+
+def _new_http_session():
+    session = requests.Session()
+    session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+    return session
+
+
+def http_session():
+    """
+    requests session advertising ACCEPT_ENCODING (read responses with stream=True).
+    In daemon mode the same session is returned every time; do not close it.
+    """
+    if warm.enabled():
+        return warm.get('requests', _new_http_session, lambda s: s.close(), per_loop=False)
+    return _new_http_session()
+
+
+def kept_client_session():
+    """The event loop's long-lived aiohttp session (daemon mode only)."""
+    return warm.get('aiohttp', lambda: client_session(connector=aiohttp.TCPConnector(ttl_dns_cache=KEPT_DNS_TTL)),
+                    lambda s: s.close())
+
+
+def record_transfer(url, compressed, uncompressed, coding=None):
+    """Count wire (compressed) and decoded bytes of one response under its host."""
+    host = urlparse(url).hostname or 'unknown'
+    metrics.incr(host, 'transfer.responses')
+    metrics.incr(host, 'transfer.compressed_bytes', compressed)
+    metrics.incr(host, 'transfer.uncompressed_bytes', uncompressed)
+    metrics.incr(host, f"transfer.encoding.{coding or 'identity'}")
+
+
+def _mime_type(content_type):
+    return (content_type or '').split(';', 1)[0].strip().lower()
+
+
+def _content_length(value):
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _precheck(source_id, url, content_type, content_length, content_types=None, max_bytes=None):
+    """Return an abort reason based on the headers alone, or None."""
+    rules = get_rules(source_id)
+    content_types = rules.content_types if content_types is None else content_types
+    max_bytes = max_bytes or rules.max_body_bytes
+    mime = _mime_type(content_type)
+    if mime and content_types and mime not in content_types:
+        metrics.incr(source_id, 'fetch.aborted_content_type')
+        print(f"Skipping {url}: content type {mime}")
+        return 'content_type'
+    if content_length is not None and content_length > max_bytes:
+        metrics.incr(source_id, 'fetch.aborted_too_large')
+        print(f"Skipping {url}: {content_length} bytes exceeds {max_bytes}")
+        return 'too_large'
+    return None
+
+
+def _too_large(source_id, url, size, max_bytes):
+    metrics.incr(source_id, 'fetch.aborted_too_large')
+    print(f"Aborting {url}: body exceeds {max_bytes} bytes (read {size})")
+
+
+class _BodyReader:
+    """Accumulates raw chunks, decoding Content-Encoding and enforcing the size limit."""
+
+    def __init__(self, source_id, url, headers, max_bytes=None, decoded=False):
+        self.source_id = source_id
+        self.url = url
+        self.limit = max_bytes or get_rules(source_id).max_body_bytes
+        # decoded: the HTTP client already removed the Content-Encoding
+        self.decoder = ContentDecoder(None if decoded else headers.get('Content-Encoding'))
+        self.coding = ','.join(self.decoder.codings) or None
+        self.wire = 0
+        self.size = 0
+        self.chunks = []
+
+    def feed(self, chunk):
+        """Add a raw chunk; False once the decoded body exceeds the limit."""
+        self.wire += len(chunk)
+        # One byte more than still fits is enough to know the limit is exceeded
+        data = self.decoder.decompress(chunk, self.limit - self.size + 1)
+        return self._append(data)
+
+    def _append(self, data):
+        self.size += len(data)
+        if self.size > self.limit:
+            _too_large(self.source_id, self.url, self.size, self.limit)
+            return False
+        self.chunks.append(data)
+        return True
+
+    def finish(self, wire=None):
+        """Return the decoded body (None if over the limit) and record the transfer."""
+        if not self._append(self.decoder.flush()):
+            return None
+        record_transfer(self.url, wire or self.wire, self.size, self.coding)
+        metrics.incr(self.source_id, 'fetch.responses')
+        metrics.incr(self.source_id, 'fetch.bytes', self.size)
+        return b''.join(self.chunks)
+
+    def fail(self, exc):
+        metrics.incr(self.source_id, 'fetch.aborted_encoding')
+        print(f"Aborting {self.url}: cannot decode {self.coding} body ({exc})")
+
+
+def _reader(source_id, url, headers, max_bytes, decoded=False):
+    try:
+        return _BodyReader(source_id, url, headers, max_bytes, decoded)
+    except UnsupportedEncoding as e:
+        metrics.incr(source_id, 'fetch.aborted_encoding')
+        print(f"Skipping {url}: unsupported content encoding {e}")
+        return None
+
+
+def accept_response(source_id, url, headers, body_size=None):
+    """
+    Check a response fetched by other means (e.g. a Playwright page) against the limits.
+
+    Args:
+        headers (dict): Response headers (any key case)
+        body_size (int): Size of the body if it is already known
+
+    Returns:
+        bool: False if the response should be discarded
+    """
+    lowered = {k.lower(): v for k, v in (headers or {}).items()}
+    length = _content_length(lowered.get('content-length'))
+    if lowered.get('content-encoding', 'identity') != 'identity':
+        # The declared length is that of the compressed body
+        length = None
+    if _precheck(source_id, url, lowered.get('content-type'), length):
+        return False
+    if body_size is not None:
+        limit = get_rules(source_id).max_body_bytes
+        if body_size > limit:
+            _too_large(source_id, url, body_size, limit)
+            return False
+        metrics.incr(source_id, 'fetch.responses')
+        metrics.incr(source_id, 'fetch.bytes', body_size)
+    return True
+
+
+async def read_body_async(response, source_id, content_types=None, max_bytes=None, session=None):
+    """
+    Read an aiohttp response body with the source's size and type limits.
+
+    Args:
+        content_types: Accepted MIME types (default: the source's content_types,
+            an empty set accepts anything)
+        max_bytes (int): Size limit (default: the source's max_body_bytes)
+        session (aiohttp.ClientSession): Session that made the request; needed
+            unless it comes from client_session() (which leaves bodies encoded)
+
+    Returns:
+        bytes | None: The decoded body, or None if the response was aborted
+    """
+    url = str(response.url)
+    if _precheck(source_id, url, response.headers.get('Content-Type'), response.content_length,
+                 content_types, max_bytes):
+        response.close()
+        return None
+    # A session that decompresses by itself hides the wire size and codings
+    decoded = session is not None and session.auto_decompress
+    reader = _reader(source_id, url, response.headers, max_bytes, decoded)
+    if reader is None:
+        response.close()
+        return None
+    try:
+        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+            if not reader.feed(chunk):
+                response.close()
+                return None
+        return reader.finish(response.content_length if decoded else None)
+    except _DECODE_ERRORS as e:
+        reader.fail(e)
+        response.close()
+        return None
+
+
+def read_body_sync(resp, source_id, content_types=None, max_bytes=None):
+    """
+    Read a requests response (opened with stream=True) with the source's limits.
+
+    The raw stream is read without urllib3's decoding and decompressed here.
+
+    Returns:
+        bytes | None: The decoded body, or None if the response was aborted
+    """
+    try:
+        if _precheck(source_id, resp.url, resp.headers.get('Content-Type'),
+                     _content_length(resp.headers.get('Content-Length')), content_types, max_bytes):
+            return None
+        reader = _reader(source_id, resp.url, resp.headers, max_bytes)
+        if reader is None:
+            return None
+        try:
+            for chunk in resp.raw.stream(CHUNK_SIZE, decode_content=False):
+                if not reader.feed(chunk):
+                    return None
+            return reader.finish()
+        except _DECODE_ERRORS as e:
+            reader.fail(e)
+            return None
+    finally:
+        resp.close()
+
+
+async def read_page_async(response, source_id, session=None):
+    """
+    Bounded read of an aiohttp response plus its charset, for handing bytes to lxml.
+
+    Returns:
+        tuple | None: (body bytes, charset name), or None if aborted
+    """
+    body = await read_body_async(response, source_id, session=session)
+    if body is None:
+        store.record_fetch(str(response.url), source_id, response.status)
+        return None
+    charset = detect_charset(body, response.headers.get('Content-Type'), get_rules(source_id).default_charset)
+    store.record_fetch(str(response.url), source_id, response.status, len(body), charset)
+    return body, charset
+
+
+def read_page_sync(resp, source_id):
+    """Bounded read of a streamed requests response plus its charset (None if aborted)."""
+    content_type = resp.headers.get('Content-Type')
+    body = read_body_sync(resp, source_id)
+    if body is None:
+        store.record_fetch(resp.url, source_id, resp.status_code)
+        return None
+    charset = detect_charset(body, content_type, get_rules(source_id).default_charset)
+    store.record_fetch(resp.url, source_id, resp.status_code, len(body), charset)
+    return body, charset
+
+
+async def read_html_async(response, source_id, session=None):
+    """Bounded read of an aiohttp response, decoded to text (None if aborted)."""
+    page = await read_page_async(response, source_id, session)
+    if page is None:
+        return None
+    return decode_with(page[0], page[1], source_id)
+
+
+def read_html_sync(resp, source_id):
+    """Bounded read of a streamed requests response, decoded to text (None if aborted)."""
+    page = read_page_sync(resp, source_id)
+    if page is None:
+        return None
+    return decode_with(page[0], page[1], source_id)
+
+
+async def _get_page(session, url, source_id, headers, acquired, timeout=None):
+    kwargs = {'timeout': timeout} if timeout is not None else {}
+    async with host_slot(url) as slot:
+        # Starts the hedge delay (utils/hedging.py)
+        acquired.set()
+        # Pages are fetched without certificate checks, as the scrapers always did
+        async with session.get(url, headers=headers, ssl=False, **kwargs) as response:
+            slot.done(response.status, response.headers)
+            if response.status >= 400:
+                return response.status, None
+            return response.status, await read_page_async(response, source_id, session)
+
+
+async def fetch_page_async(url, source_id, headers=None, timeout=None, session=None):
+    """
+    GET an article page through the host limiter and circuit breaker and read
+    it with the source's limits. Slow requests are hedged when hedging is
+    enabled for the source (utils/hedging.py).
+
+    Args:
+        headers (dict): Request headers
+        timeout (aiohttp.ClientTimeout): Used when a session is created (and
+            per request with the kept session in daemon mode)
+        session (aiohttp.ClientSession): Session from client_session() to reuse
+
+    Returns:
+        tuple: (HTTP status, (body bytes, charset) or None if the status is an
+        error or the body was aborted)
+
+    Raises:
+        HostUnavailable: Circuit open or host paused for too long
+    """
+    async def attempt(acquired):
+        if session is not None:
+            return await _get_page(session, url, source_id, headers, acquired)
+        if warm.enabled():
+            return await _get_page(kept_client_session(), url, source_id, headers, acquired, timeout)
+        async with client_session(timeout=timeout) as own:
+            return await _get_page(own, url, source_id, headers, acquired)
+    return await hedged(attempt, url, source_id)
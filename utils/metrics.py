@@ -0,0 +1,122 @@
+"""Lightweight per-run metrics.
+
+Counters are kept per scope (a source id such as ``'nhk'`` or a host such as
+``'www3.nhk.or.jp'``) inside each scraper process and written to
+``output/metrics/<script>.json`` when the process exits. ``main.py`` merges
+those files into ``output/run_report.json`` once the scrapers are done.
+"""
+
+import atexit
+import json
+import os
+import sys
+import threading
+
+METRICS_DIR = os.path.join('output', 'metrics')
+REPORT_FILE = os.path.join('output', 'run_report.json')
+
+_lock = threading.Lock()
+_counters = {}
+_registered = False
+
+
+def _run_name():
+    name = os.path.splitext(os.path.basename(sys.argv[0] or ''))[0]
+    return name or f'pid{os.getpid()}'
+
+
+def incr(scope, key, value=1):
+    """Add value to the counter key within scope."""
+    global _registered
+    with _lock:
+        bucket = _counters.setdefault(scope, {})
+        bucket[key] = bucket.get(key, 0) + value
+        if not _registered:
+            atexit.register(flush)
+            _registered = True
+
+
+def gauge(scope, key, value):
+    """Set key within scope to value (a level such as a size, not a count)."""
+    global _registered
+    with _lock:
+        _counters.setdefault(scope, {})[key] = value
+        if not _registered:
+            atexit.register(flush)
+            _registered = True
+
+
+def get(scope, key, default=0):
+    with _lock:
+        return _counters.get(scope, {}).get(key, default)
+
+
+def snapshot():
+    """Copy of all counters, {scope: {key: value}}."""
+    with _lock:
+        return {scope: dict(bucket) for scope, bucket in _counters.items()}
+
+
+def flush(name=None):
+    """Write this process' counters to output/metrics/<name>.json."""
+    data = snapshot()
+    if not data:
+        return None
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        path = os.path.join(METRICS_DIR, f'{name or _run_name()}.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        return path
+    except Exception as e:
+        print(f"Warning: could not write metrics: {e}")
+        return None
+
+
+def reset_reports():
+    """Remove metrics left by a previous run."""
+    if not os.path.isdir(METRICS_DIR):
+        return
+    for name in os.listdir(METRICS_DIR):
+        if name.endswith('.json'):
+            try:
+                os.remove(os.path.join(METRICS_DIR, name))
+            except OSError:
+                pass
+
+
+def write_run_report():
+    """Merge all per-process metrics into output/run_report.json and print them."""
+    report = {}
+    if os.path.isdir(METRICS_DIR):
+        for name in sorted(os.listdir(METRICS_DIR)):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(METRICS_DIR, name), 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except Exception as e:
+                print(f"Warning: could not read metrics {name}: {e}")
+                continue
+            for scope, bucket in data.items():
+                merged = report.setdefault(scope, {})
+                for key, value in bucket.items():
+                    merged[key] = merged.get(key, 0) + value
+
+    if not report:
+        return report
+
+    os.makedirs(os.path.dirname(REPORT_FILE), exist_ok=True)
+    with open(REPORT_FILE, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print("\nRun report:")
+    for scope in sorted(report):
+        values = ', '.join(f"{k}={_fmt(v)}" for k, v in sorted(report[scope].items()))
+        print(f"  {scope}: {values}")
+    print(f"Run report saved to: {REPORT_FILE}")
+    return report
+
+
+def _fmt(value):
+    return f"{value:.1f}" if isinstance(value, float) else str(value)
@@ -0,0 +1,191 @@
+"""Near-duplicate article detection (MinHash with banded LSH).
+
+Wire copy travels: Kyodo stories reappear in Mainichi, NPR and CBS run the
+same AP text. Exact hashes miss those copies (different byline, a trimmed
+paragraph), so each body is reduced to its set of shingles (word 3-grams;
+character 4-grams for Japanese, which has no spaces) and two bodies whose
+sets overlap by at least ``THRESHOLD`` (Jaccard similarity) are
+near-duplicates.
+
+The sets are compared through MinHash signatures: ``PERMUTATIONS`` hash
+functions, each keeping its smallest value over the shingles; the share of
+positions where two signatures agree estimates the Jaccard similarity. All of
+it is vectorized with NumPy: tokens (words, or characters for Japanese)
+become integer ids, the shingle hashes are mixed from the ids of k
+consecutive tokens as whole vectors, and the permutations are one
+broadcast multiply-add and a column minimum. (SimHash was tried first; at 64
+bits a byline and dateline added to a short wire story moved more bits than
+separate the closest unrelated stories.)
+
+Lookups avoid comparing every pair: the signature is cut into ``BANDS``
+bands of ``ROWS`` values and an ``LSHIndex`` keeps one bucket per band value.
+Articles sharing a bucket are candidates, confirmed by their estimated
+similarity. A pair with similarity s shares some band with probability
+1 - (1 - s^ROWS)^BANDS: above 0.99 at the threshold, below 0.02 at 0.2.
+
+Used by the article store (each stored article is checked against recent
+ones, utils/store.py) and by main.py, which collapses near-duplicates on the
+combined region page.
+"""
+
+import re
+import zlib
+
+import numpy as np
+
+PERMUTATIONS = 128
+BANDS = 32
+ROWS = PERMUTATIONS // BANDS
+THRESHOLD = 0.6
+# Bodies with fewer shingles than this get no signature (too short to compare)
+MIN_SHINGLES = 20
+SHINGLE_WORDS = 3
+SHINGLE_CHARS = 4
+
+_rng = np.random.default_rng(20240611)
+# Odd multipliers and offsets of the hash permutations, fixed so stored signatures stay comparable
+_PERM_A = _rng.integers(1, 1 << 63, PERMUTATIONS, dtype=np.uint64) | np.uint64(1)
+_PERM_B = _rng.integers(0, 1 << 63, PERMUTATIONS, dtype=np.uint64)
+_WORD = re.compile(r'\w+')
+# Hiragana, katakana (incl. half-width), CJK ideographs and Hangul
+_CJK = re.compile('[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff66-\uff9f\uac00-\ud7af]')
+
+
+def _mix(x):
+    # splitmix64 finalizer; uint64 arithmetic wraps
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xbf58476d1ce4e5b9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94d049bb133111eb)
+    return x ^ (x >> np.uint64(31))
+
+
+def _tokens(text):
+    """Token ids of text and the shingle length: characters when it is mostly CJK, words otherwise."""
+    if len(_CJK.findall(text[:400])) * 3 > min(len(text), 400):
+        chars = ''.join(_WORD.findall(text))
+        return np.frombuffer(chars.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64), SHINGLE_CHARS
+    # crc32 is stable across processes (Python's hash() is salted)
+    words = _WORD.findall(text.lower())
+    return (np.fromiter((zlib.crc32(w.encode('utf-8')) for w in words), dtype=np.uint64, count=len(words)),
+            SHINGLE_WORDS)
+
+
+def shingle_hashes(text):
+    """Distinct 64-bit hashes of the text's shingles."""
+    if not text:
+        return np.empty(0, dtype=np.uint64)
+    ids, k = _tokens(text)
+    n = len(ids) - k + 1
+    if n <= 0:
+        return np.empty(0, dtype=np.uint64)
+    acc = np.zeros(n, dtype=np.uint64)
+    for j in range(k):
+        acc = _mix(acc ^ ids[j:j + n])
+    return np.unique(acc)
+
+
+def signatures(texts):
+    """
+    MinHash signatures of texts.
+
+    Returns:
+        list: uint32 arrays of PERMUTATIONS values, None for texts too short to compare
+    """
+    result = []
+    for text in texts:
+        hashes = shingle_hashes(text)
+        if len(hashes) < MIN_SHINGLES:
+            result.append(None)
+            continue
+        # One column per permutation; the high 32 bits of a*h + b are the best mixed
+        permuted = (hashes[:, None] * _PERM_A + _PERM_B) >> np.uint64(32)
+        result.append(permuted.min(axis=0).astype(np.uint32))
+    return result
+
+
+def signature(text):
+    return signatures([text])[0]
+
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return float(np.count_nonzero(a == b)) / len(a)
+
+
+def to_blob(sig):
+    """Signature as stored in SQLite."""
+    return None if sig is None else sig.tobytes()
+
+
+def from_blob(value):
+    return None if value is None else np.frombuffer(value, dtype=np.uint32)
+
+
+class LSHIndex:
+    """Signatures bucketed by band, for near-duplicate lookups without pairwise comparison."""
+
+    def __init__(self, threshold=THRESHOLD):
+        self.threshold = threshold
+        self.buckets = {}
+        self.signatures = {}
+        # Last time each key was added, for expire()
+        self.seen = {}
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def _bands(self, sig):
+        return [(band, sig[band * ROWS:(band + 1) * ROWS].tobytes()) for band in range(BANDS)]
+
+    def add(self, key, sig, seen=None):
+        """Index sig under key (a key already indexed keeps its signature; seen is updated)."""
+        if seen is not None and (sig is not None or key in self.signatures):
+            self.seen[key] = seen
+        if sig is None or key in self.signatures:
+            return
+        self.signatures[key] = sig
+        for band in self._bands(sig):
+            self.buckets.setdefault(band, []).append(key)
+
+    def expire(self, before):
+        """Drop the keys last added before this time (keys added without a time stay)."""
+        old = [key for key, seen in self.seen.items() if seen < before]
+        for key in old:
+            del self.seen[key]
+            for band in self._bands(self.signatures.pop(key)):
+                bucket = self.buckets[band]
+                bucket.remove(key)
+                if not bucket:
+                    del self.buckets[band]
+        return len(old)
+
+    def query(self, sig):
+        """Keys whose estimated similarity reaches the threshold, most similar first."""
+        if sig is None:
+            return []
+        candidates = set()
+        for band in self._bands(sig):
+            candidates.update(self.buckets.get(band, ()))
+        matches = [(similarity(sig, self.signatures[k]), k) for k in candidates]
+        return [k for s, k in sorted(matches, key=lambda m: -m[0]) if s >= self.threshold]
+
+
+def collapse(texts):
+    """
+    Group near-duplicate texts, keeping the first of each group.
+
+    Returns:
+        list: for each text, the index of the earlier text it duplicates, or
+        None if it is the first of its kind
+    """
+    index = LSHIndex()
+    duplicate_of = []
+    for i, sig in enumerate(signatures(texts)):
+        matches = index.query(sig)
+        if matches:
+            duplicate_of.append(matches[0])
+        else:
+            duplicate_of.append(None)
+            index.add(i, sig)
+    return duplicate_of
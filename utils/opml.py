@@ -0,0 +1,59 @@
+"""OPML feed lists for the generic RSS driver.
+
+A region in config/sources.json can list ``"opml": ["config/feeds/<file>.opml"]``;
+every ``<outline>`` with an ``xmlUrl`` becomes a feed source run by
+utils/rss_driver.py. Nested outlines (folders) are flattened.
+
+Outline attributes used: ``xmlUrl`` (required), ``text``/``title``,
+``htmlUrl``, ``language`` and the non-standard ``id`` (source id; derived from
+the title or the feed host otherwise).
+"""
+
+import re
+import xml.etree.ElementTree as ET
+from urllib.parse import urlparse
+
+
+def slugify(value):
+    """Lower-case ASCII id usable in file names, e.g. 'Le Monde - Planète' -> 'le_monde_plan_te'."""
+    slug = re.sub(r'[^a-z0-9]+', '_', value.lower()).strip('_')
+    return slug
+
+
+def feed_id(spec, url):
+    """Source id of a feed: its id, else its title, else its address, slugified."""
+    explicit = spec.get('id')
+    if explicit:
+        return slugify(explicit)
+    slug = slugify(spec.get('title') or spec.get('text') or '')
+    if not slug:
+        # Titles in other scripts slugify to nothing: use the feed address
+        parsed = urlparse(url)
+        slug = slugify(parsed.netloc + parsed.path)
+    return slug
+
+
+def read_opml(path):
+    """
+    Feed specs listed in an OPML file.
+
+    Returns:
+        list: dicts with id, url, title, site and language (may be None), in
+        document order; duplicate URLs are skipped
+    """
+    tree = ET.parse(path)
+    feeds = []
+    seen = set()
+    for outline in tree.iter('outline'):
+        url = (outline.get('xmlUrl') or '').strip()
+        if not url or url in seen:
+            continue
+        seen.add(url)
+        feeds.append({
+            'id': feed_id(outline, url),
+            'url': url,
+            'title': outline.get('title') or outline.get('text') or url,
+            'site': outline.get('htmlUrl'),
+            'language': outline.get('language'),
+        })
+    return feeds
@@ -0,0 +1,162 @@
+"""Byte-level pre-trimming of raw HTML before any DOM is built.
+
+``PreTrimmer`` scans the page once, chunk by chunk, and drops the payload of
+``<script>``, ``<style>``, ``<svg>`` and ``<noscript>`` elements (often most of
+a news page's bytes); a self-closing one (``<svg .../>``) is dropped alone. ``pretrim_html`` additionally slices the page to the
+content container named by the source's ``trim_container`` rule, keeping the
+``<head>`` so that ``<meta charset>`` and ``<title>`` survive.
+"""
+
+import re
+import time
+
+from utils import metrics
+
+_DROP_OPEN = re.compile(rb'<(script|style|svg|noscript)\b', re.I)
+_DROP_CLOSE = {
+    tag: re.compile(rb'</' + tag + rb'\s*>', re.I)
+    for tag in (b'script', b'style', b'svg', b'noscript')
+}
+# Longest partial tag ('</noscript >') that may straddle two chunks
+_HOLD_BACK = 12
+
+_HEAD = re.compile(rb'<head\b.*?</head\s*>', re.I | re.S)
+_TAG_NAME = re.compile(rb'<([a-zA-Z][a-zA-Z0-9]*)')
+
+# Don't trust a container slice smaller than this
+MIN_CONTAINER_BYTES = 512
+
+
+class PreTrimmer:
+    """Streaming remover of script/style/svg/noscript payloads."""
+
+    def __init__(self):
+        self._buf = b''
+        self._skip_tag = None
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def feed(self, chunk):
+        """Consume a chunk of raw bytes and return the trimmed bytes that are final."""
+        self.bytes_in += len(chunk)
+        buf = self._buf + chunk
+        out = []
+        while buf:
+            if self._skip_tag is not None:
+                m = _DROP_CLOSE[self._skip_tag].search(buf)
+                if not m:
+                    buf = buf[-_HOLD_BACK:]
+                    break
+                buf = buf[m.end():]
+                self._skip_tag = None
+                continue
+            m = _DROP_OPEN.search(buf)
+            if not m or m.end() == len(buf):
+                # Keep a tail in case a tag name is split across chunks
+                cut = max(0, len(buf) - _HOLD_BACK) if not m else m.start()
+                out.append(buf[:cut])
+                buf = buf[cut:]
+                break
+            out.append(buf[:m.start()])
+            end = buf.find(b'>', m.end())
+            if end < 0:
+                # Opening tag split across chunks: wait for its end
+                buf = buf[m.start():]
+                break
+            buf_end = buf[end - 1:end]
+            buf = buf[end + 1:]
+            if buf_end == b'/':
+                # Self-closing (<svg .../>, common for icons; lxml reads <script/> the same way)
+                continue
+            self._skip_tag = m.group(1).lower()
+        self._buf = buf
+        data = b''.join(out)
+        self.bytes_out += len(data)
+        return data
+
+    def close(self):
+        """Flush whatever is still buffered (nothing if inside a dropped element)."""
+        data = b'' if self._skip_tag is not None else self._buf
+        self._buf = b''
+        self.bytes_out += len(data)
+        return data
+
+
+def strip_payloads(data):
+    """Remove script/style/svg/noscript payloads from a complete document."""
+    trimmer = PreTrimmer()
+    return trimmer.feed(data) + trimmer.close()
+
+
+def slice_container(data, markers):
+    """
+    Slice a page to the element containing the first marker found.
+
+    Markers are byte strings (e.g. b'id="news_textbody"'); the element is the
+    tag whose opening tag contains the marker. Returns None if no marker
+    matches or the slice is implausibly small.
+    """
+    for marker in markers:
+        idx = data.find(marker)
+        if idx < 0:
+            continue
+        start = idx if marker.startswith(b'<') else data.rfind(b'<', 0, idx)
+        name = _TAG_NAME.match(data, start) if start >= 0 else None
+        if not name:
+            continue
+        tag = re.escape(name.group(1))
+        tags = re.compile(rb'<(/?)' + tag + rb'\b[^>]*?(/?)>', re.I)
+        depth = 0
+        end = len(data)
+        for m in tags.finditer(data, start):
+            if m.group(1):
+                depth -= 1
+            elif not m.group(2):
+                depth += 1
+            if depth == 0:
+                end = m.end()
+                break
+        container = data[start:end]
+        if len(container) < MIN_CONTAINER_BYTES:
+            continue
+        head = _HEAD.search(data, 0, start)
+        return b'<html>' + (head.group(0) if head else b'') + b'<body>' + container + b'</body></html>'
+    return None
+
+
+def pretrim_html(html, rules=None, slice_to_container=True):
+    """
+    Pre-trim a raw page before parsing.
+
+    Args:
+        html (str | bytes): Raw page
+        rules (SiteRules): Source rules; trim_container markers are used for slicing
+        slice_to_container (bool): Slice to the rule's content container if found
+
+    Returns:
+        Same type as html, trimmed
+    """
+    if not html:
+        return html
+    start = time.perf_counter()
+    is_text = isinstance(html, str)
+    data = html.encode('utf-8') if is_text else html
+
+    trimmed = strip_payloads(data)
+    sliced = None
+    markers = getattr(rules, 'trim_container', None)
+    if slice_to_container and markers:
+        sliced = slice_container(trimmed, markers)
+        if sliced is not None:
+            trimmed = sliced
+
+    if rules is not None:
+        scope = rules.source_id
+        metrics.incr(scope, 'pretrim.pages')
+        metrics.incr(scope, 'pretrim.bytes_in', len(data))
+        metrics.incr(scope, 'pretrim.bytes_out', len(trimmed))
+        metrics.incr(scope, 'pretrim.ms', (time.perf_counter() - start) * 1000)
+        if sliced is not None:
+            metrics.incr(scope, 'pretrim.sliced')
+
+    return trimmed.decode('utf-8', errors='replace') if is_text else trimmed
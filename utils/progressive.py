@@ -0,0 +1,107 @@
+"""Headlines-first publishing and the headlines-only mode.
+
+With ``QUICKNEWS_PROGRESSIVE=1`` (``python main.py <region> --progressive``)
+each scraper writes its output page from RSS data alone as soon as the feed is
+parsed: title, source, publication time and the cached body or RSS summary.
+main.py re-renders ``newspaper/QuickNews_<region>.html`` whenever one of these
+pages changes, so the region page is fresh within seconds and is rewritten
+source by source as the full bodies arrive.
+
+With ``QUICKNEWS_HEADLINES=1`` (``python main.py <region> --headlines``) the
+scrapers skip every article page request and extraction and render compact
+cards from the feed metadata alone (time, thumbnail, summary), so a run takes
+about as long as the feed downloads.
+"""
+
+import html as html_lib
+import json
+import os
+
+from utils.article_cache import cached_content
+from utils.convert_to_html import convert_json_to_html
+from utils.site_rules import summary_content
+from utils.sources import source_timezone
+from utils.timestamps import get_zone
+
+PROGRESSIVE_ENV = 'QUICKNEWS_PROGRESSIVE'
+HEADLINES_ENV = 'QUICKNEWS_HEADLINES'
+
+_TRUE = ('1', 'true', 'yes', 'on')
+
+
+def progressive_enabled():
+    return os.environ.get(PROGRESSIVE_ENV, '').strip().lower() in _TRUE
+
+
+def headlines_only():
+    return os.environ.get(HEADLINES_ENV, '').strip().lower() in _TRUE
+
+
+def _time_label(article):
+    """HH:MM of the article's publication in its region's timezone, '' if unknown."""
+    if article.published is None:
+        return ''
+    tz = get_zone(source_timezone(article.source_id))
+    return article.published.astimezone(tz).strftime('%H:%M')
+
+
+def headline_content(article, rules, compact=False):
+    """
+    Body built from an article's feed fields.
+
+    The default (progressive pages) is the body supplied by the feed, the
+    cached body or else the RSS summary. compact (headlines-only mode) gives a short card instead:
+    publication time, thumbnail and summary, never a cached body.
+    """
+    if not compact:
+        # Not counted as a fallback: the body may still arrive
+        return article.content or cached_content(rules.source_id, article.url) or summary_content(article.summary)
+
+    parts = []
+    label = _time_label(article)
+    if label:
+        parts.append(f'<div class="headline-time">{label}</div>')
+    if article.image_url:
+        parts.append(f'<img class="headline-thumb" src="{html_lib.escape(article.image_url)}" alt="" loading="lazy">')
+    parts.append(summary_content(article.summary))
+    return f'<div class="headline">{"".join(parts)}</div>'
+
+
+def fill_headlines(articles, rules):
+    """Headlines-only mode: give every article its compact card as content."""
+    for article in articles:
+        article.content = headline_content(article, rules, compact=True)
+    print(f"Headlines only: {len(articles)} articles, no article pages fetched")
+    return articles
+
+
+def publish_headlines(articles, html_file, rules, title, language=None):
+    """
+    Write html_file from the RSS fields of articles (no-op unless progressive).
+
+    The page is replaced later by the scraper's normal output.
+    """
+    if not progressive_enabled() or headlines_only() or not articles:
+        return
+    items = []
+    for article in articles:
+        source = article.source or title
+        label = _time_label(article)
+        items.append({
+            'title': article.title,
+            'source': f'{source} · {label}' if label else source,
+            'content': headline_content(article, rules),
+        })
+    feed = {'title': title, 'items': items}
+    if language:
+        feed['language'] = language
+
+    json_file = os.path.splitext(html_file)[0] + '.headlines.json'
+    try:
+        os.makedirs(os.path.dirname(html_file) or '.', exist_ok=True)
+        with open(json_file, 'w', encoding='utf-8') as f:
+            json.dump(feed, f, ensure_ascii=False, indent=2)
+        convert_json_to_html(json_file, html_file)
+        print(f"Published {len(items)} headlines to {html_file}")
+    except Exception as e:
+        print(f"Warning: could not publish headlines to {html_file}: {e}")
@@ -0,0 +1,192 @@
+"""Generic driver for plain RSS/Atom sources.
+
+The bespoke scrapers all follow the same steps: parse the feed, normalise the
+publication dates to the region's last 24 hours, fetch each article page (or
+use the body carried by the feed), extract and clean the main content with the
+source's rules, fall back to the cached body or the summary, and write
+``output/<source_id>_articles.json`` / ``.html``. ``run_feeds`` does exactly
+that for every feed listed in config/sources.json or an OPML file
+(utils/sources.py), with the source id as scope for rules, limits and metrics.
+
+Hundreds of feeds run in one process with bounded resources:
+
+- at most ``feed_concurrency`` feeds (region setting, default 8) are in flight;
+  each feed's articles are written out and dropped before the next one starts;
+- article pages share one aiohttp session of at most ``MAX_CONNECTIONS``
+  sockets (``MAX_CONNECTIONS_PER_HOST`` per host, and the host limiter's own
+  per-host limits still apply);
+- feed downloads share one requests session whose pool matches the feed
+  concurrency, and each feed takes at most its ``max_items`` newest items.
+"""
+
+import asyncio
+import os
+
+import aiohttp
+from requests.adapters import HTTPAdapter
+
+from utils import metrics, warm
+from utils.article import Article, save_articles
+from utils.article_cache import fallback_content, remember
+from utils.circuit_breaker import HostUnavailable
+from utils.deadline import deadline_passed, gather_until_deadline
+from utils.extractor import extract_main_content, get_extractor
+from utils.feeds import feed_body, page_or_feed_body, parse_feed
+from utils.http_fetch import client_session, fetch_page_async, http_session
+from utils.progressive import fill_headlines, headlines_only, publish_headlines
+from utils.site_rules import clean_html, get_rules, text_length
+from utils.timestamps import day_window, entry_timestamp, get_zone
+
+MAX_CONNECTIONS = 32
+MAX_CONNECTIONS_PER_HOST = 4
+ARTICLE_TIMEOUT = 25
+ARTICLE_ATTEMPTS = 2
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/127.0.0.0 Safari/537.36'
+
+
+def entry_image(entry):
+    for media in entry.get('media_content') or entry.get('media_thumbnail') or []:
+        if media.get('url'):
+            return media['url']
+    for link in entry.get('links', []):
+        if link.get('rel') == 'enclosure' and 'image' in link.get('type', '') and link.get('href'):
+            return link['href']
+    return ''
+
+
+def feed_articles(source, tz, session=None, language=None):
+    """Articles of a feed's entries from the last 24 hours, newest first."""
+    rules = get_rules(source.source_id)
+    since, now = day_window(tz)
+
+    feed = parse_feed(source.feed, source.source_id, session, since=since, tz=tz)
+    print(f"{source.source_id}: feed status {feed.get('status')}, {len(feed.entries)} entries")
+    if not feed.entries and (feed.get('status', 200) >= 400 or feed.get('bozo')):
+        # Keep the previous output rather than replacing it with an empty page
+        raise RuntimeError(f"feed unavailable (status {feed.get('status')})")
+    articles = []
+    for entry in feed.entries:
+        link = entry.get('link', '')
+        pub_date = entry_timestamp(entry, tz)
+        if not link or pub_date is None or pub_date < since or pub_date > now:
+            continue
+        articles.append(Article(
+            entry.get('title', 'No title'), link, source.title, source.source_id, pub_date, language,
+            summary=entry.get('summary', ''),
+            guid=entry.get('id', ''),
+            content=feed_body(entry, rules),  # Full body from the feed, else fetched
+            image_url=entry_image(entry),
+            author=entry.get('author', ''),
+        ))
+    articles.sort(key=lambda a: a.published, reverse=True)
+    return articles[:source.max_items]
+
+
+async def fetch_article_content(source, url, session, language=None):
+    """Fetch and extract an article page with the source's rules, '' on failure."""
+    rules = get_rules(source.source_id)
+    headers = {'User-Agent': USER_AGENT}
+    if language:
+        headers['Accept-Language'] = f'{language},en;q=0.5'
+    for attempt in range(ARTICLE_ATTEMPTS):
+        try:
+            status, page = await fetch_page_async(url, source.source_id, headers, session=session)
+            if status == 429 or status >= 500:
+                continue
+            if status >= 400:
+                # Gone, forbidden or not found: the next attempt would get the same
+                print(f"Error fetching article: HTTP {status} - {url}")
+                return ''
+            if page is None:
+                # Oversized or non-HTML; retrying would not help
+                return ''
+            body, charset = page
+            content = extract_main_content(body, get_extractor(source.source_id), language, source.source_id, charset)
+            cleaned = clean_html(content or '', rules)
+            if text_length(cleaned) >= rules.min_text_length:
+                return cleaned
+        except HostUnavailable as e:
+            print(f"Skipping {url}: {e}")
+            return ''
+        except Exception as e:
+            print(f"Error fetching article (attempt {attempt+1}) {url}: {e}")
+    return ''
+
+
+async def run_source(source, tz, session, feed_session, language=None):
+    """One feed end to end; returns the number of articles written."""
+    rules = get_rules(source.source_id)
+    language = source.language or language
+    # feedparser and the requests download block: keep them off the event loop
+    articles = await asyncio.to_thread(feed_articles, source, tz, feed_session, language)
+    publish_headlines(articles, source.output, rules, source.title, language)
+    if headlines_only():
+        articles = fill_headlines(articles, rules)
+    else:
+        tasks = [page_or_feed_body(a, fetch_article_content, source, a.url, session, language) for a in articles]
+        contents = await gather_until_deadline(tasks, source.source_id)
+        for article, content in zip(articles, contents):
+            if isinstance(content, str) and content.strip():
+                remember(source.source_id, article.url, content, article.guid)
+            else:
+                content = fallback_content(article.url, article.summary, rules)
+            article.content = content
+        articles = [a for a in articles if a.content]
+    json_file = os.path.splitext(source.output)[0] + '.json'
+    save_articles(articles, json_file, source.output, source.title, source.site or source.feed,
+                  f'Latest news from {source.title}', language)
+    metrics.incr(source.source_id, 'driver.articles', len(articles))
+    print(f"{source.source_id}: saved {len(articles)} articles to {source.output}")
+    return len(articles)
+
+
+def _article_session():
+    connector = aiohttp.TCPConnector(limit=MAX_CONNECTIONS, limit_per_host=MAX_CONNECTIONS_PER_HOST)
+    return client_session(connector=connector, timeout=aiohttp.ClientTimeout(total=ARTICLE_TIMEOUT))
+
+
+def _feed_session(pool_size):
+    session = http_session()
+    if not warm.enabled():
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+    return session
+
+
+async def run_feeds(sources, region):
+    """
+    Run the given feed sources of a region with bounded concurrency.
+
+    Feeds not started by the region deadline keep their previous output.
+
+    Returns:
+        dict: source id -> number of articles written (None if it failed or was skipped)
+    """
+    tz = get_zone(region.timezone)
+    semaphore = asyncio.Semaphore(max(region.feed_concurrency, 1))
+    feed_session = _feed_session(region.feed_concurrency)
+    if warm.enabled():
+        session = warm.get('aiohttp-rss-driver', _article_session, lambda s: s.close())
+    else:
+        session = _article_session()
+    results = {}
+
+    async def run_one(source):
+        async with semaphore:
+            if deadline_passed():
+                print(f"{source.source_id}: deadline passed, keeping its last output")
+                return
+            try:
+                results[source.source_id] = await run_source(source, tz, session, feed_session, region.language)
+            except Exception as e:
+                print(f"Error running feed {source.source_id}: {e}")
+                results[source.source_id] = None
+
+    try:
+        await asyncio.gather(*(run_one(s) for s in sources))
+    finally:
+        if not warm.enabled():
+            await session.close()
+            feed_session.close()
+    return results
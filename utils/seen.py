@@ -0,0 +1,163 @@
+"""Entries each source has already processed, across runs.
+
+A scraper that extracted an article's body in an earlier run does not need
+to fetch its page again: ``article_cache.seen_content`` reuses the body kept
+then. Every processed entry is recorded by its canonical URL and, when the
+feed has one, its GUID (``guid:<id>``), in the article store's ``seen``
+table, which grows with the history of every feed.
+
+Looking each feed entry up in that table would cost a disk read per entry,
+so the lookups go to an in-memory Bloom filter per source instead: no false
+negatives, so a new entry (most of a feed, most of the time) is answered
+without touching disk; a false positive, at the rate the filter is sized
+for, only costs a cache or store lookup that finds no body, after which the
+page is fetched as usual.
+
+Each filter is sized from the source's rules (``seen_capacity``,
+``seen_error_rate``, utils/site_rules.py) and saved in the store's
+``seen_filters`` table when the process exits (or by the daemon with its
+state), so a run starts with one read. It is rebuilt from the ``seen`` table
+when missing, when the rules changed, or when it holds more entries than it
+was sized for (then with room for twice as many). ``seen.bytes``,
+``seen.items`` and ``seen.fpr`` (the false-positive rate estimated from the
+share of bits set) are reported per source with the run metrics.
+"""
+
+import atexit
+import hashlib
+import math
+import threading
+
+from utils import metrics, store
+from utils.site_rules import get_rules
+from utils.urls import canonical_url
+
+_lock = threading.Lock()
+_filters = {}
+_dirty = set()
+_registered = False
+
+
+class BloomFilter:
+    """Set membership with false positives (at about error_rate) and no false negatives."""
+
+    def __init__(self, capacity, error_rate, bits=None, items=0):
+        self.capacity = max(int(capacity), 1)
+        self.error_rate = error_rate
+        # Optimal size and number of hash functions for capacity entries at error_rate
+        size = math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.size = (size + 7) // 8 * 8
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray(bits) if bits is not None and len(bits) == self.size // 8 else bytearray(self.size // 8)
+        self.items = items if bits is not None else 0
+
+    def _positions(self, key):
+        # Double hashing: hash i is h1 + i * h2
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def __contains__(self, key):
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+    def add(self, key):
+        """Add key; returns False if it (probably) was there already."""
+        new = False
+        for p in self._positions(key):
+            mask = 1 << (p & 7)
+            if not self.bits[p >> 3] & mask:
+                self.bits[p >> 3] |= mask
+                new = True
+        if new:
+            self.items += 1
+        return new
+
+    @property
+    def nbytes(self):
+        return len(self.bits)
+
+    def false_positive_rate(self):
+        """Current false-positive rate: share of bits set, to the number of hashes."""
+        set_bits = int.from_bytes(self.bits, 'little').bit_count()
+        return (set_bits / self.size) ** self.hashes
+
+
+def keys(url, guid=None):
+    """Keys recorded for an entry: its canonical URL and GUID."""
+    result = []
+    if url:
+        result.append(canonical_url(url))
+    if guid:
+        result.append(f'guid:{guid}')
+    return result
+
+
+def _load(source_id):
+    rules = get_rules(source_id)
+    capacity, error_rate = rules.seen_capacity, rules.seen_error_rate
+    stored = store.seen_filter(source_id)
+    if stored is not None:
+        stored_capacity, stored_error_rate, items, bits = stored
+        if stored_capacity >= capacity and stored_error_rate == error_rate and items <= stored_capacity:
+            return BloomFilter(stored_capacity, stored_error_rate, bits, items)
+    recorded = store.seen_keys(source_id)
+    bloom = BloomFilter(max(capacity, 2 * len(recorded)), error_rate)
+    for key in recorded:
+        bloom.add(key)
+    if recorded:
+        metrics.incr(source_id, 'seen.rebuilt')
+        _dirty.add(source_id)
+    return bloom
+
+
+def _filter(source_id):
+    global _registered
+    bloom = _filters.get(source_id)
+    if bloom is None:
+        bloom = _filters[source_id] = _load(source_id)
+        # Reported before save() is registered, so the metrics are written after it at exit
+        metrics.gauge(source_id, 'seen.bytes', bloom.nbytes)
+        if not _registered:
+            atexit.register(save)
+            _registered = True
+    return bloom
+
+
+def is_seen(source_id, url, guid=None):
+    """True if the source (probably) processed this entry in this or an earlier run."""
+    entry_keys = keys(url, guid)
+    with _lock:
+        bloom = _filter(source_id)
+        seen = any(key in bloom for key in entry_keys)
+    metrics.incr(source_id, 'seen.hits' if seen else 'seen.misses')
+    return seen
+
+
+def mark_seen(source_id, url, guid=None):
+    """Record an entry whose body was extracted."""
+    entry_keys = keys(url, guid)
+    with _lock:
+        bloom = _filter(source_id)
+        if [key for key in entry_keys if bloom.add(key)]:
+            _dirty.add(source_id)
+    store.record_seen(source_id, entry_keys)
+
+
+def save():
+    """Store the filters changed in this process and report their size and error rate."""
+    with _lock:
+        dirty = list(_dirty)
+        _dirty.clear()
+        for source_id in dirty:
+            bloom = _filters[source_id]
+            store.save_seen_filter(source_id, bloom.capacity, bloom.error_rate, bloom.items, bloom.bits)
+        sizes = [(source_id, bloom.nbytes, bloom.items, bloom.false_positive_rate())
+                 for source_id, bloom in _filters.items()]
+    for source_id, nbytes, items, fpr in sizes:
+        metrics.gauge(source_id, 'seen.bytes', nbytes)
+        metrics.gauge(source_id, 'seen.items', items)
+        metrics.gauge(source_id, 'seen.fpr', fpr)
+    if dirty:
+        store.flush()
@@ -0,0 +1,343 @@
+"""Declarative per-site extraction rules.
+
+Each source has a JSON rule file in ``config/rules/<source_id>.json``. The
+files are loaded and compiled once at import time into ``SiteRules`` objects
+(precompiled CSS selectors, class-matching regexes and tag sets) which are
+applied by the common ``clean_html`` and ``select_content`` routines.
+
+Supported keys (all optional):
+
+- ``drop_tags``: tag names removed with their content
+- ``drop_classes``: exact class names removed on any tag
+- ``drop_class_substrings``: ``[{"tags": [...], "patterns": [...]}]`` removes
+  elements whose class attribute contains any pattern (case-insensitive)
+- ``drop_selectors``: CSS selectors removed with their content
+- ``drop_text``: ``{"tags": [...], "values": [...]}`` removes elements whose
+  whole text equals one of the values (case-folded), e.g. ad labels
+- ``unwrap_tags``: tag names replaced by their children
+- ``paragraph_class``: class added to every non-empty ``<p>``
+- ``strip_attributes``: ``"empty"`` (drop empty attributes) or ``"all"``
+- ``remove_empty``: ``"once"`` or ``"repeat"`` (until nothing is left to remove)
+- ``remove_empty_tags``: restrict empty-element removal to these tags
+- ``drop_figures_without_media``: remove ``<figure>`` without img/video
+- ``prepend_selectors``: elements copied from the original page to the top
+- ``content_selectors``: containers tried in order by ``select_content``
+- ``content_tags``: block tags collected from the container (default ``["p"]``)
+- ``min_paragraph_length``: shortest block kept by ``select_content``
+- ``paragraph_exclude``: blocks containing any of these strings are skipped
+- ``min_content_length``: shortest acceptable ``select_content`` result
+- ``fallback_to_page`` / ``page_fallback_min_length``: collect blocks from the
+  whole page when no container matches
+- ``boilerplate_text``: strings marking a body as boilerplate-only
+- ``min_text_length``: shortest body text accepted before falling back
+- ``trim_container``: markers (e.g. ``id="news_textbody"``) of the content
+  container; raw pages are sliced to it before parsing (see utils/pretrim.py)
+- ``max_body_bytes``: largest article response read (default 4 MB)
+- ``max_feed_bytes``: largest feed response read (default 8 MB)
+- ``content_types``: accepted article Content-Types (default HTML/XHTML)
+- ``default_charset``: charset assumed when a page declares none (default UTF-8)
+- ``feed_body_min_length``: shortest body text of a feed entry's own content
+  used instead of fetching the page (default 500, ``0`` disables feed bodies)
+- ``feed_body_min_paragraphs``: fewest ``<p>`` blocks such a body needs (default 3)
+- ``feed_body_truncation``: endings marking a feed body as an excerpt
+- ``poll_min_interval`` / ``poll_max_interval``: bounds in seconds of the
+  daemon's adaptive feed polling (defaults 120 and 3600, see
+  utils/feed_schedule.py)
+- ``stream_feed``: read the feed with the streaming lxml reader when the
+  scraper only wants the first entries or those since a time (default true,
+  see utils/feed_reader.py)
+- ``feed_sorted``: the feed lists its entries newest first, so reading may
+  stop at the first entry older than the scraper's window (default false)
+- ``seen_capacity`` / ``seen_error_rate``: entries the source's seen-entry
+  filter is sized for and its false-positive rate at that size (defaults
+  50000 and 0.001, see utils/seen.py)
+"""
+
+import html as html_lib
+import json
+import os
+import re
+
+import soupsieve
+from bs4 import BeautifulSoup
+
+from utils import metrics
+from utils.pretrim import strip_payloads
+
+# Fetch limits used by utils/http_fetch.py unless a rule file overrides them
+DEFAULT_MAX_BODY_BYTES = 4 * 1024 * 1024
+DEFAULT_MAX_FEED_BYTES = 8 * 1024 * 1024
+DEFAULT_CONTENT_TYPES = ['text/html', 'application/xhtml+xml']
+
+# Feed entry bodies good enough to skip the page fetch (utils/feeds.py)
+DEFAULT_FEED_BODY_MIN_LENGTH = 500
+DEFAULT_FEED_BODY_MIN_PARAGRAPHS = 3
+DEFAULT_FEED_BODY_TRUNCATION = ['…', '...', '[…]', '[...]', 'Continue reading', 'Read more', 'Lire la suite', '続きを読む']
+
+# Bounds of the daemon's per-feed poll interval (utils/feed_schedule.py)
+DEFAULT_POLL_MIN_INTERVAL = 120
+DEFAULT_POLL_MAX_INTERVAL = 3600
+
+# Sizing of each source's Bloom filter of processed entries (utils/seen.py)
+DEFAULT_SEEN_CAPACITY = 50000
+DEFAULT_SEEN_ERROR_RATE = 0.001
+
+RULES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config', 'rules')
+
+
+def _substring_regex(patterns):
+    return re.compile('|'.join(re.escape(p) for p in patterns), re.I) if patterns else None
+
+
+class SiteRules:
+    """Compiled extraction rules for a single source."""
+
+    def __init__(self, source_id, spec):
+        self.source_id = source_id
+        self.drop_tags = list(spec.get('drop_tags', []))
+        self.drop_classes = list(spec.get('drop_classes', []))
+        self.drop_class_substrings = [
+            (list(group.get('tags', [])) or True, _substring_regex(group.get('patterns', [])))
+            for group in spec.get('drop_class_substrings', [])
+            if group.get('patterns')
+        ]
+        self.drop_selectors = [soupsieve.compile(s) for s in spec.get('drop_selectors', [])]
+        drop_text = spec.get('drop_text') or {}
+        self.drop_text_tags = list(drop_text.get('tags', []))
+        self.drop_text_values = frozenset(v.casefold() for v in drop_text.get('values', []))
+        self.unwrap_tags = list(spec.get('unwrap_tags', []))
+        self.paragraph_class = spec.get('paragraph_class')
+        self.strip_attributes = spec.get('strip_attributes')
+        self.remove_empty = spec.get('remove_empty')
+        self.remove_empty_tags = spec.get('remove_empty_tags') or True
+        self.drop_figures_without_media = bool(spec.get('drop_figures_without_media'))
+        self.prepend_selectors = [soupsieve.compile(s) for s in spec.get('prepend_selectors', [])]
+        self.content_selectors = [soupsieve.compile(s) for s in spec.get('content_selectors', [])]
+        self.content_tags = list(spec.get('content_tags', ['p']))
+        self.min_paragraph_length = int(spec.get('min_paragraph_length', 1))
+        self.paragraph_exclude = _substring_regex(spec.get('paragraph_exclude', []))
+        self.min_content_length = int(spec.get('min_content_length', 0))
+        self.fallback_to_page = bool(spec.get('fallback_to_page'))
+        self.page_fallback_min_length = int(spec.get('page_fallback_min_length', self.min_content_length))
+        self.boilerplate_text = list(spec.get('boilerplate_text', []))
+        self.min_text_length = int(spec.get('min_text_length', 0))
+        self.trim_container = [m.encode('utf-8') for m in spec.get('trim_container', [])]
+        self.max_body_bytes = int(spec.get('max_body_bytes', DEFAULT_MAX_BODY_BYTES))
+        self.max_feed_bytes = int(spec.get('max_feed_bytes', DEFAULT_MAX_FEED_BYTES))
+        self.content_types = frozenset(t.lower() for t in spec.get('content_types', DEFAULT_CONTENT_TYPES))
+        self.default_charset = spec.get('default_charset', 'utf-8')
+        self.feed_body_min_length = int(spec.get('feed_body_min_length', DEFAULT_FEED_BODY_MIN_LENGTH))
+        self.feed_body_min_paragraphs = int(spec.get('feed_body_min_paragraphs', DEFAULT_FEED_BODY_MIN_PARAGRAPHS))
+        self.feed_body_truncation = tuple(spec.get('feed_body_truncation', DEFAULT_FEED_BODY_TRUNCATION))
+        self.poll_min_interval = float(spec.get('poll_min_interval', DEFAULT_POLL_MIN_INTERVAL))
+        self.poll_max_interval = float(spec.get('poll_max_interval', DEFAULT_POLL_MAX_INTERVAL))
+        self.stream_feed = bool(spec.get('stream_feed', True))
+        self.feed_sorted = bool(spec.get('feed_sorted', False))
+        self.seen_capacity = int(spec.get('seen_capacity', DEFAULT_SEEN_CAPACITY))
+        self.seen_error_rate = float(spec.get('seen_error_rate', DEFAULT_SEEN_ERROR_RATE))
+
+    def __repr__(self):
+        return f"SiteRules({self.source_id!r})"
+
+
+def load_rules(rules_dir=RULES_DIR):
+    """Load and compile every rule file in rules_dir, keyed by source id."""
+    rules = {}
+    if not os.path.isdir(rules_dir):
+        return rules
+    for name in sorted(os.listdir(rules_dir)):
+        if not name.endswith('.json'):
+            continue
+        source_id = name[:-len('.json')]
+        try:
+            with open(os.path.join(rules_dir, name), 'r', encoding='utf-8') as f:
+                rules[source_id] = SiteRules(source_id, json.load(f))
+        except Exception as e:
+            print(f"Error loading site rules {name}: {e}")
+    return rules
+
+
+# Compiled once per process
+RULES = load_rules()
+
+
+def get_rules(source_id):
+    """Return compiled rules for a source (empty rules if none are defined)."""
+    rules = RULES.get(source_id)
+    if rules is None:
+        rules = RULES[source_id] = SiteRules(source_id, {})
+    return rules
+
+
+def text_length(html):
+    """Length of the stripped visible text of an HTML fragment."""
+    if not html:
+        return 0
+    return len(BeautifulSoup(html, 'html.parser').get_text().strip())
+
+
+def is_trivial(html, rules):
+    """True when a body is missing, shorter than min_text_length or boilerplate only."""
+    if not html:
+        return True
+    txt = BeautifulSoup(html, 'html.parser').get_text(separator=' ').strip()
+    if len(txt) < rules.min_text_length:
+        return True
+    return any(marker in txt for marker in rules.boilerplate_text)
+
+
+def clean_html(html_content, rules, page_html=None):
+    """
+    Clean an article HTML fragment with a source's compiled rules.
+
+    Args:
+        html_content (str): Extracted article HTML
+        rules (SiteRules): Compiled rules for the source
+        page_html (str): Original page, needed only for prepend_selectors
+
+    Returns:
+        str: Cleaned HTML
+    """
+    if not html_content:
+        return html_content
+
+    soup = BeautifulSoup(html_content, 'html.parser')
+
+    if rules.drop_tags:
+        for el in soup.find_all(rules.drop_tags):
+            el.decompose()
+
+    for class_name in rules.drop_classes:
+        for el in soup.find_all(class_=class_name):
+            el.decompose()
+
+    for tags, pattern in rules.drop_class_substrings:
+        for el in soup.find_all(tags):
+            if el.decomposed or el.attrs is None:
+                continue
+            if pattern.search(' '.join(el.get('class') or [])):
+                el.decompose()
+
+    for selector in rules.drop_selectors:
+        for el in selector.select(soup):
+            if not el.decomposed:
+                el.decompose()
+
+    if rules.drop_text_values:
+        for el in soup.find_all(rules.drop_text_tags or True):
+            if el.decomposed:
+                continue
+            t = el.get_text(strip=True).replace('\xa0', ' ').strip().casefold()
+            if t and t in rules.drop_text_values:
+                el.decompose()
+
+    if rules.unwrap_tags:
+        for el in soup.find_all(rules.unwrap_tags):
+            el.unwrap()
+
+    if rules.paragraph_class:
+        for p in soup.find_all('p'):
+            if not p.get_text().strip():
+                p.decompose()
+            else:
+                p['class'] = p.get('class', []) + [rules.paragraph_class]
+
+    if rules.strip_attributes == 'all':
+        for el in soup.find_all(True):
+            el.attrs = {}
+    elif rules.strip_attributes == 'empty':
+        for el in soup.find_all(True):
+            for attr in list(el.attrs.keys()):
+                if not el[attr]:
+                    del el[attr]
+
+    if rules.remove_empty:
+        removed = True
+        while removed:
+            removed = False
+            for el in list(soup.find_all(rules.remove_empty_tags)):
+                if el.decomposed:
+                    continue
+                if not el.get_text(strip=True) and not el.find(True):
+                    el.decompose()
+                    removed = True
+            if rules.remove_empty != 'repeat':
+                break
+
+    if rules.drop_figures_without_media:
+        for figure in soup.find_all('figure'):
+            if not figure.find('img') and not figure.find('video'):
+                figure.decompose()
+
+    if rules.prepend_selectors and page_html:
+        try:
+            orig = BeautifulSoup(page_html, 'html.parser')
+            for selector in reversed(rules.prepend_selectors):
+                node = selector.select_one(orig)
+                if node:
+                    soup.insert(0, BeautifulSoup(str(node), 'html.parser'))
+        except Exception:
+            pass
+
+    return str(soup)
+
+
+def _collect_blocks(node, rules):
+    parts = []
+    for block in node.find_all(rules.content_tags):
+        t = block.get_text(strip=True)
+        if len(t) < rules.min_paragraph_length:
+            continue
+        if rules.paragraph_exclude and rules.paragraph_exclude.search(t):
+            continue
+        cls = f' class="{rules.paragraph_class}"' if rules.paragraph_class else ''
+        parts.append(f"<p{cls}>{html_lib.escape(t, quote=False)}</p>")
+    return '\n'.join(parts)
+
+
+def summary_content(summary, rules=None):
+    """
+    RSS summary as a one-paragraph body, for articles whose page could not be
+    fetched (host down, circuit open, blocked). Counted as fallback.summary.
+    """
+    text = BeautifulSoup(summary or '', 'html.parser').get_text(' ', strip=True)
+    if not text:
+        return ''
+    cls = ''
+    if rules is not None:
+        metrics.incr(rules.source_id, 'fallback.summary')
+        if rules.paragraph_class:
+            cls = f' class="{rules.paragraph_class}"'
+    return f"<p{cls}>{html_lib.escape(text, quote=False)}</p>"
+
+
+def select_content(html, rules, selectors=None):
+    """
+    Selector-based fallback extraction from a full page.
+
+    Tries each content selector in order and returns the collected blocks of
+    the first container whose text reaches min_content_length. When
+    fallback_to_page is set, blocks from the whole page are used last.
+    """
+    try:
+        if isinstance(html, str):
+            html = strip_payloads(html.encode('utf-8')).decode('utf-8', errors='replace')
+        else:
+            html = strip_payloads(html)
+        soup = BeautifulSoup(html, 'html.parser')
+    except Exception:
+        return ''
+    for selector in (selectors if selectors is not None else rules.content_selectors):
+        if isinstance(selector, str):
+            selector = soupsieve.compile(selector)
+        node = selector.select_one(soup)
+        if node is None:
+            continue
+        content = _collect_blocks(node, rules)
+        if content and text_length(content) >= rules.min_content_length:
+            return content
+    if rules.fallback_to_page:
+        content = _collect_blocks(soup, rules)
+        if content and text_length(content) >= rules.page_fallback_min_length:
+            return content
+    return ''
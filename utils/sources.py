@@ -0,0 +1,172 @@
+"""Registry of regions and their sources.
+
+``config/sources.json`` describes what main.py and daemon.py run, so sources
+can be added, moved or switched off without code edits:
+
+- ``sources.<source_id>``: ``script`` (scraper path), ``output`` (the HTML
+  page it writes) and ``enabled`` (default true). The id is the scraper's
+  ``SOURCE_ID`` (rules, state and metrics use the same one).
+- ``regions.<region>``: ``label`` (index page link), ``timezone`` and
+  ``timezone_label`` (page timestamp), ``timestamp_prefix``, ``budget``
+  (seconds until the page is published, see utils/deadline.py),
+  ``concurrency`` (most scrapers run at once, default all of them) and
+  ``sources`` (ids in display order).
+
+Plain feeds need no scraper of their own. A region's ``feeds`` (a list of
+``{"id", "url", "title", "site", "language", "max_items", "enabled"}``) and
+``opml`` (OPML files, see utils/opml.py) are appended to its sources and run
+together by the generic driver (scrapers/rss_scraper.py, utils/rss_driver.py);
+``language`` and ``feed_concurrency`` (feeds processed at once, default 8)
+set the region's defaults for them.
+
+The file is loaded once at import time, like config/rules (utils/site_rules.py).
+"""
+
+import json
+import os
+
+from utils.opml import feed_id, read_opml
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCES_FILE = os.path.join(ROOT_DIR, 'config', 'sources.json')
+# Script running every plain feed of a region (QUICKNEWS_REGION names the region)
+RSS_DRIVER_SCRIPT = 'scrapers/rss_scraper.py'
+REGION_ENV = 'QUICKNEWS_REGION'
+
+# Used for regions without their own settings
+DEFAULT_BUDGET = 240
+DEFAULT_TIMEZONE = 'US/Eastern'
+DEFAULT_TIMEZONE_LABEL = 'ET'
+DEFAULT_TIMESTAMP_PREFIX = 'Updated'
+DEFAULT_FEED_CONCURRENCY = 8
+# Newest items taken from a plain feed
+DEFAULT_MAX_ITEMS = 30
+
+
+class Source:
+    """One scraper, or one plain feed run by the generic driver, and the page it writes."""
+
+    def __init__(self, source_id, spec):
+        self.source_id = source_id
+        self.feed = spec.get('url') or spec.get('feed')
+        if not spec.get('script') and not self.feed:
+            raise ValueError('needs a script or a feed url')
+        self.generic = not spec.get('script')
+        self.script = spec.get('script') or RSS_DRIVER_SCRIPT
+        self.output = spec.get('output') or f'output/{source_id}_articles.html'
+        self.enabled = bool(spec.get('enabled', True))
+        self.title = spec.get('title') or source_id
+        self.site = spec.get('site')
+        self.language = spec.get('language')
+        self.max_items = int(spec.get('max_items', DEFAULT_MAX_ITEMS))
+
+    def __repr__(self):
+        return f"Source({self.source_id!r})"
+
+
+class Region:
+    """A region page and the sources combined into it."""
+
+    def __init__(self, name, spec, sources):
+        self.name = name
+        self.label = spec.get('label', name.upper())
+        self.timezone = spec.get('timezone', DEFAULT_TIMEZONE)
+        self.timezone_label = spec.get('timezone_label', DEFAULT_TIMEZONE_LABEL)
+        self.timestamp_prefix = spec.get('timestamp_prefix', DEFAULT_TIMESTAMP_PREFIX)
+        self.budget = float(spec.get('budget', DEFAULT_BUDGET))
+        self.language = spec.get('language')
+        self.feed_concurrency = int(spec.get('feed_concurrency', DEFAULT_FEED_CONCURRENCY))
+        # Every listed source, enabled or not (disabled ones are skipped when run)
+        self.all_sources = []
+        for source_id in spec.get('sources', []):
+            if source_id in sources:
+                self.all_sources.append(sources[source_id])
+            else:
+                print(f"Warning: region {name} lists unknown source {source_id}")
+        self.sources = [s for s in self.all_sources if s.enabled]
+        # The plain feeds all run in one driver process
+        self.scripts = list(dict.fromkeys(s.script for s in self.sources))
+        self.concurrency = int(spec.get('concurrency') or len(self.scripts) or 1)
+
+    def feeds(self):
+        """Enabled plain-feed sources (run by the generic driver)."""
+        return [s for s in self.sources if s.generic]
+
+    def __repr__(self):
+        return f"Region({self.name!r})"
+
+
+def _region_feeds(name, spec):
+    """Feed specs of a region: its feeds list, then its OPML files."""
+    feeds = list(spec.get('feeds', []))
+    paths = spec.get('opml') or []
+    for path in [paths] if isinstance(paths, str) else paths:
+        try:
+            feeds.extend(read_opml(os.path.join(ROOT_DIR, path)))
+        except Exception as e:
+            print(f"Error reading OPML {path} for region {name}: {e}")
+    return feeds
+
+
+def load_registry(path=SOURCES_FILE):
+    """Load the registry file; returns ({region: Region}, {source_id: Source})."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            spec = json.load(f)
+    except Exception as e:
+        print(f"Error loading source registry {path}: {e}")
+        return {}, {}
+    sources = {}
+    for source_id, source_spec in spec.get('sources', {}).items():
+        try:
+            sources[source_id] = Source(source_id, source_spec)
+        except ValueError as e:
+            print(f"Error in source {source_id}: {e}")
+    regions = {}
+    for name, region_spec in spec.get('regions', {}).items():
+        region_spec = dict(region_spec)
+        source_ids = list(region_spec.get('sources', []))
+        for feed_spec in _region_feeds(name, region_spec):
+            source_id = feed_id(feed_spec, feed_spec.get('url') or '')
+            if not source_id or source_id in sources:
+                print(f"Warning: skipping feed {feed_spec.get('url')} in region {name}: duplicate or missing id")
+                continue
+            feed_spec = {k: v for k, v in feed_spec.items() if v is not None}
+            feed_spec.setdefault('language', region_spec.get('language'))
+            try:
+                sources[source_id] = Source(source_id, feed_spec)
+            except ValueError as e:
+                print(f"Error in feed {source_id}: {e}")
+                continue
+            source_ids.append(source_id)
+        region_spec['sources'] = source_ids
+        regions[name] = Region(name, region_spec, sources)
+    return regions, sources
+
+
+_REGIONS, _SOURCES = load_registry()
+
+
+def get_region(name):
+    """Region settings; an unknown region gets the defaults and no sources."""
+    region = _REGIONS.get(name)
+    if region is None:
+        region = Region(name, {}, _SOURCES)
+    return region
+
+
+def region_names():
+    """Configured regions, in file order."""
+    return list(_REGIONS)
+
+
+def get_source(source_id):
+    return _SOURCES.get(source_id)
+
+
+def source_timezone(source_id):
+    """Timezone name of the first region listing the source (times shown on its cards)."""
+    for region in _REGIONS.values():
+        if any(s.source_id == source_id for s in region.all_sources):
+            return region.timezone
+    return DEFAULT_TIMEZONE
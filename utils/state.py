@@ -0,0 +1,60 @@
+"""Small JSON state files kept between runs.
+
+State lives in ``state/`` (or ``QUICKNEWS_STATE_DIR``), one file per
+component, e.g. ``state/hosts.json`` for the per-host limiters. Scrapers run
+as separate processes, so shared files are updated by merging per key into
+whatever is on disk right before writing. Files are replaced atomically.
+"""
+
+import json
+import os
+import threading
+
+STATE_DIR = os.environ.get('QUICKNEWS_STATE_DIR', 'state')
+
+_lock = threading.Lock()
+
+
+def state_path(name):
+    return os.path.join(STATE_DIR, f'{name}.json')
+
+
+def load_state(name):
+    """Return the saved {key: value} mapping for name ({} if missing or unreadable)."""
+    try:
+        with open(state_path(name), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"Warning: could not read state {name}: {e}")
+        return {}
+
+
+def update_state(name, updates):
+    """Merge updates (by top-level key) into the saved state and write it atomically."""
+    if not updates:
+        return
+    with _lock:
+        data = load_state(name)
+        data.update(updates)
+        _write(name, data)
+
+
+def write_state(name, data):
+    """Replace the saved state (for files written by a single source's process)."""
+    with _lock:
+        _write(name, data)
+
+
+def _write(name, data):
+    try:
+        os.makedirs(STATE_DIR, exist_ok=True)
+        path = state_path(name)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp, path)
+    except Exception as e:
+        print(f"Warning: could not write state {name}: {e}")
@@ -0,0 +1,557 @@
+"""Persistent article store (SQLite).
+
+``output/*_articles.json`` only holds each source's latest run. Every article
+written by ``save_articles`` is also kept in ``state/articles.db`` (or
+``QUICKNEWS_STORE``; ``off`` disables the store), together with what the
+pipeline learned while producing it:
+
+- ``articles``: one row per canonical URL (utils/urls.py) with the feed
+  metadata, the body and its hash, first/last seen times. Indexed on
+  (source_id, published), canonical URL and content hash. ``minhash`` is the
+  body's near-duplicate signature and ``duplicate_of`` the canonical URL of
+  an earlier article (of the last ``NEAR_DUP_HOURS``) with nearly the same
+  text (utils/near_dup.py). ``extracted`` is set when the body was extracted
+  from the page or the feed entry (``EXTRACTED_METHODS``); a stored body of
+  that kind is only ever replaced by another one, never by an RSS summary
+  or a headlines-mode card.
+- ``fetches``: last HTTP status, size and charset of each page fetched.
+- ``feeds``: validators (ETag, Last-Modified), status and entry count of each
+  feed download or poll.
+- ``extractions``: how each body was obtained (``page``, ``feed``, ``cache``
+  or ``summary``), its length and hash.
+- ``seen``: the canonical URLs and GUIDs (``guid:<id>``) of the entries each
+  source has processed, and ``seen_filters`` the Bloom filter over them that
+  the scrapers consult (utils/seen.py).
+- ``articles_fts``: full-text index of the articles (utils/fts.py), updated
+  with them and queried with ``search``.
+
+The database runs in WAL mode, so the scraper processes of a run write one at
+a time (``busy_timeout``) while readers are never blocked. Writes are buffered
+and committed in batches: rows are queued by the ``record_*`` functions and
+written in one transaction per ``BATCH_SIZE`` rows, when ``save_articles``
+finishes a source and when the process exits. A store failure is reported
+and never stops a scraper.
+"""
+
+import atexit
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from utils import fts, metrics, near_dup
+from utils.state import STATE_DIR
+from utils.urls import canonical_url
+
+STORE_FILE = os.environ.get('QUICKNEWS_STORE') or os.path.join(STATE_DIR, 'articles.db')
+# Queued rows committed together
+BATCH_SIZE = 500
+BUSY_TIMEOUT_MS = 10000
+# New articles are checked for near-duplicates among those seen this recently
+NEAR_DUP_HOURS = 48
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY,
+    canonical_url TEXT NOT NULL UNIQUE,
+    url TEXT NOT NULL,
+    source_id TEXT NOT NULL,
+    source TEXT,
+    title TEXT,
+    published INTEGER,
+    language TEXT,
+    summary TEXT,
+    content TEXT,
+    content_hash TEXT,
+    image_url TEXT,
+    author TEXT,
+    first_seen INTEGER NOT NULL,
+    last_seen INTEGER NOT NULL,
+    minhash BLOB,
+    duplicate_of TEXT,
+    extracted INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS articles_source_published ON articles (source_id, published);
+CREATE INDEX IF NOT EXISTS articles_content_hash ON articles (content_hash);
+CREATE INDEX IF NOT EXISTS articles_last_seen ON articles (last_seen);
+CREATE TABLE IF NOT EXISTS fetches (
+    canonical_url TEXT PRIMARY KEY,
+    source_id TEXT,
+    status INTEGER,
+    bytes INTEGER,
+    charset TEXT,
+    fetched_at INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS feeds (
+    url TEXT PRIMARY KEY,
+    source_id TEXT,
+    status INTEGER,
+    etag TEXT,
+    last_modified TEXT,
+    entries INTEGER,
+    checked_at INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS seen (
+    source_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    first_seen INTEGER NOT NULL,
+    PRIMARY KEY (source_id, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS seen_filters (
+    source_id TEXT PRIMARY KEY,
+    capacity INTEGER NOT NULL,
+    error_rate REAL NOT NULL,
+    items INTEGER NOT NULL,
+    bits BLOB NOT NULL,
+    saved_at INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS extractions (
+    canonical_url TEXT PRIMARY KEY,
+    source_id TEXT,
+    method TEXT,
+    length INTEGER,
+    content_hash TEXT,
+    extracted_at INTEGER NOT NULL
+);
+"""
+
+# Ways of obtaining a body that give the article text (see record_extraction)
+EXTRACTED_METHODS = ('page', 'feed', 'cache')
+# An extracted body replaces any stored one; another body only replaces one that was not extracted
+_REPLACE_BODY = "(excluded.extracted OR (NOT articles.extracted AND excluded.content != ''))"
+
+_UPSERT = {
+    'articles': f"""
+        INSERT INTO articles (canonical_url, url, source_id, source, title, published, language, summary,
+                              content, content_hash, image_url, author, first_seen, last_seen, minhash,
+                              duplicate_of, extracted)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (canonical_url) DO UPDATE SET
+            url = excluded.url, source = excluded.source, title = excluded.title,
+            published = COALESCE(excluded.published, articles.published), language = excluded.language,
+            summary = excluded.summary,
+            content = CASE WHEN {_REPLACE_BODY} THEN excluded.content ELSE articles.content END,
+            content_hash = CASE WHEN {_REPLACE_BODY} THEN excluded.content_hash ELSE articles.content_hash END,
+            minhash = CASE WHEN {_REPLACE_BODY} THEN COALESCE(excluded.minhash, articles.minhash)
+                      ELSE articles.minhash END,
+            extracted = MAX(excluded.extracted, articles.extracted),
+            image_url = excluded.image_url, author = excluded.author, last_seen = excluded.last_seen,
+            duplicate_of = COALESCE(articles.duplicate_of, excluded.duplicate_of)
+    """,
+    'fetches': """
+        INSERT OR REPLACE INTO fetches (canonical_url, source_id, status, bytes, charset, fetched_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """,
+    'feeds': """
+        INSERT INTO feeds (url, source_id, status, etag, last_modified, entries, checked_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (url) DO UPDATE SET
+            source_id = excluded.source_id, status = excluded.status,
+            etag = COALESCE(excluded.etag, feeds.etag),
+            last_modified = COALESCE(excluded.last_modified, feeds.last_modified),
+            entries = COALESCE(excluded.entries, feeds.entries), checked_at = excluded.checked_at
+    """,
+    'seen': """
+        INSERT OR IGNORE INTO seen (source_id, key, first_seen) VALUES (?, ?, ?)
+    """,
+    'seen_filters': """
+        INSERT OR REPLACE INTO seen_filters (source_id, capacity, error_rate, items, bits, saved_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """,
+    'extractions': """
+        INSERT OR REPLACE INTO extractions (canonical_url, source_id, method, length, content_hash, extracted_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """,
+}
+
+_lock = threading.RLock()
+_conn = None
+_failed = False
+_fts = False
+_pending = {table: [] for table in _UPSERT}
+_registered = False
+# Near-duplicate index of the recent articles (canonical URL -> signature), loaded on first use
+_near_dup_index = None
+# Hash of the last body recorded per canonical URL in this process if it was
+# extracted (None otherwise), until add_articles stores the article
+_extracted = {}
+# Columns added since the first schema, for databases created before them
+_ADDED_COLUMNS = {'articles': (('minhash', 'BLOB'), ('duplicate_of', 'TEXT'),
+                               ('extracted', 'INTEGER NOT NULL DEFAULT 0'))}
+# Filled in for the rows that predate a column, once the schema is complete
+_BACKFILL = {
+    ('articles', 'extracted'): f"""
+        UPDATE articles SET extracted = 1 WHERE EXISTS (
+            SELECT 1 FROM extractions e WHERE e.canonical_url = articles.canonical_url
+            AND e.method IN {EXTRACTED_METHODS} AND e.content_hash = articles.content_hash)
+    """,
+}
+
+
+def enabled():
+    return STORE_FILE.lower() != 'off' and not _failed
+
+
+def content_hash(content):
+    return hashlib.sha1(content.encode('utf-8')).hexdigest() if content else None
+
+
+def _epoch(value):
+    return int(value.timestamp()) if value is not None else None
+
+
+def connect():
+    """The process' connection (created with the schema on first use), or None if the store is off."""
+    global _conn, _failed, _fts
+    with _lock:
+        if _conn is not None or not enabled():
+            return _conn
+        try:
+            os.makedirs(os.path.dirname(STORE_FILE) or '.', exist_ok=True)
+            conn = sqlite3.connect(STORE_FILE, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+            added = _migrate(conn)
+            conn.executescript(SCHEMA)
+            with conn:
+                for column in added:
+                    if column in _BACKFILL:
+                        conn.execute(_BACKFILL[column])
+            _conn = conn
+        except Exception as e:
+            print(f"Warning: article store {STORE_FILE} unavailable: {e}")
+            _failed = True
+            return _conn
+        try:
+            fts.ensure(conn)
+            _fts = True
+        except sqlite3.Error as e:
+            # SQLite built without FTS5: the store works, search does not
+            print(f"Warning: full-text search unavailable: {e}")
+        return _conn
+
+
+def _migrate(conn):
+    """Add the missing columns to existing tables; returns the (table, column) pairs added."""
+    added = []
+    for table, columns in _ADDED_COLUMNS.items():
+        existing = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+        if not existing:
+            continue
+        for name, kind in columns:
+            if name not in existing:
+                conn.execute(f'ALTER TABLE {table} ADD COLUMN {name} {kind}')
+                added.append((table, name))
+    return added
+
+
+def _queue(table, row):
+    global _registered
+    if not enabled():
+        return
+    with _lock:
+        _pending[table].append(row)
+        if not _registered:
+            atexit.register(flush)
+            _registered = True
+        full = sum(len(rows) for rows in _pending.values()) >= BATCH_SIZE
+    if full:
+        flush()
+
+
+def flush():
+    """Commit the queued rows in one transaction."""
+    with _lock:
+        batches = {table: rows for table, rows in _pending.items() if rows}
+        if not batches:
+            return 0
+        for table in batches:
+            _pending[table] = []
+        conn = connect()
+        if conn is None:
+            return 0
+        written = sum(len(rows) for rows in batches.values())
+        try:
+            with conn:
+                for table, rows in batches.items():
+                    conn.executemany(_UPSERT[table], rows)
+                if _fts and 'articles' in batches:
+                    fts.index_articles(conn, [row[0] for row in batches['articles']])
+        except Exception as e:
+            print(f"Warning: could not write {written} rows to the article store: {e}")
+            return 0
+    metrics.incr('store', 'store.rows_written', written)
+    metrics.incr('store', 'store.commits')
+    return written
+
+
+def _recent_index():
+    """
+    LSH index of the articles seen in the last NEAR_DUP_HOURS, oldest first.
+    Loaded once per process; add_articles adds to it and drops what leaves
+    the window (the daemon keeps it for its lifetime).
+    """
+    global _near_dup_index
+    if _near_dup_index is not None:
+        return _near_dup_index
+    index = near_dup.LSHIndex()
+    conn = connect()
+    if conn is not None:
+        flush()
+        with _lock:
+            rows = conn.execute('SELECT canonical_url, minhash, last_seen FROM articles WHERE last_seen >= ? '
+                                'AND minhash IS NOT NULL ORDER BY id',
+                                (int(time.time()) - NEAR_DUP_HOURS * 3600,)).fetchall()
+        for key, blob, last_seen in rows:
+            index.add(key, near_dup.from_blob(blob), last_seen)
+    _near_dup_index = index
+    return index
+
+
+def add_articles(articles, seen=None, with_content=True):
+    """
+    Queue articles (utils.article.Article) for the articles table, each with
+    its near-duplicate signature and the earlier recent article it
+    duplicates, if any.
+
+    A body is marked as extracted when it is the one last recorded for the
+    article with one of EXTRACTED_METHODS. with_content=False stores the
+    metadata alone and leaves any stored body as it is (headlines-only runs).
+    """
+    seen = int(seen or time.time())
+    articles = [(canonical_url(a.url), a) for a in articles]
+    articles = [(key, a) for key, a in articles if key]
+    if not articles or not enabled():
+        return
+    contents = [(a.content or '') if with_content else '' for _, a in articles]
+    with _lock:
+        recorded = [_extracted.pop(key, None) for key, _ in articles]
+    signatures = near_dup.signatures([fts.plain_text(c or a.summary) for c, (_, a) in zip(contents, articles)])
+    index = _recent_index()
+    # The daemon's sources save from their own threads
+    with _lock:
+        index.expire(seen - NEAR_DUP_HOURS * 3600)
+        for (key, a), content, extracted, signature in zip(articles, contents, recorded, signatures):
+            duplicate_of = None
+            # An article already indexed keeps what it was matched with when first seen
+            if signature is not None and key not in index.signatures:
+                matches = index.query(signature)
+                if matches:
+                    duplicate_of = matches[0]
+                    metrics.incr('store', 'near_dup.found')
+            index.add(key, signature, seen)
+            digest = content_hash(content) if content else None
+            _queue('articles', (
+                key, a.url, a.source_id, a.source, a.title, _epoch(a.published), a.language, a.summary,
+                content, digest, a.image_url, a.author, seen, seen,
+                near_dup.to_blob(signature), duplicate_of, int(digest is not None and digest == extracted),
+            ))
+
+
+def record_fetch(url, source_id, status, size=None, charset=None):
+    _queue('fetches', (canonical_url(url), source_id, status, size, charset, int(time.time())))
+
+
+def record_feed(url, source_id, status, headers=None, entries=None):
+    """Feed download or poll: status, validators from the (lower-case) headers and entry count."""
+    headers = headers or {}
+    _queue('feeds', (url, source_id, status, headers.get('etag'), headers.get('last-modified'),
+                     entries, int(time.time())))
+
+
+def record_extraction(url, source_id, method, content):
+    """How an article body was obtained: page, feed, cache or summary."""
+    key, digest = canonical_url(url), content_hash(content)
+    if enabled() and key:
+        with _lock:
+            _extracted[key] = digest if method in EXTRACTED_METHODS else None
+    _queue('extractions', (key, source_id, method, len(content or ''), digest, int(time.time())))
+
+
+def record_seen(source_id, keys):
+    """Entry keys (canonical URL, ``guid:<id>``) a source has processed."""
+    now = int(time.time())
+    for key in keys:
+        _queue('seen', (source_id, key, now))
+
+
+def save_seen_filter(source_id, capacity, error_rate, items, bits):
+    _queue('seen_filters', (source_id, capacity, error_rate, items, bytes(bits), int(time.time())))
+
+
+def seen_filter(source_id):
+    """(capacity, error_rate, items, bits) of the source's stored filter, or None."""
+    conn = connect()
+    if conn is None:
+        return None
+    flush()
+    with _lock:
+        return conn.execute('SELECT capacity, error_rate, items, bits FROM seen_filters WHERE source_id = ?',
+                            (source_id,)).fetchone()
+
+
+def seen_keys(source_id):
+    """Every entry key recorded for the source (to rebuild its filter)."""
+    conn = connect()
+    if conn is None:
+        return []
+    flush()
+    with _lock:
+        return [r[0] for r in conn.execute('SELECT key FROM seen WHERE source_id = ?', (source_id,))]
+
+
+def extracted_body(url):
+    """
+    Stored body of an article if it is the one last extracted from its page
+    or feed entry (not an RSS summary used as a fallback), else ''.
+    """
+    conn = connect()
+    if conn is None:
+        return ''
+    flush()
+    with _lock:
+        row = conn.execute('SELECT content FROM articles WHERE canonical_url = ? AND extracted',
+                           (canonical_url(url),)).fetchone()
+    return row[0] if row else ''
+
+
+def _items(rows, columns):
+    items = []
+    for row in rows:
+        item = dict(zip(columns, row))
+        if item.get('published') is not None:
+            item['published'] = time.strftime('%Y-%m-%dT%H:%M:%S+00:00', time.gmtime(item['published']))
+        items.append(item)
+    return items
+
+
+_ITEM_COLUMNS = ('title', 'url', 'source', 'source_id', 'published', 'language', 'summary',
+                 'content', 'image_url', 'author')
+
+
+def recent_articles(source_id=None, since=None, limit=100):
+    """
+    Stored articles, newest first, as JSON items (``Article.from_item``).
+
+    Args:
+        source_id (str): Only this source
+        since (datetime): Only articles published since then
+        limit (int): Most rows returned
+    """
+    conn = connect()
+    if conn is None:
+        return []
+    flush()
+    where, params = [], []
+    if source_id is not None:
+        where.append('source_id = ?')
+        params.append(source_id)
+    if since is not None:
+        where.append('published >= ?')
+        params.append(_epoch(since))
+    sql = f"SELECT {', '.join(_ITEM_COLUMNS)} FROM articles"
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    sql += ' ORDER BY published DESC LIMIT ?'
+    params.append(limit)
+    with _lock:
+        rows = conn.execute(sql, params).fetchall()
+    return _items(rows, _ITEM_COLUMNS)
+
+
+def find_article(url):
+    """Stored article for a URL (any variant of its canonical form) as a JSON item, or None."""
+    conn = connect()
+    if conn is None:
+        return None
+    flush()
+    with _lock:
+        row = conn.execute(f"SELECT {', '.join(_ITEM_COLUMNS)} FROM articles WHERE canonical_url = ?",
+                           (canonical_url(url),)).fetchone()
+    return _items([row], _ITEM_COLUMNS)[0] if row else None
+
+
+def articles_with_hash(digest):
+    """Canonical URLs of stored articles whose body has this content hash."""
+    conn = connect()
+    if conn is None or not digest:
+        return []
+    flush()
+    with _lock:
+        return [r[0] for r in conn.execute('SELECT canonical_url FROM articles WHERE content_hash = ?', (digest,))]
+
+
+def near_duplicates(url):
+    """Canonical URLs of stored articles recorded as near-duplicates of this one."""
+    conn = connect()
+    if conn is None:
+        return []
+    flush()
+    with _lock:
+        return [r[0] for r in conn.execute('SELECT canonical_url FROM articles WHERE duplicate_of = ? ORDER BY id',
+                                           (canonical_url(url),))]
+
+
+def search(query, source_id=None, language=None, limit=20):
+    """
+    Full-text search of the stored articles, best matches first.
+
+    Args:
+        query (str): Words (all must match; ``word*`` for a prefix);
+            Japanese is matched as written, without spaces
+        source_id (str): Only this source
+        language (str): Only this language ('ja', 'en', 'fr')
+        limit (int): Most results
+
+    Returns:
+        list: JSON items (``Article.from_item``) with ``snippet`` (HTML) and
+        ``score`` (BM25, lower is better) added
+    """
+    conn = connect()
+    # The source and language filters are part of the expression (fts.tags)
+    expression = fts.match_query(query, source_id, language)
+    if conn is None or not _fts or not expression:
+        return []
+    flush()
+    sql = (f"SELECT {', '.join('a.' + c for c in _ITEM_COLUMNS)}, f.rank FROM articles_fts f "
+           "JOIN articles a ON a.id = f.rowid WHERE articles_fts MATCH ?")
+    params = [expression]
+    with _lock:
+        # Only the newest RANK_WINDOW matches are ranked (rowids grow with time)
+        cutoff = conn.execute('SELECT rowid FROM articles_fts WHERE articles_fts MATCH ? '
+                              'ORDER BY rowid DESC LIMIT 1 OFFSET ?', (expression, fts.RANK_WINDOW)).fetchone()
+    if cutoff is not None:
+        sql += ' AND f.rowid > ?'
+        params.append(cutoff[0])
+    sql += ' ORDER BY f.rank LIMIT ?'
+    params.append(limit)
+    with _lock:
+        rows = conn.execute(sql, params).fetchall()
+    items = _items([row[:-1] for row in rows], _ITEM_COLUMNS)
+    for item, row in zip(items, rows):
+        item['score'] = row[-1]
+        item['snippet'] = fts.snippet(fts.plain_text(item['content'] or item['summary']), query)
+    return items
+
+
+def feed_validators(url):
+    """(etag, last_modified) last seen for a feed, (None, None) if unknown."""
+    conn = connect()
+    if conn is None:
+        return None, None
+    flush()
+    with _lock:
+        row = conn.execute('SELECT etag, last_modified FROM feeds WHERE url = ?', (url,)).fetchone()
+    return row if row else (None, None)
+
+
+def close():
+    """Commit what is queued and close the connection (daemon shutdown)."""
+    global _conn
+    flush()
+    with _lock:
+        if _conn is not None:
+            _conn.close()
+            _conn = None
@@ -0,0 +1,219 @@
+"""Story clustering: articles about the same event from different outlets.
+
+Near-duplicate detection (utils/near_dup.py) only catches copies of one text.
+Two outlets writing their own story about the same event share the names,
+places and numbers but little of the wording, so stories are grouped by the
+cosine similarity of TF-IDF vectors instead.
+
+Tokens are lower-case words without common English and French function words;
+runs of Japanese characters (no spaces) become character bigrams. Only the
+title and the first ``LEAD_CHARS`` of the body are read (a news lead names the
+event; tokenizing is most of the cost). Title tokens count ``TITLE_WEIGHT``
+times. Tokens are hashed into ``FEATURES``
+columns of a SciPy sparse matrix, so the vocabulary never has to be rebuilt;
+term frequencies are sublinear (1 + log tf) and document frequencies are kept
+over all articles in the window. Each vector keeps only its ``TOP_TERMS``
+heaviest terms: the names and places that identify a story, which also keeps
+the similarity products sparse.
+
+``StoryClusters`` is incremental: ``assign`` vectorizes only the articles it
+has not seen, compares them in one sparse product with the centroids of the
+existing clusters, and joins each to the most similar cluster at or above
+``THRESHOLD``. The rest are clustered among themselves (each joins the most
+similar earlier new article that started a cluster, or starts one). Existing
+assignments never change. Articles older than ``WINDOW_HOURS`` are dropped
+from the centroids as new ones arrive.
+
+Token hashing uses Python's ``hash``, which is salted per process: vectors
+are never stored, each process builds its clusters from what it renders.
+"""
+
+import re
+import time
+
+import numpy as np
+from scipy import sparse
+
+FEATURES = 1 << 20
+THRESHOLD = 0.3
+TITLE_WEIGHT = 2
+TOP_TERMS = 40
+LEAD_CHARS = 1500
+WINDOW_HOURS = 36
+
+_MASK = FEATURES - 1
+# Hiragana, katakana (incl. half-width), CJK ideographs and Hangul
+_CJK_RUN = re.compile('[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff66-\uff9f\uac00-\ud7af]+')
+_WORD = re.compile(r'\w+')
+STOPWORDS = frozenset('''
+a about after all also an and are as at be been but by can could did do for from had has have he her his how
+i in into is it its more most new no not of on one or our out over said says she so than that the their them
+there they this to up was we were what when which who will with would you
+au aux avec ce ces cette dans de des du elle en est et il ils la le les leur lui mais ne nous on ou par pas
+plus pour qu que qui sa se ses son sont sur un une été être a à
+'''.split())
+_STOP_COLUMNS = np.zeros(FEATURES, dtype=bool)
+_STOP_COLUMNS[[hash(w) & _MASK for w in STOPWORDS]] = True
+
+
+def tokens(text):
+    """Terms of text: lower-case words (stopwords included), character bigrams for CJK runs."""
+    if text.isascii() or not _CJK_RUN.search(text):
+        return _WORD.findall(text.lower())
+    terms = []
+    pos = 0
+    for m in _CJK_RUN.finditer(text):
+        terms.extend(_WORD.findall(text[pos:m.start()].lower()))
+        run = m.group()
+        if len(run) > 1:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            terms.append(run)
+        pos = m.end()
+    terms.extend(_WORD.findall(text[pos:].lower()))
+    return terms
+
+
+def _term_counts(docs):
+    """Sparse (len(docs) x FEATURES) term counts of (title, body) pairs, stopwords left out."""
+    terms, lengths = [], []
+    for title, body in docs:
+        doc_terms = tokens(title or '') * TITLE_WEIGHT + tokens((body or '')[:LEAD_CHARS])
+        terms.extend(doc_terms)
+        lengths.append(len(doc_terms))
+    cols = np.fromiter(map(hash, terms), dtype=np.int64, count=len(terms)) & _MASK
+    rows = np.repeat(np.arange(len(docs), dtype=np.int32), lengths)
+    keep = ~_STOP_COLUMNS[cols]
+    rows, cols = rows[keep], cols[keep]
+    counts = sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=(len(docs), FEATURES))
+    counts.sum_duplicates()
+    return counts
+
+
+def _top_terms(matrix, k=TOP_TERMS):
+    """CSR matrix with only the k largest values of each row."""
+    keep = np.ones(len(matrix.data), dtype=bool)
+    for i in range(matrix.shape[0]):
+        start, end = matrix.indptr[i], matrix.indptr[i + 1]
+        if end - start > k:
+            keep[start + np.argpartition(matrix.data[start:end], end - start - k)[:end - start - k]] = False
+    rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))[keep]
+    return sparse.csr_matrix((matrix.data[keep], (rows, matrix.indices[keep])), shape=matrix.shape)
+
+
+def _normalize(matrix):
+    """Rows scaled to unit length (empty rows stay empty)."""
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms) @ matrix
+
+
+class StoryClusters:
+    """Incremental TF-IDF clustering of the articles of the last WINDOW_HOURS."""
+
+    def __init__(self, threshold=THRESHOLD, window_hours=WINDOW_HOURS):
+        self.threshold = threshold
+        self.window = window_hours * 3600
+        # Cluster label of each article key in the window
+        self.labels = {}
+        self.df = np.zeros(FEATURES, dtype=np.int32)
+        self.next_label = 0
+        # Vectors of the articles in the window, their keys, clusters and arrival times
+        self._vectors = sparse.csr_matrix((0, FEATURES), dtype=np.float32)
+        # Every term column of each article (before pruning to TOP_TERMS), as counted in df
+        self._terms = sparse.csr_matrix((0, FEATURES), dtype=bool)
+        self._keys = []
+        self._members = np.empty(0, dtype=np.int64)
+        self._seen = np.empty(0, dtype=np.float64)
+        self._centroids = None
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _expire(self, now):
+        keep = self._seen >= now - self.window
+        if keep.all():
+            return
+        self.df -= np.bincount(self._terms[~keep].indices, minlength=FEATURES).astype(np.int32)
+        for key in (k for k, kept in zip(self._keys, keep) if not kept):
+            del self.labels[key]
+        self._vectors = self._vectors[keep]
+        self._terms = self._terms[keep]
+        self._keys = [k for k, kept in zip(self._keys, keep) if kept]
+        self._members = self._members[keep]
+        self._seen = self._seen[keep]
+        self._centroids = None
+
+    def _centroid_matrix(self):
+        """(cluster labels, unit-length centroid rows) of the clusters in the window."""
+        if self._centroids is None:
+            labels, inverse = np.unique(self._members, return_inverse=True)
+            membership = sparse.csr_matrix((np.ones(len(inverse), dtype=np.float32),
+                                            (inverse, np.arange(len(inverse)))),
+                                           shape=(len(labels), len(inverse)))
+            self._centroids = labels, _normalize(membership @ self._vectors).tocsr()
+        return self._centroids
+
+    def assign(self, articles, now=None):
+        """
+        Cluster labels of articles.
+
+        Args:
+            articles (list): (key, title, body) tuples; a key seen before
+                keeps its label
+
+        Returns:
+            list: an int label per article; equal labels mean the same story
+        """
+        now = now or time.time()
+        self._expire(now)
+        new = {}
+        for key, title, body in articles:
+            if key not in self.labels and key not in new:
+                new[key] = (title, body)
+        if new:
+            self._add(list(new), list(new.values()), now)
+        return [self.labels[key] for key, _, _ in articles]
+
+    def _add(self, keys, docs, now):
+        counts = _term_counts(docs)
+        terms = counts.astype(bool)
+        counts.data = 1 + np.log(counts.data)
+        self.df += np.bincount(counts.indices, minlength=FEATURES).astype(np.int32)
+        documents = len(self._keys) + len(keys)
+        idf = np.log((1 + documents) / (1 + self.df[counts.indices])) + 1
+        counts.data *= idf.astype(np.float32)
+        vectors = _normalize(_top_terms(counts)).tocsr()
+
+        members = np.full(len(keys), -1, dtype=np.int64)
+        if len(self._keys):
+            labels, centroids = self._centroid_matrix()
+            similarity = (vectors @ centroids.T).tocsr()
+            best = np.asarray(similarity.argmax(axis=1)).ravel()
+            matched = similarity.max(axis=1).toarray().ravel() >= self.threshold
+            members[matched] = labels[best[matched]]
+
+        # The rest among themselves: join the most similar earlier article that started a cluster
+        pending = np.flatnonzero(members < 0)
+        if len(pending):
+            among = (vectors[pending] @ vectors[pending].T).tocsr()
+            seeds = np.zeros(len(pending), dtype=bool)
+            for i, row in enumerate(pending):
+                start, end = among.indptr[i], among.indptr[i + 1]
+                cols, sims = among.indices[start:end], among.data[start:end]
+                candidates = (cols < i) & (sims >= self.threshold)
+                candidates[candidates] = seeds[cols[candidates]]
+                if candidates.any():
+                    members[row] = members[pending[cols[candidates][sims[candidates].argmax()]]]
+                else:
+                    members[row] = self.next_label
+                    self.next_label += 1
+                    seeds[i] = True
+
+        self._vectors = sparse.vstack([self._vectors, vectors], format='csr')
+        self._terms = sparse.vstack([self._terms, terms], format='csr')
+        self._keys.extend(keys)
+        self._members = np.concatenate([self._members, members])
+        self._seen = np.concatenate([self._seen, np.full(len(keys), now)])
+        self._centroids = None
+        self.labels.update(zip(keys, members.tolist()))
@@ -0,0 +1,41 @@
+"""Canonical article URLs.
+
+The same article reaches us under several URLs: tracking parameters from the
+feed (``utm_*``, ``cmpid``), ``http`` versus ``https``, a fragment or a
+trailing slash. ``canonical_url`` maps them to one key, used by the article
+store (utils/store.py) to recognise articles it has already seen.
+"""
+
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = frozenset({
+    'cmpid', 'fbclid', 'gclid', 'dclid', 'mc_cid', 'mc_eid', 'ocid', 'ref_src',
+    'smid', 'xtor', 'at_medium', 'at_campaign', 'ito',
+})
+
+
+def canonical_url(url):
+    """
+    Canonical form of an article URL: https, lower-case host without
+    ``www.``, no fragment, no tracking parameters (remaining ones sorted) and
+    no trailing slash. Returns '' for an empty URL.
+    """
+    if not url:
+        return ''
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url.strip()
+    scheme = parts.scheme.lower()
+    if scheme == 'http':
+        scheme = 'https'
+    host = (parts.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    if parts.port and parts.port not in (80, 443):
+        host = f'{host}:{parts.port}'
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if k.lower() not in TRACKING_PARAMS and not k.lower().startswith('utm_')]
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((scheme, host, path, urlencode(sorted(query)), ''))
@@ -0,0 +1,92 @@
+"""Resources kept alive between refreshes in daemon mode.
+
+``daemon.py`` calls ``enable()`` once at start-up. From then on
+utils/http_fetch.py reuses one aiohttp session per event loop and one requests
+session (connections, cookies and the DNS cache survive from one refresh to
+the next) and utils/browser.py keeps Chromium running. Without it every call
+gets a fresh resource that is closed after use, as a one-shot scraper process
+expects.
+"""
+
+import asyncio
+import inspect
+import threading
+
+_enabled = False
+_lock = threading.Lock()
+# (event loop or None, name) -> resource, and the matching close callables
+_resources = {}
+_closers = {}
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def enabled():
+    return _enabled
+
+
+def get(name, factory, close=None, per_loop=True):
+    """
+    The kept resource called name, created with factory() on first use.
+
+    per_loop resources (aiohttp sessions, anything bound to an event loop)
+    are kept once per running loop. close(resource) is called by close_all.
+    """
+    key = (asyncio.get_running_loop() if per_loop else None, name)
+    with _lock:
+        resource = _resources.get(key)
+        if resource is None:
+            resource = _resources[key] = factory()
+            _closers[key] = close
+    return resource
+
+
+async def get_async(name, factory, close=None):
+    """Like get() for a per-loop resource created by the coroutine function factory."""
+    loop = asyncio.get_running_loop()
+    key = (loop, name)
+    with _lock:
+        task = _resources.get(key)
+        if task is None:
+            # Stored as a task so concurrent callers share a single creation
+            task = _resources[key] = loop.create_task(factory())
+            _closers[key] = close
+    try:
+        return await task
+    except Exception:
+        discard(name)
+        raise
+
+
+def discard(name, per_loop=True):
+    """Forget a resource (e.g. a browser that crashed) so the next get() recreates it."""
+    key = (asyncio.get_running_loop() if per_loop else None, name)
+    with _lock:
+        _resources.pop(key, None)
+        _closers.pop(key, None)
+
+
+async def close_all():
+    """Close the resources of the running loop (and the loop-independent ones)."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        keys = [key for key in _resources if key[0] in (loop, None)]
+        items = [(_resources.pop(key), _closers.pop(key, None)) for key in keys]
+    for resource, close in items:
+        try:
+            if isinstance(resource, asyncio.Task):
+                if not resource.done():
+                    resource.cancel()
+                    continue
+                if resource.exception() is not None:
+                    continue
+                resource = resource.result()
+            if close is not None:
+                result = close(resource)
+                if inspect.isawaitable(result):
+                    await result
+        except Exception as e:
+            print(f"Warning: could not close kept resource: {e}")